@@ -22,7 +22,8 @@ def create_app(config_name='development'):
     CORS(app, resources={r"/api/*": {
         "origins": "http://localhost:5173",
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
+        "allow_headers": ["Content-Type", "Authorization", "X-Admission-Token", "Idempotency-Key"],
+        "expose_headers": ["Idempotent-Replayed", "Retry-After"],
         "supports_credentials": True
     }})
     
@@ -45,4 +46,8 @@ def create_app(config_name='development'):
     from app.errors import register_error_handlers
     register_error_handlers(app)
     
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
+    
     return app
\ No newline at end of file
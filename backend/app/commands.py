@@ -0,0 +1,224 @@
+# Flask CLI commands
+import os
+import threading
+import time
+import click
+from flask import current_app
+from app.extensions import db
+from app.models.event import Event
+from app.services.booking_service import BookingService
+from app.services.event_service import EventService, image_variant_executor
+from app.services.flash_sale_service import FlashSaleService
+from app.services.inventory_service import InventoryService
+from app.services.mail_service import MailService
+from app.services.notification_service import NotificationService
+from app.services.payment_service import PaymentService
+from app.utils.mail.outbox import MAIL_IDLE_TIMEOUT
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'db', 'migrations')
+
+
+def register_commands(app):
+    """Register CLI commands with the Flask app"""
+    
+    @app.cli.command('migrate-db')
+    def migrate_db():
+        """Apply the SQL migrations in app/db/migrations (all are idempotent)"""
+        files = sorted(f for f in os.listdir(MIGRATIONS_DIR) if f.endswith('.sql'))
+        for filename in files:
+            with open(os.path.join(MIGRATIONS_DIR, filename), encoding='utf-8') as fh:
+                sql = fh.read()
+            db.session.connection().exec_driver_sql(sql)
+            db.session.commit()
+            click.echo(f"Applied {filename}")
+    
+    @app.cli.command('reindex-events')
+    @click.option('--batch-size', default=1000, show_default=True)
+    def reindex_events(batch_size):
+        """Rebuild the stored search document of every event"""
+        last_id = 0
+        total = 0
+        while True:
+            events = (
+                Event.query
+                .filter(Event.event_id > last_id)
+                .order_by(Event.event_id)
+                .limit(batch_size)
+                .all()
+            )
+            if not events:
+                break
+            for event in events:
+                event.refresh_search_document()
+            db.session.commit()
+            last_id = events[-1].event_id
+            total += len(events)
+            click.echo(f"Reindexed {total} events")
+    
+    @app.cli.command('retry-image-uploads')
+    def retry_image_uploads():
+        """Upload event images still waiting in the spool directory"""
+        stored = EventService.retry_image_uploads()
+        click.echo(f"Stored {stored} images")
+    
+    @app.cli.command('generate-image-variants')
+    @click.option('--batch-size', default=100, show_default=True)
+    @click.option('--force', is_flag=True, help='Regenerate variants that already exist')
+    def generate_image_variants(batch_size, force):
+        """Backfill resized image variants for events with an image"""
+        last_id = 0
+        total = 0
+        while True:
+            query = Event.query.filter(Event.event_id > last_id, Event.image_url.isnot(None))
+            if not force:
+                query = query.filter(Event.image_variants.is_(None))
+            event_ids = [
+                event_id for (event_id,) in
+                query.with_entities(Event.event_id).order_by(Event.event_id).limit(batch_size)
+            ]
+            if not event_ids:
+                break
+            futures = [
+                image_variant_executor.submit(EventService.generate_image_variants, event_id)
+                for event_id in event_ids
+            ]
+            image_variant_executor.drain()
+            failed = sum(1 for future in futures if future.exception() is not None)
+            last_id = event_ids[-1]
+            total += len(event_ids)
+            click.echo(f"Processed {total} events ({failed} failed in this batch)")
+    
+    @app.cli.command('release-expired-holds')
+    @click.option('--batch-size', type=int, default=None, help='Defaults to HOLD_SWEEP_BATCH_SIZE')
+    @click.option('--interval', type=int, default=0, help='Keep sweeping every N seconds')
+    def release_expired_holds(batch_size, interval):
+        """Return inventory held by expired pending bookings"""
+        while True:
+            released = BookingService.release_expired_holds(batch_size)
+            click.echo(f"Released {released} expired holds")
+            if interval <= 0:
+                break
+            time.sleep(interval)
+    
+    @app.cli.command('process-payment-webhooks')
+    @click.option('--workers', default=4, show_default=True, help='Worker threads claiming inbox rows')
+    @click.option('--batch-size', type=int, default=None, help='Defaults to WEBHOOK_BATCH_SIZE')
+    @click.option('--interval', type=float, default=0, help='Keep polling every N seconds when idle')
+    def process_payment_webhooks(workers, batch_size, interval):
+        """Apply stored payment webhooks (workers claim rows with SKIP LOCKED)"""
+        flask_app = current_app._get_current_object()
+        processed = []
+        
+        def worker():
+            with flask_app.app_context():
+                while True:
+                    try:
+                        handled = PaymentService.process_webhook_events(batch_size)
+                    except Exception as exc:
+                        db.session.rollback()
+                        print("Webhook worker error:", str(exc), flush=True)
+                        handled = 0
+                    processed.append(handled)
+                    if handled:
+                        continue
+                    if interval <= 0:
+                        break
+                    time.sleep(interval)
+        
+        threads = [threading.Thread(target=worker, name=f'webhook-worker-{i}') for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        click.echo(f"Processed {sum(processed)} payment webhooks")
+    
+    @app.cli.command('reconcile-payments')
+    @click.option('--older-than', type=int, default=None, help='Minutes pending; defaults to RECONCILE_OLDER_THAN')
+    @click.option('--batch-size', type=int, default=None, help='Defaults to RECONCILE_BATCH_SIZE')
+    @click.option('--workers', type=int, default=None, help='Concurrent gateway lookups; defaults to RECONCILE_WORKERS')
+    @click.option('--limit', type=int, default=None, help='Stop after this many payments')
+    @click.option('--interval', type=int, default=0, help='Keep reconciling every N seconds')
+    def reconcile_payments(older_than, batch_size, workers, limit, interval):
+        """Check pending payments without a webhook against PayOS (safe on several nodes)"""
+        while True:
+            stats = PaymentService.reconcile_pending_payments(
+                older_than=None if older_than is None else older_than * 60,
+                batch_size=batch_size, workers=workers, limit=limit
+            )
+            click.echo(
+                f"Checked {stats['checked']} payments in {stats['elapsed_seconds']}s "
+                f"({stats['per_second'] or 0}/s): {stats['paid']} paid, {stats['failed']} failed, "
+                f"{stats['pending']} still pending, {stats['unfulfillable']} unfulfillable, "
+                f"{stats['error']} errors; max drift {stats['max_drift_seconds']}s"
+            )
+            if interval <= 0:
+                break
+            time.sleep(interval)
+    
+    @app.cli.command('send-notifications')
+    @click.option('--batch-size', type=int, default=None, help='Defaults to NOTIFICATION_BATCH_SIZE')
+    @click.option('--no-reminders', is_flag=True, help='Only send campaigns that are already queued')
+    @click.option('--interval', type=int, default=0, help='Keep checking every N seconds')
+    def send_notifications(batch_size, no_reminders, interval):
+        """Queue due event reminders and send pending notification campaigns"""
+        def report(progress):
+            click.echo(
+                f"Campaign {progress['campaignId']} ({progress['kind']}, event {progress['eventId']}): "
+                f"{progress['sent']} sent, {progress['failed']} failed of {progress['total']} "
+                f"({progress['percent']}%)"
+            )
+        
+        while True:
+            if not no_reminders:
+                click.echo(f"Queued {NotificationService.schedule_reminders()} reminders")
+            results = NotificationService.send_pending_campaigns(batch_size=batch_size, progress=report)
+            click.echo(f"Finished {len(results)} campaigns")
+            if interval <= 0:
+                break
+            time.sleep(interval)
+    
+    @app.cli.command('send-mail')
+    @click.option('--workers', type=int, default=None, help='Parallel SMTP sessions; defaults to MAIL_WORKERS')
+    @click.option('--batch-size', type=int, default=None, help='Defaults to MAIL_BATCH_SIZE')
+    @click.option('--interval', type=float, default=0, help='Keep polling every N seconds when idle')
+    def send_mail(workers, batch_size, interval):
+        """Deliver the mail outbox (several senders may run; rows are claimed with SKIP LOCKED)"""
+        handled_total = 0
+        with MailService.pool(workers) as pool:
+            idle_since = time.monotonic()
+            while True:
+                try:
+                    handled = MailService.send_batch(pool, batch_size)
+                except Exception as exc:
+                    db.session.rollback()
+                    print("Mail worker error:", str(exc), flush=True)
+                    handled = 0
+                handled_total += handled
+                if handled:
+                    idle_since = time.monotonic()
+                    continue
+                if interval <= 0:
+                    break
+                if time.monotonic() - idle_since > MAIL_IDLE_TIMEOUT:
+                    # Servers drop idle sessions anyway; reconnect on the next message
+                    pool.disconnect()
+                time.sleep(interval)
+        click.echo(f"Handled {handled_total} outbox emails")
+    
+    @app.cli.command('rebuild-flash-counters')
+    @click.option('--event-id', type=int, default=None, help='Only this event')
+    def rebuild_flash_counters(event_id):
+        """Reconcile held quantities and reload the flash-sale inventory counters.
+
+        Run while bookings for the event are paused: counters are overwritten.
+        """
+        query = Event.query.filter(Event.flash_sale.is_(True))
+        if event_id is not None:
+            query = query.filter(Event.event_id == event_id)
+        for (flash_event_id,) in query.with_entities(Event.event_id).order_by(Event.event_id):
+            InventoryService.reconcile_held_quantities(flash_event_id)
+            InventoryService.refresh_event_summary(flash_event_id)
+            db.session.commit()
+            counts = FlashSaleService.rebuild_counters(flash_event_id)
+            EventService.invalidate_event(flash_event_id)
+            click.echo(f"Event {flash_event_id}: {counts}")
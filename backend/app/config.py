@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 from datetime import timedelta
 
@@ -14,16 +15,124 @@ class Config:
     # JWT Configuration
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwt-secret-1234")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
+    # Seconds a worker trusts its copy of a user's role version; a role
+    # change reaches other workers within this long
+    PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "10"))
     
     # AWS Configuration
     AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY")
     AWS_SECRET_KEY = os.getenv("AWS_SECRET_KEY")
     AWS_REGION = os.getenv("AWS_REGION")
     AWS_BUCKET = os.getenv("AWS_BUCKET")
+    S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "10"))
+    S3_CONNECT_TIMEOUT = int(os.getenv("S3_CONNECT_TIMEOUT", "5"))
+    S3_READ_TIMEOUT = int(os.getenv("S3_READ_TIMEOUT", "60"))
+    
+    # Image storage ('s3', or 'local' to write under LOCAL_STORAGE_DIR)
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "s3")
+    LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", os.path.join(tempfile.gettempdir(), "th-ticket-storage"))
+    LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "http://localhost:5000/static/uploads")
+    IMAGE_SPOOL_DIR = os.getenv("IMAGE_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "th-ticket-spool"))
+    IMAGE_UPLOAD_WORKERS = int(os.getenv("IMAGE_UPLOAD_WORKERS", "2"))
+    IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", "2"))
+    # Direct-to-storage uploads (presigned URLs)
+    IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(20 * 1024 * 1024)))
+    IMAGE_UPLOAD_URL_TTL = int(os.getenv("IMAGE_UPLOAD_URL_TTL", "600"))
     
     # Redis Configuration
     REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
     
+    # Inventory holds (matches the 10-minute PayOS link lifetime)
+    BOOKING_HOLD_TTL = int(os.getenv("BOOKING_HOLD_TTL", "600"))
+    HOLD_SWEEP_BATCH_SIZE = int(os.getenv("HOLD_SWEEP_BATCH_SIZE", "500"))
+    # Expired holds are kept this much longer so a payment made at the last
+    # second of the PayOS link still finds its hold
+    HOLD_RELEASE_GRACE = int(os.getenv("HOLD_RELEASE_GRACE", "60"))
+    
+    # Flash sales: 'redis' counters, or 'local' (single process, tests)
+    FLASH_SALE_BACKEND = os.getenv("FLASH_SALE_BACKEND", "redis")
+    FLASH_SALE_RECONCILE_WORKERS = int(os.getenv("FLASH_SALE_RECONCILE_WORKERS", "1"))
+    
+    # Virtual waiting room (per-event admission queue)
+    WAITING_ROOM_ADMISSION_TTL = int(os.getenv("WAITING_ROOM_ADMISSION_TTL", "900"))
+    WAITING_ROOM_KEY_TTL = int(os.getenv("WAITING_ROOM_KEY_TTL", str(6 * 3600)))
+    WAITING_ROOM_POLL_INTERVAL = int(os.getenv("WAITING_ROOM_POLL_INTERVAL", "5"))
+    WAITING_ROOM_RATE_CACHE_TTL = int(os.getenv("WAITING_ROOM_RATE_CACHE_TTL", "2"))
+    # Longest idle gap (seconds) credited when the frontier next advances
+    WAITING_ROOM_MAX_CATCHUP = int(os.getenv("WAITING_ROOM_MAX_CATCHUP", "5"))
+    
+    # Idempotency-Key: how long responses are replayable, and how long an
+    # in-flight marker blocks duplicates if its worker dies mid-request
+    IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+    IDEMPOTENCY_LOCK_TTL = int(os.getenv("IDEMPOTENCY_LOCK_TTL", "60"))
+    
+    # Rate limits ('count/seconds', sliding window) per client IP, user or
+    # email; a count of 0 disables one. nginx is one trusted proxy hop.
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "1"))
+    RATE_LIMIT_LOGIN_IP = os.getenv("RATE_LIMIT_LOGIN_IP", "30/60")
+    RATE_LIMIT_LOGIN_EMAIL = os.getenv("RATE_LIMIT_LOGIN_EMAIL", "10/300")
+    RATE_LIMIT_FORGOT_PASSWORD_IP = os.getenv("RATE_LIMIT_FORGOT_PASSWORD_IP", "10/300")
+    RATE_LIMIT_FORGOT_PASSWORD_EMAIL = os.getenv("RATE_LIMIT_FORGOT_PASSWORD_EMAIL", "3/300")
+    # An OTP lives 5 minutes: 5 guesses per email in that time
+    RATE_LIMIT_VERIFY_OTP_IP = os.getenv("RATE_LIMIT_VERIFY_OTP_IP", "20/300")
+    RATE_LIMIT_VERIFY_OTP_EMAIL = os.getenv("RATE_LIMIT_VERIFY_OTP_EMAIL", "5/300")
+    RATE_LIMIT_BOOKING_IP = os.getenv("RATE_LIMIT_BOOKING_IP", "60/60")
+    RATE_LIMIT_BOOKING_USER = os.getenv("RATE_LIMIT_BOOKING_USER", "10/60")
+    # Requests that queued longer than this (seconds) get 503; 0 disables
+    LOAD_SHED_MAX_WAIT = float(os.getenv("LOAD_SHED_MAX_WAIT", "10"))
+    
+    # Payment webhook inbox ('flask process-payment-webhooks' workers)
+    WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "20"))
+    WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+    # First retry delay in seconds, doubled per attempt
+    WEBHOOK_RETRY_DELAY = int(os.getenv("WEBHOOK_RETRY_DELAY", "5"))
+    # A claimed event whose worker died is picked up again after this long
+    WEBHOOK_LEASE_SECONDS = int(os.getenv("WEBHOOK_LEASE_SECONDS", "120"))
+    
+    # Reconciliation of payments whose webhook never arrived
+    # ('flask reconcile-payments'); RECONCILE_OLDER_THAN is in seconds
+    RECONCILE_OLDER_THAN = int(os.getenv("RECONCILE_OLDER_THAN", str(15 * 60)))
+    RECONCILE_BATCH_SIZE = int(os.getenv("RECONCILE_BATCH_SIZE", "100"))
+    RECONCILE_WORKERS = int(os.getenv("RECONCILE_WORKERS", "8"))
+    # A claimed payment is not checked again (by any node) for this long
+    RECONCILE_LEASE = int(os.getenv("RECONCILE_LEASE", "300"))
+
+    # Event notification campaigns ('flask send-notifications'): recipients
+    # per batch, parallel SMTP sessions, and seconds before a campaign whose
+    # runner died may be resumed by another
+    NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "500"))
+    NOTIFICATION_WORKERS = int(os.getenv("NOTIFICATION_WORKERS", "4"))
+    NOTIFICATION_LEASE = int(os.getenv("NOTIFICATION_LEASE", "600"))
+    # Reminders go out for events starting within this many hours
+    REMINDER_LEAD_HOURS = int(os.getenv("REMINDER_LEAD_HOURS", "24"))
+
+    # Catalog Configuration
+    EVENT_COUNT_CACHE_TTL = int(os.getenv("EVENT_COUNT_CACHE_TTL", "60"))
+    
+    # Event detail cache (per-worker LRU in front of Redis)
+    EVENT_CACHE_ENABLED = os.getenv("EVENT_CACHE_ENABLED", "true").lower() == "true"
+    EVENT_CACHE_LOCAL_TTL = int(os.getenv("EVENT_CACHE_LOCAL_TTL", "5"))
+    EVENT_CACHE_REDIS_TTL = int(os.getenv("EVENT_CACHE_REDIS_TTL", "60"))
+    
+    # Catalog listing response cache (invalidated by a global version counter)
+    CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE_ENABLED", "true").lower() == "true"
+    CATALOG_CACHE_TTL_MIN = int(os.getenv("CATALOG_CACHE_TTL_MIN", "30"))
+    CATALOG_CACHE_TTL_MAX = int(os.getenv("CATALOG_CACHE_TTL_MAX", "90"))
+    
+    # HTTP caching (browsers/nginx revalidate with ETag once max-age passes)
+    EVENT_HTTP_MAX_AGE = int(os.getenv("EVENT_HTTP_MAX_AGE", "0"))
+    CATALOG_HTTP_MAX_AGE = int(os.getenv("CATALOG_HTTP_MAX_AGE", "10"))
+    
+    # Password hashing (process pool per web worker; 0 workers hashes inline).
+    # Stored hashes are upgraded to PASSWORD_HASH_METHOD at login.
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    # Hashes queued or running per web worker; beyond that callers wait up to
+    # PASSWORD_HASH_WAIT seconds and then get 503
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "8"))
+    PASSWORD_HASH_WAIT = float(os.getenv("PASSWORD_HASH_WAIT", "2"))
+    
     # Email Configuration
     SMTP_USER = os.getenv("SMTP_USER")
     SMTP_PASS = os.getenv("SMTP_PASS")
@@ -50,6 +159,14 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    EVENT_COUNT_CACHE_TTL = 0
+    EVENT_CACHE_ENABLED = False
+    CATALOG_CACHE_ENABLED = False
+    STORAGE_BACKEND = 'local'
+    FLASH_SALE_BACKEND = 'local'
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    PASSWORD_HASH_WORKERS = 0
+    RATE_LIMIT_ENABLED = False
 
 
 # Configuration dictionary
@@ -0,0 +1,11 @@
+--
+-- Keyset pagination indexes for the public event catalog.
+-- Each index matches one ORDER BY in EventService.get_all_events (EVENT_SORTS)
+-- so a cursor page is a single index range scan.
+--
+
+CREATE INDEX IF NOT EXISTS idx_events_approved_created_at
+    ON public.events USING btree (approved, created_at DESC, event_id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_events_approved_start_time
+    ON public.events USING btree (approved, start_time, event_id);
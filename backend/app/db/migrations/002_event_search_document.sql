@@ -0,0 +1,15 @@
+--
+-- Accent-insensitive catalog search.
+-- events.search_document holds the lowercased, tone-stripped text built by
+-- Event.refresh_search_document(); the trigram index serves the
+-- LIKE '%term%' filters and word_similarity() ranking in
+-- EventService.get_all_events. Run 'flask reindex-events' after applying
+-- to fill the column for existing rows.
+--
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE public.events ADD COLUMN IF NOT EXISTS search_document text;
+
+CREATE INDEX IF NOT EXISTS idx_events_search_document_trgm
+    ON public.events USING gin (search_document public.gin_trgm_ops);
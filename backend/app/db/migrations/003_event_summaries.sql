@@ -0,0 +1,39 @@
+--
+-- Denormalized per-event price/inventory summary read by the catalog
+-- listings instead of aggregating MIN(price) over all tickets per request.
+-- Maintained by InventoryService.refresh_event_summary; the INSERT below
+-- backfills (or re-syncs) every existing event.
+--
+
+CREATE TABLE IF NOT EXISTS public.event_summaries (
+    event_id integer NOT NULL,
+    min_price numeric(10,2),
+    max_price numeric(10,2),
+    remaining_quantity integer DEFAULT 0 NOT NULL,
+    sold_out boolean DEFAULT true NOT NULL,
+    updated_at timestamp without time zone DEFAULT now() NOT NULL,
+    CONSTRAINT event_summaries_pkey PRIMARY KEY (event_id),
+    CONSTRAINT event_summaries_event_id_fkey FOREIGN KEY (event_id)
+        REFERENCES public.events(event_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_event_summaries_price
+    ON public.event_summaries USING btree (min_price, max_price);
+
+INSERT INTO public.event_summaries (event_id, min_price, max_price, remaining_quantity, sold_out, updated_at)
+SELECT
+    e.event_id,
+    MIN(t.price),
+    MAX(t.price),
+    COALESCE(SUM(t.quantity), 0),
+    COALESCE(SUM(t.quantity), 0) <= 0,
+    now()
+FROM public.events e
+LEFT JOIN public.tickets t ON t.event_id = e.event_id
+GROUP BY e.event_id
+ON CONFLICT (event_id) DO UPDATE SET
+    min_price = EXCLUDED.min_price,
+    max_price = EXCLUDED.max_price,
+    remaining_quantity = EXCLUDED.remaining_quantity,
+    sold_out = EXCLUDED.sold_out,
+    updated_at = EXCLUDED.updated_at;
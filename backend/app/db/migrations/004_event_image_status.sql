@@ -0,0 +1,9 @@
+--
+-- Event images are uploaded in the background after the event is created.
+-- NULL = no image, 'pending' = spooled and waiting for upload,
+-- 'ready' = image_url is set, 'failed' = retry with 'flask retry-image-uploads'.
+--
+
+ALTER TABLE public.events ADD COLUMN IF NOT EXISTS image_status character varying(20);
+
+UPDATE public.events SET image_status = 'ready' WHERE image_url IS NOT NULL AND image_status IS NULL;
@@ -0,0 +1,6 @@
+--
+-- Resized WebP/JPEG copies of each event image, generated after the image is
+-- stored. NULL until generated; backfill with 'flask generate-image-variants'.
+--
+
+ALTER TABLE public.events ADD COLUMN IF NOT EXISTS image_variants jsonb;
@@ -0,0 +1,43 @@
+--
+-- Time-boxed inventory holds. Creating a booking reserves quantity for
+-- BOOKING_HOLD_TTL seconds (the PayOS link lifetime); payment converts the
+-- holds into sales and 'flask release-expired-holds' returns expired ones.
+-- tickets.held_quantity is the running total of active holds, so
+-- availability is quantity - held_quantity without scanning bookings.
+--
+
+ALTER TABLE public.tickets ADD COLUMN IF NOT EXISTS held_quantity integer DEFAULT 0 NOT NULL;
+
+CREATE TABLE IF NOT EXISTS public.ticket_holds (
+    hold_id serial NOT NULL,
+    booking_id integer NOT NULL,
+    ticket_id integer NOT NULL,
+    quantity integer NOT NULL,
+    status character varying(20) DEFAULT 'active' NOT NULL,
+    expires_at timestamp without time zone NOT NULL,
+    created_at timestamp without time zone DEFAULT now() NOT NULL,
+    CONSTRAINT ticket_holds_pkey PRIMARY KEY (hold_id),
+    CONSTRAINT ticket_holds_booking_id_fkey FOREIGN KEY (booking_id)
+        REFERENCES public.bookings(booking_id) ON DELETE CASCADE,
+    CONSTRAINT ticket_holds_ticket_id_fkey FOREIGN KEY (ticket_id)
+        REFERENCES public.tickets(ticket_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_ticket_holds_booking
+    ON public.ticket_holds USING btree (booking_id);
+
+-- The sweeper only ever reads active holds in expiry order
+CREATE INDEX IF NOT EXISTS idx_ticket_holds_active_expiry
+    ON public.ticket_holds USING btree (expires_at, hold_id) WHERE status = 'active';
+
+-- Availability now excludes held quantity
+UPDATE public.event_summaries s SET
+    remaining_quantity = agg.remaining,
+    sold_out = agg.remaining <= 0,
+    updated_at = now()
+FROM (
+    SELECT event_id, COALESCE(SUM(quantity - held_quantity), 0) AS remaining
+    FROM public.tickets
+    GROUP BY event_id
+) agg
+WHERE agg.event_id = s.event_id;
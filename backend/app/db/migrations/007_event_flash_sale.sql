@@ -0,0 +1,8 @@
+--
+-- Flash-sale mode: bookings for these events reserve inventory through
+-- atomic Redis counters instead of locking ticket rows; held quantities are
+-- reconciled into Postgres asynchronously. Rebuild counters with
+-- 'flask rebuild-flash-counters'.
+--
+
+ALTER TABLE public.events ADD COLUMN IF NOT EXISTS flash_sale boolean DEFAULT false NOT NULL;
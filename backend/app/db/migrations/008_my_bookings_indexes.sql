@@ -0,0 +1,10 @@
+--
+-- Indexes for the "my bookings" page (BookingService.get_user_bookings):
+-- the user's bookings in keyset order, and the select-in load of their lines.
+--
+
+CREATE INDEX IF NOT EXISTS idx_bookings_user_booking_date
+    ON public.bookings USING btree (user_id, booking_date DESC, booking_id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_booking_lines_booking
+    ON public.booking_lines USING btree (booking_id);
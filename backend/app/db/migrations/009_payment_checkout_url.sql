@@ -0,0 +1,10 @@
+--
+-- Two-phase PayOS checkout: the pending payment is committed before the
+-- gateway call and the checkout URL recorded afterwards, so a retry can
+-- resume the link instead of calling PayOS again. Payments are looked up by
+-- order code (transaction_id) on every checkout and webhook.
+--
+
+ALTER TABLE public.payments ADD COLUMN IF NOT EXISTS checkout_url character varying(500);
+
+CREATE INDEX IF NOT EXISTS payments_transaction_id_idx ON public.payments USING btree (transaction_id);
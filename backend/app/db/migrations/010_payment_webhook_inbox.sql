@@ -0,0 +1,27 @@
+--
+-- Payment webhook inbox. The webhook route only verifies the checksum and
+-- inserts here (one row per order code, so gateway retries are no-ops);
+-- 'flask process-payment-webhooks' workers claim rows with
+-- FOR UPDATE SKIP LOCKED and apply them.
+--
+
+CREATE TABLE IF NOT EXISTS public.payment_webhook_events (
+    event_id serial NOT NULL,
+    provider character varying(20) DEFAULT 'payos' NOT NULL,
+    order_code integer NOT NULL,
+    payload json NOT NULL,
+    status character varying(20) DEFAULT 'pending' NOT NULL,
+    attempts integer DEFAULT 0 NOT NULL,
+    last_error text,
+    received_at timestamp without time zone DEFAULT now() NOT NULL,
+    available_at timestamp without time zone DEFAULT now() NOT NULL,
+    claimed_at timestamp without time zone,
+    processed_at timestamp without time zone,
+    CONSTRAINT payment_webhook_events_pkey PRIMARY KEY (event_id),
+    CONSTRAINT payment_webhook_events_order_key UNIQUE (provider, order_code)
+);
+
+-- Workers only scan claimable rows
+CREATE INDEX IF NOT EXISTS payment_webhook_events_claim_idx
+    ON public.payment_webhook_events USING btree (available_at, event_id)
+    WHERE status IN ('pending', 'processing');
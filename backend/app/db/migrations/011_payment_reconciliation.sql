@@ -0,0 +1,12 @@
+--
+-- Reconciliation of pending payments whose webhook never arrived
+-- ('flask reconcile-payments'). reconcile_after leases a claimed payment to
+-- one reconciler and spaces out re-checks of links that are still open.
+--
+
+ALTER TABLE public.payments ADD COLUMN IF NOT EXISTS reconcile_after timestamp without time zone;
+
+-- Reconcilers scan only pending payments, in id order
+CREATE INDEX IF NOT EXISTS payments_pending_idx
+    ON public.payments USING btree (payment_id)
+    WHERE payment_status = 'pending';
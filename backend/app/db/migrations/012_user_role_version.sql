@@ -0,0 +1,7 @@
+--
+-- Access tokens carry the user's role and role_version as claims, so admin
+-- routes authorize without reading users. AdminService bumps role_version
+-- on a role change, which revokes tokens issued with the old role.
+--
+
+ALTER TABLE public.users ADD COLUMN IF NOT EXISTS role_version integer DEFAULT 0 NOT NULL;
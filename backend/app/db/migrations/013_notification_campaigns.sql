@@ -0,0 +1,50 @@
+--
+-- Event notification campaigns (reminders, change announcements) and the
+-- per-booking delivery outcome of each. 'flask send-notifications' streams
+-- the recipients of a campaign in booking_id order and checkpoints
+-- last_booking_id after every batch, so an interrupted run resumes.
+--
+
+CREATE TABLE IF NOT EXISTS public.notification_campaigns (
+    campaign_id serial NOT NULL,
+    event_id integer NOT NULL,
+    kind character varying(20) NOT NULL,
+    dedupe_key character varying(100),
+    context json DEFAULT '{}' NOT NULL,
+    status character varying(20) DEFAULT 'pending' NOT NULL,
+    total integer DEFAULT 0 NOT NULL,
+    sent integer DEFAULT 0 NOT NULL,
+    failed integer DEFAULT 0 NOT NULL,
+    last_booking_id integer DEFAULT 0 NOT NULL,
+    created_at timestamp without time zone DEFAULT now() NOT NULL,
+    claimed_at timestamp without time zone,
+    started_at timestamp without time zone,
+    finished_at timestamp without time zone,
+    CONSTRAINT notification_campaigns_pkey PRIMARY KEY (campaign_id),
+    CONSTRAINT notification_campaigns_dedupe_key UNIQUE (event_id, kind, dedupe_key),
+    CONSTRAINT notification_campaigns_event_id_fkey FOREIGN KEY (event_id)
+        REFERENCES public.events (event_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS notification_campaigns_open_idx
+    ON public.notification_campaigns USING btree (campaign_id)
+    WHERE status IN ('pending', 'running');
+
+CREATE TABLE IF NOT EXISTS public.campaign_recipients (
+    campaign_id integer NOT NULL,
+    booking_id integer NOT NULL,
+    email character varying(100) NOT NULL,
+    status character varying(20) NOT NULL,
+    error text,
+    processed_at timestamp without time zone DEFAULT now() NOT NULL,
+    CONSTRAINT campaign_recipients_pkey PRIMARY KEY (campaign_id, booking_id),
+    CONSTRAINT campaign_recipients_campaign_id_fkey FOREIGN KEY (campaign_id)
+        REFERENCES public.notification_campaigns (campaign_id) ON DELETE CASCADE,
+    CONSTRAINT campaign_recipients_booking_id_fkey FOREIGN KEY (booking_id)
+        REFERENCES public.bookings (booking_id) ON DELETE CASCADE
+);
+
+-- Recipients are streamed per event in booking_id order
+CREATE INDEX IF NOT EXISTS bookings_event_confirmed_idx
+    ON public.bookings USING btree (event_id, booking_id)
+    WHERE status = 'confirmed';
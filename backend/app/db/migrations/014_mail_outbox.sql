@@ -0,0 +1,32 @@
+--
+-- Outbox for transactional mail (OTP codes, booking confirmations). The web
+-- request only inserts the serialized message here; 'flask send-mail'
+-- workers claim rows with FOR UPDATE SKIP LOCKED, send them over persistent
+-- SMTP sessions and retry failures with backoff, so a restarted web worker
+-- no longer loses mail it has already accepted.
+--
+
+CREATE TABLE IF NOT EXISTS public.mail_outbox (
+    mail_id serial NOT NULL,
+    recipient character varying(255) NOT NULL,
+    subject character varying(255),
+    message text NOT NULL,
+    status character varying(20) DEFAULT 'pending' NOT NULL,
+    attempts integer DEFAULT 0 NOT NULL,
+    last_error text,
+    created_at timestamp without time zone DEFAULT now() NOT NULL,
+    available_at timestamp without time zone DEFAULT now() NOT NULL,
+    claimed_at timestamp without time zone,
+    processed_at timestamp without time zone,
+    CONSTRAINT mail_outbox_pkey PRIMARY KEY (mail_id)
+);
+
+-- Workers only scan claimable rows
+CREATE INDEX IF NOT EXISTS mail_outbox_claim_idx
+    ON public.mail_outbox USING btree (available_at, mail_id)
+    WHERE status IN ('pending', 'sending');
+
+-- Failed mail is counted for alerting
+CREATE INDEX IF NOT EXISTS mail_outbox_failed_idx
+    ON public.mail_outbox USING btree (processed_at)
+    WHERE status = 'failed';
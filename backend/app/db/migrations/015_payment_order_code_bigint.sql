@@ -0,0 +1,10 @@
+--
+-- Order codes outgrow integer: every checkout attempt that needs a new PayOS
+-- link adds 10^9 to the booking's order code (see ORDER_CODE_STRIDE), so the
+-- third such attempt is past 2^31 - 1. bigint holds far more attempts than
+-- PayOS accepts (order codes up to 2^53 - 1). Re-running this is a no-op.
+--
+
+ALTER TABLE public.payments ALTER COLUMN transaction_id TYPE bigint;
+
+ALTER TABLE public.payment_webhook_events ALTER COLUMN order_code TYPE bigint;
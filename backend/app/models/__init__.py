@@ -1,7 +1,8 @@
 # SQLAlchemy models
 from .user import User
-from .event import Event, Ticket
-from .booking import Booking, BookingLine
-from .payment import Payment, Cancellation
+from .event import Event, Ticket, EventSummary
+from .booking import Booking, BookingLine, TicketHold
+from .payment import Payment, PaymentWebhookEvent, Cancellation
+from .notification import NotificationCampaign, CampaignRecipient, OutboundEmail
 
-__all__ = ['User', 'Event', 'Ticket', 'Booking', 'BookingLine', 'Payment', 'Cancellation']
+__all__ = ['User', 'Event', 'Ticket', 'EventSummary', 'Booking', 'BookingLine', 'TicketHold', 'Payment', 'PaymentWebhookEvent', 'Cancellation', 'NotificationCampaign', 'CampaignRecipient', 'OutboundEmail']
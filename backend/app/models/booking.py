@@ -18,6 +18,7 @@ class Booking(db.Model):
     booking_lines = db.relationship('BookingLine', backref='booking', lazy=True, cascade='all, delete-orphan')
     payments = db.relationship('Payment', backref='booking', lazy=True)
     cancellations = db.relationship('Cancellation', backref='booking', lazy=True)
+    holds = db.relationship('TicketHold', backref='booking', lazy=True, passive_deletes=True)
     
     def __repr__(self):
         return f'<Booking {self.id}>'
@@ -32,3 +33,18 @@ class BookingLine(db.Model):
     
     def __repr__(self):
         return f'<BookingLine {self.booking_line_id}>'
+
+class TicketHold(db.Model):
+    """Quantity of a ticket reserved for a pending booking until ``expires_at``"""
+    __tablename__ = 'ticket_holds'
+    hold_id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('bookings.booking_id', ondelete='CASCADE'), nullable=False)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.ticket_id', ondelete='CASCADE'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    # 'active' -> 'converted' (paid) / 'released' (expired or cancelled)
+    status = db.Column(db.String(20), nullable=False, default='active')
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<TicketHold {self.hold_id}>'
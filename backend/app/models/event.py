@@ -1,5 +1,6 @@
 # Event model
 from app.extensions import db
+from app.utils.text_utils import build_search_document
 from datetime import datetime
 
 
@@ -9,6 +10,10 @@ class Event(db.Model):
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     image_url = db.Column(db.String(255), nullable=True)
+    # None when no image was uploaded, else 'pending' -> 'ready' / 'failed'
+    image_status = db.Column(db.String(20), nullable=True)
+    # Object keys of the resized copies: {"webp": {"320": key, ...}, "jpg": {...}}
+    image_variants = db.Column(db.JSON(none_as_null=True), nullable=True)
     start_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime, nullable=True)
     venue_name = db.Column(db.String(100), nullable=False)
@@ -20,10 +25,22 @@ class Event(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     organizer_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=True)
+    # Bookings reserve through the Redis inventory gate (FlashSaleService)
+    flash_sale = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     approved=db.Column(db.Enum('approved','pending','rejected', name='event_approval_status'), nullable=False, default='pending')
+    # Lowercased, tone-stripped name/description/venue used by catalog search
+    search_document = db.Column(db.Text, nullable=True)
     # Relationships
     bookings = db.relationship('Booking', backref='event', lazy=True)
     tickets = db.relationship('Ticket', backref='event', passive_deletes=True)
+    summary = db.relationship('EventSummary', backref='event', uselist=False, passive_deletes=True)
+    
+    def refresh_search_document(self):
+        """Rebuild the stored search document from the current text fields"""
+        self.search_document = build_search_document(
+            self.name, self.description, self.venue_name, self.category, self.province
+        )
+    
     def __repr__(self):
         return f'<Event {self.name}>'
 
@@ -33,6 +50,8 @@ class Ticket(db.Model):
     name = db.Column(db.String(10), nullable=False)
     price = db.Column(db.Numeric(10, 2), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
+    # Sum of active TicketHold quantities; available = quantity - held_quantity
+    held_quantity = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     event_id = db.Column(
         db.Integer,
         db.ForeignKey("events.event_id"),
@@ -42,5 +61,29 @@ class Ticket(db.Model):
     
     # Relationships
     booking_lines = db.relationship('BookingLine', backref='ticket', lazy=True)
+    
+    @property
+    def available_quantity(self):
+        """Quantity that can still be booked (not sold and not held)"""
+        return self.quantity - (self.held_quantity or 0)
+    
+    def __repr__(self):
+        return f'<Ticket {self.name}>'
+
+class EventSummary(db.Model):
+    """Denormalized price/inventory figures per event, kept in step with tickets
+    by InventoryService.refresh_event_summary"""
+    __tablename__ = 'event_summaries'
+    event_id = db.Column(
+        db.Integer,
+        db.ForeignKey("events.event_id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    min_price = db.Column(db.Numeric(10, 2), nullable=True)
+    max_price = db.Column(db.Numeric(10, 2), nullable=True)
+    remaining_quantity = db.Column(db.Integer, nullable=False, default=0)
+    sold_out = db.Column(db.Boolean, nullable=False, default=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
     def __repr__(self):
-        return f'<Ticket {self.name}>'
\ No newline at end of file
+        return f'<EventSummary {self.event_id}>'
@@ -0,0 +1,69 @@
+# Notification campaign models
+from app.extensions import db
+from datetime import datetime
+
+
+class NotificationCampaign(db.Model):
+    """One email to every confirmed booking of an event (a reminder or a
+    change announcement), sent in batches by 'flask send-notifications'"""
+    __tablename__ = 'notification_campaigns'
+    __table_args__ = (db.UniqueConstraint('event_id', 'kind', 'dedupe_key', name='notification_campaigns_dedupe_key'),)
+    campaign_id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('events.event_id', ondelete='CASCADE'), nullable=False)
+    # 'reminder' or 'change'
+    kind = db.Column(db.String(20), nullable=False)
+    # Keeps a campaign from being created twice, e.g. one reminder per start time
+    dedupe_key = db.Column(db.String(100), nullable=True)
+    # Template values fixed at creation (e.g. what changed)
+    context = db.Column(db.JSON, nullable=False, default=dict)
+    # 'pending' -> 'running' -> 'done'
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    total = db.Column(db.Integer, nullable=False, default=0)
+    sent = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    # Recipients are streamed in booking_id order; a resumed run starts after this
+    last_booking_id = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<NotificationCampaign {self.campaign_id} {self.kind}>'
+
+
+class CampaignRecipient(db.Model):
+    """Delivery outcome of a campaign for one booking"""
+    __tablename__ = 'campaign_recipients'
+    campaign_id = db.Column(db.Integer, db.ForeignKey('notification_campaigns.campaign_id', ondelete='CASCADE'), primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('bookings.booking_id', ondelete='CASCADE'), primary_key=True)
+    email = db.Column(db.String(100), nullable=False)
+    # 'sent' / 'failed'
+    status = db.Column(db.String(20), nullable=False)
+    error = db.Column(db.Text, nullable=True)
+    processed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CampaignRecipient {self.campaign_id}:{self.booking_id}>'
+
+
+class OutboundEmail(db.Model):
+    """A transactional email (OTP, booking confirmation) stored by the web
+    request and delivered by the 'flask send-mail' workers"""
+    __tablename__ = 'mail_outbox'
+    mail_id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=True)
+    # The serialized message, sent as is
+    message = db.Column(db.Text, nullable=False)
+    # 'pending' -> 'sending' -> 'sent' / 'failed'
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    processed_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<OutboundEmail {self.mail_id} {self.status}>'
@@ -10,12 +10,36 @@ class Payment(db.Model):
     payment_method = db.Column(db.String(50), nullable=True)
     payment_status = db.Column(db.Enum('pending', 'completed', 'failed', name='payment_status'), nullable=False)
     amount = db.Column(db.Numeric(10, 2), nullable=False)
-    transaction_id = db.Column(db.Integer, nullable=True)
+    transaction_id = db.Column(db.BigInteger, nullable=True, index=True)
+    checkout_url = db.Column(db.String(500), nullable=True)
+    # Reconcilers skip the payment until then (lease / next check)
+    reconcile_after = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     def __repr__(self):
         return f'<Payment {self.id}>'
 
+class PaymentWebhookEvent(db.Model):
+    """A verified gateway webhook waiting to be applied (one per order code)"""
+    __tablename__ = 'payment_webhook_events'
+    __table_args__ = (db.UniqueConstraint('provider', 'order_code', name='payment_webhook_events_order_key'),)
+    event_id = db.Column(db.Integer, primary_key=True)
+    provider = db.Column(db.String(20), nullable=False, default='payos')
+    order_code = db.Column(db.BigInteger, nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    # 'pending' -> 'processing' -> 'done' / 'ignored' (no such payment) / 'failed'
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    processed_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<PaymentWebhookEvent {self.provider}:{self.order_code}>'
+
+
 class Cancellation(db.Model):
     __tablename__ = 'cancellations'
     cancel_id = db.Column(db.Integer, primary_key=True)
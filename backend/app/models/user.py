@@ -11,6 +11,8 @@ class User(db.Model):
     phone_number = db.Column(db.String(20), nullable=True)
     role = db.Column(db.Enum('user','organizer', 'admin', name='user_roles'),default='user' ,nullable=True)
     password_hash = db.Column(db.String(255), nullable=False)
+    # Bumped on role changes; tokens carrying an older version are rejected
+    role_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     gender = db.Column(db.String(10), nullable=True)
     birth_date = db.Column(db.Date, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -1,6 +1,5 @@
 # Admin routes
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 from datetime import datetime, date
 from app.extensions import db
 from app.models.user import User
@@ -8,34 +7,23 @@ from app.models.event import Event
 from app.models.booking import Booking, BookingLine
 from app.models.payment import Payment, Cancellation
 from app.services.admin_service import AdminService
+from app.services.event_service import EventService
+from app.services.flash_sale_service import FlashSaleService
+from app.services.mail_service import MailService
+from app.services.notification_service import NotificationService
+from app.utils import metrics, waiting_room
+from app.utils.auth import require_role
 from sqlalchemy import func, desc
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
 
-# Middleware to check if user is admin
-def admin_required():
-    try:
-        verify_jwt_in_request()
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        if not user or user.role != 'admin':
-            return jsonify({'success': False, 'message': 'Chỉ admin mới có quyền truy cập'}), 403
-        return None
-    except Exception as e:
-        print(f"Admin verification failed: {str(e)}", flush=True)
-        return jsonify({'success': False, 'message': 'Cần đăng nhập với quyền admin'}), 401
-
-
 # ==================== USER MANAGEMENT ====================
 
 @admin_bp.route('/users', methods=['GET'])
+@require_role('admin')
 def get_users():
     """Get all users with filtering and pagination"""
-    auth_error = admin_required()
-    if auth_error:
-        return auth_error
-    
     try:
         role = request.args.get('role')
         search = request.args.get('search')
@@ -89,12 +77,9 @@ def get_users():
 
 
 @admin_bp.route('/users/<int:user_id>', methods=['GET'])
+@require_role('admin')
 def get_user(user_id):
     """Get user by ID with statistics"""
-    auth_error = admin_required()
-    if auth_error:
-        return auth_error
-    
     try:
         result, status_code = AdminService.get_user_by_id(user_id)
         return jsonify(result), status_code
@@ -104,15 +89,12 @@ def get_user(user_id):
 
 
 @admin_bp.route('/users/<int:user_id>', methods=['PUT', 'OPTIONS'])
+@require_role('admin')
 def update_user(user_id):
     """Update user information"""
     if request.method == 'OPTIONS':
         return '', 200
     
-    auth_error = admin_required()
-    if auth_error:
-        return auth_error
-    
     try:
         data = request.get_json()
         result, status_code = AdminService.update_user(user_id, data)
@@ -124,15 +106,12 @@ def update_user(user_id):
 
 
 @admin_bp.route('/users/<int:user_id>', methods=['DELETE', 'OPTIONS'])
+@require_role('admin')
 def delete_user(user_id):
     """Delete a user"""
     if request.method == 'OPTIONS':
         return '', 200
     
-    auth_error = admin_required()
-    if auth_error:
-        return auth_error
-    
     try:
         result, status_code = AdminService.delete_user(user_id)
         return jsonify(result), status_code
@@ -145,12 +124,9 @@ def delete_user(user_id):
 # ==================== EVENT MANAGEMENT ====================
 
 @admin_bp.route('/events', methods=['GET'])
+@require_role('admin')
 def get_all_events():
     """Get all events (admin view) with statistics"""
-    auth_error = admin_required()
-    if auth_error:
-        return auth_error
-    
     try:
         category = request.args.get('category')
         status = request.args.get('status')
@@ -231,15 +207,12 @@ def get_all_events():
 
 
 @admin_bp.route('/events/<int:event_id>/approval', methods=['PUT', 'OPTIONS'])
+@require_role('admin')
 def update_event_approval(event_id):
     """Update event approval status"""
     if request.method == 'OPTIONS':
         return '', 200
     
-    auth_error = admin_required()
-    if auth_error:
-        return auth_error
-    
     try:
         event = Event.query.get(event_id)
         if not event:
@@ -254,6 +227,7 @@ def update_event_approval(event_id):
         event.approved = new_status
         event.updated_at = datetime.utcnow()
         db.session.commit()
+        EventService.invalidate_event(event_id)
         
         status_message = {
             'approved': 'Sự kiện đã được phê duyệt',
@@ -276,16 +250,73 @@ def update_event_approval(event_id):
         return jsonify({'success': False, 'message': 'Đã xảy ra lỗi khi cập nhật trạng thái phê duyệt: ' + str(e)}), 500
 
 
+@admin_bp.route('/events/<int:event_id>/flash-sale', methods=['PUT', 'OPTIONS'])
+@require_role('admin')
+def update_flash_sale(event_id):
+    """Turn flash-sale inventory mode on or off for an event"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data.get('enabled'), bool):
+            return jsonify({'success': False, 'message': 'Trạng thái không hợp lệ'}), 400
+        
+        result, status_code = FlashSaleService.set_flash_sale(event_id, data['enabled'])
+        return jsonify(result), status_code
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error updating flash sale: {str(e)}", flush=True)
+        return jsonify({'success': False, 'message': 'Đã xảy ra lỗi khi cập nhật chế độ flash sale: ' + str(e)}), 500
+
+
+@admin_bp.route('/events/<int:event_id>/waiting-room', methods=['PUT', 'OPTIONS'])
+@require_role('admin')
+def update_waiting_room(event_id):
+    """Open, close or re-rate an event's waiting room (``rate`` admissions/second, 0 closes it)"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        rate = int(data.get('rate', 0))
+        if rate < 0:
+            raise ValueError(rate)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Tốc độ vào không hợp lệ'}), 400
+    
+    try:
+        if not db.session.get(Event, event_id):
+            return jsonify({'success': False, 'message': 'Không tìm thấy sự kiện'}), 404
+        rate = waiting_room.set_rate(event_id, rate)
+        return jsonify({
+            'success': True,
+            'waitingRoom': {'eventId': event_id, 'open': rate > 0, 'rate': rate}
+        }), 200
+    except Exception as e:
+        print(f"Error updating waiting room: {str(e)}", flush=True)
+        return jsonify({'success': False, 'message': 'Đã xảy ra lỗi khi cập nhật phòng chờ: ' + str(e)}), 500
+
+
+@admin_bp.route('/events/<int:event_id>/notifications', methods=['GET'])
+@require_role('admin')
+def get_event_notifications(event_id):
+    """Progress of the event's reminder and change-announcement campaigns"""
+    try:
+        result, status_code = NotificationService.get_event_campaigns(event_id)
+        return jsonify(result), status_code
+    except Exception as e:
+        print(f"Error fetching notification campaigns: {str(e)}", flush=True)
+        return jsonify({'success': False, 'message': 'Đã xảy ra lỗi khi lấy tiến độ gửi thông báo: ' + str(e)}), 500
+
+
 @admin_bp.route('/events/<int:event_id>', methods=['DELETE', 'OPTIONS'])
+@require_role('admin')
 def delete_event(event_id):
     """Delete an event"""
     if request.method == 'OPTIONS':
         return '', 200
     
-    auth_error = admin_required()
-    if auth_error:
-        return auth_error
-    
     try:
         event = Event.query.get(event_id)
         if not event:
@@ -298,6 +329,7 @@ def delete_event(event_id):
         
         db.session.delete(event)
         db.session.commit()
+        EventService.invalidate_event(event_id)
         
         return jsonify({'success': True, 'message': 'Xóa sự kiện thành công'}), 200
     except Exception as e:
@@ -309,12 +341,9 @@ def delete_event(event_id):
 # ==================== BOOKING MANAGEMENT ====================
 
 @admin_bp.route('/bookings', methods=['GET'])
+@require_role('admin')
 def get_all_bookings():
     """Get all bookings (admin view)"""
-    auth_error = admin_required()
-    if auth_error:
-        return auth_error
-    
     try:
         status = request.args.get('status')
         event_id = request.args.get('event_id')
@@ -389,12 +418,9 @@ def get_all_bookings():
 
 
 @admin_bp.route('/bookings/<int:booking_id>', methods=['GET'])
+@require_role('admin')
 def get_booking(booking_id):
     """Get booking by ID"""
-    auth_error = admin_required()
-    if auth_error:
-        return auth_error
-    
     try:
         result, status_code = AdminService.get_booking_by_id(booking_id)
         return jsonify(result), status_code
@@ -404,15 +430,12 @@ def get_booking(booking_id):
 
 
 @admin_bp.route('/bookings/<int:booking_id>/status', methods=['PUT', 'OPTIONS'])
+@require_role('admin')
 def update_booking_status(booking_id):
     """Update booking status"""
     if request.method == 'OPTIONS':
         return '', 200
     
-    auth_error = admin_required()
-    if auth_error:
-        return auth_error
-    
     try:
         data = request.get_json()
         status = data.get('status')
@@ -430,12 +453,9 @@ def update_booking_status(booking_id):
 
 @admin_bp.route('/stats', methods=['GET'])
 @admin_bp.route('/dashboard/stats', methods=['GET'])
+@require_role('admin')
 def get_stats():
     """Get system statistics"""
-    auth_error = admin_required()
-    if auth_error:
-        return auth_error
-    
     try:
         total_users = User.query.count()
         total_events = Event.query.count()
@@ -479,12 +499,9 @@ def get_stats():
 
 
 @admin_bp.route('/dashboard/recent-bookings', methods=['GET'])
+@require_role('admin')
 def get_recent_bookings():
     """Get recent bookings"""
-    auth_error = admin_required()
-    if auth_error:
-        return auth_error
-    
     try:
         limit = int(request.args.get('limit', 10))
         result, status_code = AdminService.get_recent_bookings(limit)
@@ -495,12 +512,9 @@ def get_recent_bookings():
 
 
 @admin_bp.route('/dashboard/top-events', methods=['GET'])
+@require_role('admin')
 def get_top_events():
     """Get top events by tickets sold"""
-    auth_error = admin_required()
-    if auth_error:
-        return auth_error
-    
     try:
         limit = int(request.args.get('limit', 10))
         result, status_code = AdminService.get_top_events(limit)
@@ -510,15 +524,31 @@ def get_top_events():
         return jsonify({'success': False, 'message': 'Đã xảy ra lỗi khi lấy sự kiện hàng đầu: ' + str(e)}), 500
 
 
+@admin_bp.route('/metrics', methods=['GET'])
+@require_role('admin')
+def get_metrics():
+    """Get cache and pipeline metrics of the worker serving this request"""
+    return jsonify({'success': True, 'metrics': metrics.snapshot()}), 200
+
+
+@admin_bp.route('/mail-outbox', methods=['GET'])
+@require_role('admin')
+def get_mail_outbox():
+    """Unsent backlog and recently failed transactional mail"""
+    try:
+        result, status_code = MailService.outbox_status()
+        return jsonify(result), status_code
+    except Exception as e:
+        print(f"Error fetching mail outbox: {str(e)}", flush=True)
+        return jsonify({'success': False, 'message': 'Đã xảy ra lỗi khi lấy trạng thái hàng đợi email: ' + str(e)}), 500
+
+
 # ==================== PAYMENT MANAGEMENT ====================
 
 @admin_bp.route('/payments', methods=['GET'])
+@require_role('admin')
 def get_payments():
     """Get all payments with filtering and pagination"""
-    auth_error = admin_required()
-    if auth_error:
-        return auth_error
-    
     try:
         status = request.args.get('status')
         page = int(request.args.get('page', 1))
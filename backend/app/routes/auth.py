@@ -2,6 +2,9 @@
 from flask import Blueprint, request, jsonify
 from app.services.auth_service import AuthService
 from app.extensions import db
+from app.utils.mail.outbox import MailQueueFull
+from app.utils.passwords import PasswordHasherBusy
+from app.utils.rate_limit import rate_limit, shed_load
 from flask_jwt_extended import  verify_jwt_in_request
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api')
@@ -20,13 +23,17 @@ def register():
         
         result, status_code = AuthService.register_user(data)
         return jsonify(result), status_code
-        
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Hệ thống đang quá tải, vui lòng thử lại sau'}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': 'Đã xảy ra lỗi khi đăng ký: ' + str(e)}), 500
 
 
 @auth_bp.route('/auth/login', methods=['POST', 'OPTIONS'])
+@shed_load('login')
+@rate_limit('login', ip='RATE_LIMIT_LOGIN_IP', email='RATE_LIMIT_LOGIN_EMAIL')
 def login():
     """User login endpoint"""
     if request.method == 'OPTIONS':
@@ -45,7 +52,9 @@ def login():
         
         result, status_code = AuthService.login_user(login_credential, password)
         return jsonify(result), status_code
-        
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Hệ thống đang quá tải, vui lòng thử lại sau'}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'success': False, 'message': 'Đã xảy ra lỗi khi đăng nhập'}), 500
 
@@ -63,6 +72,7 @@ def logout():
 
 
 @auth_bp.route('/auth/forgot-password', methods=['GET', 'OPTIONS'])
+@rate_limit('forgot_password', ip='RATE_LIMIT_FORGOT_PASSWORD_IP', email='RATE_LIMIT_FORGOT_PASSWORD_EMAIL')
 def forgot_password():
     """Send OTP for password reset"""
     if request.method == 'OPTIONS':
@@ -75,11 +85,14 @@ def forgot_password():
         
         result, status_code = AuthService.forgot_password(email)
         return jsonify(result), status_code
+    except MailQueueFull:
+        return jsonify({'success': False, 'message': 'Hệ thống đang quá tải, vui lòng thử lại sau'}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'success': False, 'message': f'Email không hợp lệ'}), 401
 
 
 @auth_bp.route('/auth/verify-otp', methods=['POST', 'OPTIONS'])
+@rate_limit('verify_otp', ip='RATE_LIMIT_VERIFY_OTP_IP', email='RATE_LIMIT_VERIFY_OTP_EMAIL')
 def verify_otp():
     """Verify OTP for password reset"""
     if request.method == 'OPTIONS':
@@ -115,6 +128,9 @@ def reset_password():
         
         result, status_code = AuthService.reset_password(email, new_password)
         return jsonify(result), status_code
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Hệ thống đang quá tải, vui lòng thử lại sau'}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': 'Đã xảy ra lỗi: ' + str(e)}), 500
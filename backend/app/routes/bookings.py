@@ -3,6 +3,9 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 from app.services.booking_service import BookingService
 from app.extensions import db
+from app.utils.waiting_room import admission_required
+from app.utils.idempotency import idempotent
+from app.utils.rate_limit import rate_limit, shed_load
 
 bookings_bp = Blueprint('bookings', __name__, url_prefix='/api')
 
@@ -23,8 +26,16 @@ def get_bookings():
     current_user_id = get_jwt_identity()
     
     try:
-        result, status_code = BookingService.get_user_bookings(current_user_id)
+        status = request.args.get('status') or None
+        cursor = request.args.get('cursor')
+        limit = int(request.args.get('limit', 20))
+        if limit < 1 or limit > 100:
+            return jsonify({'success': False, 'message': 'Invalid pagination parameters'}), 400
+        
+        result, status_code = BookingService.get_user_bookings(current_user_id, status, cursor, limit)
         return jsonify(result), status_code
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Error fetching user bookings: {str(e)}", flush=True)
         return jsonify({'success': False, 'message': 'Đã xảy ra lỗi khi lấy vé: ' + str(e)}), 500
@@ -54,6 +65,10 @@ def get_booking(booking_id):
 
 
 @bookings_bp.route('/bookings', methods=['POST', 'OPTIONS'])
+@shed_load('bookings')
+@rate_limit('bookings', ip='RATE_LIMIT_BOOKING_IP', user='RATE_LIMIT_BOOKING_USER')
+@admission_required(lambda: (request.get_json(silent=True) or {}).get('event_id'))
+@idempotent('bookings')
 def create_booking():
     """Create a new booking"""
     if request.method == 'OPTIONS':
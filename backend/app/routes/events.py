@@ -1,8 +1,12 @@
 # Event routes
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 from app.services.event_service import EventService
 from app.extensions import db
+from app.utils.http_cache import is_not_modified, not_modified_response, apply_cache_headers
+from app.utils import waiting_room
+from redis.exceptions import RedisError
+from datetime import datetime
 import json
 
 events_bp = Blueprint('events', __name__, url_prefix='/api')
@@ -16,9 +20,44 @@ def get_events():
         search = request.args.get('search')
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 10))
+        cursor = request.args.get('cursor')
+        sort = request.args.get('sort')
+        include_total = request.args.get('include_total')
+        if include_total is not None:
+            include_total = include_total.lower() in ('1', 'true', 'yes')
+        price_min = request.args.get('price_min', type=float)
+        price_max = request.args.get('price_max', type=float)
+        available_only = request.args.get('available', '').lower() in ('1', 'true', 'yes')
         
-        result, status_code = EventService.get_all_events(category, search, page, limit)
-        return jsonify(result), status_code
+        if page < 1 or limit < 1 or limit > 100:
+            return jsonify({"success": False, "message": "Invalid pagination parameters"}), 400
+        
+        query = dict(
+            category=category, search=search, page=page, limit=limit,
+            cursor=cursor, sort=sort, include_total=include_total,
+            price_min=price_min, price_max=price_max, available_only=available_only
+        )
+        cache_control = f"public, max-age={current_app.config['CATALOG_HTTP_MAX_AGE']}, must-revalidate"
+        
+        etag = EventService.get_catalog_etag(**query)
+        if etag and is_not_modified(etag):
+            return not_modified_response(etag, cache_control=cache_control)
+        
+        result, status_code = EventService.get_all_events(**query)
+        response = jsonify(result)
+        response.status_code = status_code
+        if etag:
+            return apply_cache_headers(response, etag, cache_control=cache_control)
+        
+        # No cache version to derive from: fall back to hashing the body
+        response.add_etag()
+        response.headers['Cache-Control'] = cache_control
+        return response.make_conditional(request)
+    except ValueError as exc:
+        return jsonify({
+            "success": False,
+            "message": str(exc)
+        }), 400
     except Exception as exc:
         print("Error fetching events:", str(exc), flush=True)
         return jsonify({
@@ -31,13 +70,61 @@ def get_events():
 def get_event(event_id):
     """Get single event by ID"""
     try:
-        result, status_code = EventService.get_event_by_id(event_id)
-        return jsonify(result), status_code
+        cache_control = f"public, max-age={current_app.config['EVENT_HTTP_MAX_AGE']}, must-revalidate"
+        
+        # Revalidation only needs the validators, not the tickets
+        if request.if_none_match or request.if_modified_since:
+            validators = EventService.get_event_validators(event_id)
+            if validators and is_not_modified(*validators):
+                return not_modified_response(*validators, cache_control=cache_control)
+        
+        detail = EventService.get_event_detail(event_id)
+        if detail is None:
+            return jsonify({'success': False, 'message': 'Không tìm thấy sự kiện'}), 404
+        
+        last_modified = detail['last_modified']
+        last_modified = datetime.fromisoformat(last_modified) if last_modified else None
+        response = jsonify({'success': True, 'event': detail['event']})
+        return apply_cache_headers(response, detail['etag'], last_modified, cache_control), 200
     except Exception as e:
         print(f"Error fetching event: {str(e)}", flush=True)
         return jsonify({'success': False, 'message': 'Đã xảy ra lỗi khi lấy sự kiện: ' + str(e)}), 500
 
 
+@events_bp.route('/events/<int:event_id>/waiting-room', methods=['POST', 'OPTIONS'])
+def join_waiting_room(event_id):
+    """Join the event's waiting room and get a queue token"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        verify_jwt_in_request()
+    except Exception as e:
+        return jsonify({'success': False, 'message': 'Cần đăng nhập để vào phòng chờ'}), 401
+    
+    try:
+        token = waiting_room.join(event_id, get_jwt_identity())
+        return jsonify({'success': True, 'token': token, **waiting_room.status(event_id, token)}), 200
+    except RedisError as e:
+        print(f"Waiting room unavailable: {str(e)}", flush=True)
+        return jsonify({'success': False, 'message': 'Phòng chờ tạm thời không khả dụng'}), 503
+
+
+@events_bp.route('/events/<int:event_id>/waiting-room', methods=['GET'])
+def get_waiting_room_status(event_id):
+    """Poll the progress of a queue token (``?token=``)"""
+    try:
+        result = waiting_room.status(event_id, request.args.get('token', ''))
+        response = jsonify({'success': True, **result})
+        response.headers['Cache-Control'] = 'no-store'
+        return response, 200
+    except waiting_room.InvalidQueueToken:
+        return jsonify({'success': False, 'message': 'Mã phòng chờ không hợp lệ'}), 400
+    except RedisError as e:
+        print(f"Waiting room unavailable: {str(e)}", flush=True)
+        return jsonify({'success': False, 'message': 'Phòng chờ tạm thời không khả dụng'}), 503
+
+
 @events_bp.route('/events/my-events', methods=['GET'])
 def get_my_events():
     """Get events created by the current user"""
@@ -85,6 +172,57 @@ def create_event():
         return jsonify({'success': False, 'message': 'Đã xảy ra lỗi'}), 500
 
 
+@events_bp.route('/events/<int:event_id>/image/upload-url', methods=['POST', 'OPTIONS'])
+def create_image_upload(event_id):
+    """Issue a presigned URL for uploading the event image directly to storage"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        verify_jwt_in_request()
+    except Exception as e:
+        return jsonify({'success': False, 'message': 'Cần đăng nhập để tải ảnh lên'}), 401
+    
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json(silent=True) or {}
+        size = data.get('size')
+        if size is not None:
+            size = int(size)
+        
+        result, status_code = EventService.create_image_upload(
+            event_id, current_user_id, data.get('contentType'), size
+        )
+        return jsonify(result), status_code
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Kích thước ảnh không hợp lệ'}), 400
+    except Exception as e:
+        print(f"Error creating image upload: {str(e)}", flush=True)
+        return jsonify({'success': False, 'message': 'Đã xảy ra lỗi khi tạo liên kết tải ảnh'}), 500
+
+
+@events_bp.route('/events/<int:event_id>/image/finalize', methods=['POST', 'OPTIONS'])
+def finalize_image_upload(event_id):
+    """Verify a directly uploaded image and attach it to the event"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        verify_jwt_in_request()
+    except Exception as e:
+        return jsonify({'success': False, 'message': 'Cần đăng nhập để tải ảnh lên'}), 401
+    
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json(silent=True) or {}
+        result, status_code = EventService.finalize_image_upload(event_id, current_user_id, data.get('key'))
+        return jsonify(result), status_code
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error finalizing image upload: {str(e)}", flush=True)
+        return jsonify({'success': False, 'message': 'Đã xảy ra lỗi khi cập nhật ảnh sự kiện'}), 500
+
+
 @events_bp.route('/events/<int:event_id>', methods=['PUT', 'OPTIONS'])
 def update_event(event_id):
     """Update an event"""
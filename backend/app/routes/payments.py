@@ -1,12 +1,31 @@
 # Payment routes
 from flask import Blueprint, request, jsonify, current_app
-from app.services.payment_service import PaymentService
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from payos import PayOSError
+from app.services.payment_service import (
+    PaymentService, PaymentGatewayError, PaymentInProgress, PaymentNotFound, InvalidWebhook
+)
 from app.extensions import db
+from app.models.booking import Booking
+from app.models.payment import Payment
+from app.utils.payment.gateway import GatewayError
+from app.utils.waiting_room import admission_required
+from app.utils.idempotency import idempotent
 
 payments_bp = Blueprint('payments', __name__, url_prefix='/api')
 
 
+def _payment_event_id():
+    """Event of the booking being paid (for the waiting room check)"""
+    booking_id = (request.get_json(silent=True) or {}).get('booking_id')
+    if booking_id is None:
+        return None
+    return db.session.query(Booking.event_id).filter_by(booking_id=int(booking_id)).scalar()
+
+
 @payments_bp.route('/create-payment/payos', methods=['POST', 'OPTIONS'])
+@admission_required(_payment_event_id)
+@idempotent('payos_payment')
 def create_payment():
     """Create a PayOS payment"""
     if request.method == 'OPTIONS':
@@ -21,11 +40,17 @@ def create_payment():
         amount = payload["amount"]
         ticket_types = payload["ticket_type"]
 
-        with db.session.begin():
-            result = PaymentService.create_payos_payment(booking_id, amount, ticket_types)
+        # Commits on its own; no transaction is open during the gateway call
+        result = PaymentService.create_payos_payment(booking_id, amount, ticket_types)
         
         return jsonify(result), 200
 
+    except PaymentInProgress as exc:
+        return jsonify({"error": str(exc)}), 409
+    except PaymentGatewayError as exc:
+        current_app.logger.error("PayOS checkout failed: %s", exc)
+        print("PayOS checkout failed:", exc, flush=True)
+        return jsonify({"error": "Cổng thanh toán tạm thời không phản hồi, vui lòng thử lại"}), 502
     except (KeyError, ValueError, TypeError) as exc:
         print("Invalid payment request payload:", exc, flush=True)
         return jsonify({"error": str(exc)}), 400
@@ -36,53 +61,82 @@ def create_payment():
         return jsonify({"error": str(exc)}), 400
 
 
-@payments_bp.route('/success-payment', methods=['POST', 'OPTIONS'])
-def success_payment():
-    """Handle successful payment"""
+def _return_order_code():
+    data = request.get_json(silent=True) or {}
+    try:
+        return int(data['data']['orderCode'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _check_return():
+    """Shared by the success and cancel return pages: report the payment's
+    status and queue what PayOS confirms; the request body only names the order"""
     if request.method == 'OPTIONS':
         return '', 200
 
-    data = request.get_json(silent=True)
-    if not data:
-        return jsonify({"error": "Invalid payload"}), 400
-
-    try:
-        order_id = int(data['data']['orderCode'])
-    except (KeyError, TypeError, ValueError):
+    order_id = _return_order_code()
+    if order_id is None:
         return jsonify({"error": "Invalid PayOS payload"}), 400
 
     try:
-        result = PaymentService.success_payment(order_id)
-        return jsonify(result), 200
-    except Exception as exc:
+        return jsonify(PaymentService.check_return(order_id)), 200
+    except PaymentNotFound as exc:
+        return jsonify({"error": str(exc)}), 404
+    except (PaymentGatewayError, GatewayError, PayOSError) as exc:
         db.session.rollback()
-        current_app.logger.exception("Payment finalization failed")
-        return jsonify({"error": str(exc)}), 500
+        print("Payment status lookup failed:", exc, flush=True)
+        return jsonify({"error": "Cổng thanh toán tạm thời không phản hồi, vui lòng thử lại"}), 502
+
+
+@payments_bp.route('/success-payment', methods=['POST', 'OPTIONS'])
+def success_payment():
+    """Buyer returned from a completed checkout"""
+    return _check_return()
 
 
 @payments_bp.route('/fail-payment', methods=['POST', 'OPTIONS'])
 def fail_payment():
-    """Handle failed payment"""
-    if request.method == 'OPTIONS':
-        return '', 200
-    
-    data = request.get_json()
-    
-    try:
-        order_id = data['data']['orderCode']
-        result = PaymentService.fail_payment(order_id)
-        return jsonify(result), 200
-    except Exception as exc:
-        return jsonify({"error": str(exc)}), 404
+    """Buyer returned from a cancelled checkout"""
+    return _check_return()
 
 
 @payments_bp.route('/<int:payment_id>', methods=['GET'])
 def get_payment(payment_id):
-    """Get payment status - to be implemented"""
-    pass
+    """Payment status, checked against PayOS while it is still pending"""
+    try:
+        verify_jwt_in_request()
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 401
+    
+    payment = db.session.get(Payment, payment_id)
+    booking = db.session.get(Booking, payment.booking_id) if payment else None
+    if not booking or str(booking.user_id) != str(get_jwt_identity()):
+        return jsonify({"error": "Payment not found"}), 404
+    
+    try:
+        return jsonify(PaymentService.get_payment_status(payment_id)), 200
+    except (PaymentGatewayError, GatewayError, PayOSError) as exc:
+        db.session.rollback()
+        print("Payment status lookup failed:", exc, flush=True)
+        return jsonify({"error": "Cổng thanh toán tạm thời không phản hồi, vui lòng thử lại"}), 502
 
 
 @payments_bp.route('/webhook', methods=['POST'])
 def payment_webhook():
-    """Payment webhook handler - to be implemented"""
-    pass
+    """PayOS webhook: verify, store in the inbox and acknowledge.
+
+    The payment is applied later by the 'process-payment-webhooks' workers,
+    so gateway retries during bursts cost one INSERT each.
+    """
+    try:
+        created = PaymentService.handle_webhook(request.get_data())
+        return jsonify({"success": True, "duplicate": not created}), 200
+    except InvalidWebhook as exc:
+        print("Rejected payment webhook:", exc, flush=True)
+        return jsonify({"success": False, "error": "Invalid webhook signature"}), 400
+    except Exception as exc:
+        db.session.rollback()
+        current_app.logger.exception("Payment webhook could not be stored")
+        # 5xx makes PayOS deliver it again later
+        return jsonify({"success": False, "error": str(exc)}), 500
@@ -3,6 +3,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 from app.services.user_service import UserService
 from app.extensions import db
+from app.utils.passwords import PasswordHasherBusy
 
 users_bp = Blueprint('users', __name__, url_prefix='/api')
 
@@ -60,6 +61,9 @@ def change_password():
         new_password = data['newPassword']
         result, status_code = UserService.change_password(current_user, new_password)
         return jsonify(result), status_code
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Hệ thống đang quá tải, vui lòng thử lại sau'}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': 'Đã xảy ra lỗi khi cập nhật mật khẩu: ' + str(e)}), 500
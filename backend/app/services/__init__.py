@@ -5,5 +5,7 @@ from .event_service import EventService
 from .booking_service import BookingService
 from .payment_service import PaymentService
 from .admin_service import AdminService
+from .inventory_service import InventoryService
+from .flash_sale_service import FlashSaleService
 
-__all__ = ['AuthService', 'UserService', 'EventService', 'BookingService', 'PaymentService', 'AdminService']
+__all__ = ['AuthService', 'UserService', 'EventService', 'BookingService', 'PaymentService', 'AdminService', 'InventoryService', 'FlashSaleService']
@@ -4,6 +4,7 @@ from app.models.user import User
 from app.models.event import Event
 from app.models.booking import Booking, BookingLine
 from app.models.payment import Payment
+from app.utils.auth import revoking_tokens, RoleChangeNotPublished, REVOKED
 from datetime import datetime, date
 from sqlalchemy import func, desc
 
@@ -67,14 +68,27 @@ class AdminService:
             user.email = data['email']
         if 'phoneNumber' in data:
             user.phone_number = data['phoneNumber']
-        if 'role' in data and data['role'] in ['user', 'organizer', 'admin']:
+        committed_version = user.role_version or 0
+        role_changed = False
+        if 'role' in data and data['role'] in ['user', 'organizer', 'admin'] and data['role'] != user.role:
             user.role = data['role']
+            user.role_version = committed_version + 1
+            role_changed = True
         if 'gender' in data:
             user.gender = data['gender']
         if 'birthDate' in data and data['birthDate']:
             user.birth_date = datetime.fromisoformat(data['birthDate']).date()
         
-        db.session.commit()
+        if role_changed:
+            # Tokens issued with the old role stop working
+            try:
+                with revoking_tokens(user.user_id, user.role_version, committed_version):
+                    db.session.commit()
+            except RoleChangeNotPublished:
+                db.session.rollback()
+                return {'success': False, 'message': 'Không thể thu hồi phiên đăng nhập của người dùng, vui lòng thử lại sau'}, 503
+        else:
+            db.session.commit()
         
         return {
             'success': True,
@@ -99,8 +113,14 @@ class AdminService:
         if active_bookings > 0:
             return {'success': False, 'message': f'Không thể xóa người dùng có {active_bookings} đặt vé đang hoạt động'}, 400
         
+        committed_version = user.role_version or 0
         db.session.delete(user)
-        db.session.commit()
+        try:
+            with revoking_tokens(user_id, REVOKED, committed_version):
+                db.session.commit()
+        except RoleChangeNotPublished:
+            db.session.rollback()
+            return {'success': False, 'message': 'Không thể thu hồi phiên đăng nhập của người dùng, vui lòng thử lại sau'}, 503
         
         return {'success': True, 'message': 'Xóa người dùng thành công'}, 200
     
@@ -1,7 +1,8 @@
 # Authentication service - Business logic
 from app.extensions import db
 from app.models.user import User
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils.auth import token_claims
+from app.utils.passwords import hasher
 from flask_jwt_extended import create_access_token
 from app.utils.cache import cache_set, cache_get, cache_delete
 from app.utils.mail.sender import send_otp_email
@@ -44,7 +45,7 @@ class AuthService:
             return {'success': False, 'message': 'Email đã được sử dụng'}, 409
         
         # Create new user
-        hashed_password = generate_password_hash(password)
+        hashed_password = hasher.hash(password)
         new_user = User(
             email=email,
             password_hash=hashed_password,
@@ -55,7 +56,7 @@ class AuthService:
         db.session.commit()
         
         # Create JWT access token
-        access_token = create_access_token(identity=str(new_user.user_id))
+        access_token = create_access_token(identity=str(new_user.user_id), additional_claims=token_claims(new_user))
         
         return {
             'success': True,
@@ -77,11 +78,16 @@ class AuthService:
             return {'success': False, 'message': 'Account does not exist'}, 401
         
         # Check password
-        if not check_password_hash(user.password_hash, password):
+        matches, upgraded_hash = hasher.verify(user.password_hash, password)
+        if not matches:
             return {'success': False, 'message': 'Wrong password'}, 401
+        if upgraded_hash:
+            # Stored with older hashing parameters
+            user.password_hash = upgraded_hash
+            db.session.commit()
         
         # Create JWT access token
-        access_token = create_access_token(identity=str(user.user_id))
+        access_token = create_access_token(identity=str(user.user_id), additional_claims=token_claims(user))
         
         return {
             'success': True,
@@ -140,7 +146,7 @@ class AuthService:
         if not user:
             return {'success': False, 'message': 'Tài khoản không tồn tại'}, 401
         
-        hashed_password = generate_password_hash(new_password)
+        hashed_password = hasher.hash(new_password)
         user.password_hash = hashed_password
         db.session.commit()
         
@@ -2,7 +2,23 @@
 from app.extensions import db
 from app.models.booking import Booking, BookingLine
 from app.models.event import Event, Ticket
+from app.services.inventory_service import InventoryService
+from app.services.event_service import EventService
+from app.services.flash_sale_service import FlashSaleService
+from app.utils.pagination import encode_cursor, decode_cursor
 from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert, literal, tuple_
+from sqlalchemy.orm import contains_eager, selectinload
+
+
+# "My bookings" filters: name -> (sort column, direction); None lists everything
+BOOKING_FILTERS = {
+    None: (Booking.booking_date, 'desc'),
+    'upcoming': (Event.start_time, 'asc'),
+    'past': (Event.start_time, 'desc'),
+    'cancelled': (Booking.booking_date, 'desc'),
+}
 
 
 class BookingService:
@@ -10,27 +26,90 @@ class BookingService:
     
     @staticmethod
     def create_booking(user_id, event_id, tickets, booking_full_name, booking_email, booking_phone):
-        """Create a new booking"""
-        event = Event.query.get(event_id)
-        if not event:
-            return {'success': False, 'message': 'Event does not exist'}, 404
-        
-        booking_details = []
+        """Create a new booking and hold its tickets for BOOKING_HOLD_TTL seconds.
+
+        All requested tickets are loaded in one query and validated in memory
+        (they must exist, belong to ``event_id`` and have enough unheld
+        quantity left); the booking lines and holds are then written with
+        bulk inserts. Normally the ticket rows are locked while doing so;
+        flash-sale events reserve through the inventory gate instead.
+        """
+        # Merge repeated ticket ids into one line each
+        quantities = {}
         for ticket_info in tickets:
-            ticket_id = ticket_info['ticket_id']
-            quantity = ticket_info.get('quantity', 0)
-            ticket = Ticket.query.get(ticket_id)
-            
+            try:
+                ticket_id = int(ticket_info['ticket_id'])
+                quantity = int(ticket_info.get('quantity', 0))
+            except (KeyError, TypeError, ValueError):
+                return {'success': False, 'message': 'Invalid ticket information'}, 400
+            if quantity <= 0:
+                return {'success': False, 'message': f'Invalid quantity for ticket ID {ticket_id}'}, 400
+            quantities[ticket_id] = quantities.get(ticket_id, 0) + quantity
+        
+        if not quantities:
+            return {'success': False, 'message': 'Missing event or seat information'}, 400
+        
+        flash_sale = FlashSaleService.is_enabled(event_id)
+        if flash_sale:
+            found = {
+                ticket.ticket_id: ticket
+                for ticket in Ticket.query.filter(Ticket.ticket_id.in_(quantities)).all()
+            }
+        else:
+            found = InventoryService.lock_tickets(quantities)
+        
+        for ticket_id, quantity in quantities.items():
+            ticket = found.get(ticket_id)
             if not ticket:
+                db.session.rollback()
                 return {'success': False, 'message': f'Ticket ID {ticket_id} does not exist'}, 404
-            
-            booking_detail = BookingLine(
-                ticket_id=ticket_id,
-                quantity=quantity,
-                unit_price=ticket.price
+            if ticket.event_id != int(event_id):
+                db.session.rollback()
+                return {'success': False, 'message': f'Ticket ID {ticket_id} does not belong to this event'}, 400
+            if not flash_sale and ticket.available_quantity < quantity:
+                db.session.rollback()
+                return {
+                    'success': False,
+                    'message': f'Only {max(0, ticket.available_quantity)} tickets left for {ticket.name}'
+                }, 409
+        
+        if flash_sale:
+            short = FlashSaleService.reserve(event_id, quantities)
+            if short is not None:
+                db.session.rollback()
+                return {'success': False, 'message': f'Not enough tickets left for {found[short].name}'}, 409
+            try:
+                booking_id, expires_at = BookingService._insert_booking(
+                    user_id, event_id, found, quantities,
+                    booking_full_name, booking_email, booking_phone, flash_sale=True
+                )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                FlashSaleService.release(quantities)
+                raise
+            FlashSaleService.schedule_reconcile(event_id)
+        else:
+            booking_id, expires_at = BookingService._insert_booking(
+                user_id, event_id, found, quantities,
+                booking_full_name, booking_email, booking_phone
             )
-            booking_details.append(booking_detail)
+            InventoryService.refresh_event_summary(event_id)
+            db.session.commit()
+            EventService.invalidate_event(event_id)
         
+        return {
+            'success': True,
+            'message': 'Đặt vé thành công',
+            'booking_id': booking_id,
+            'hold_expires_at': expires_at.isoformat()
+        }, 201
+    
+    @staticmethod
+    def _insert_booking(user_id, event_id, tickets, quantities,
+                        booking_full_name, booking_email, booking_phone, flash_sale=False):
+        """Write the booking, its lines and its holds; returns ``(booking_id, hold expiry)``"""
+        # The tickets' foreign key guarantees the event exists
         new_booking = Booking(
             user_id=user_id,
             event_id=event_id,
@@ -38,23 +117,73 @@ class BookingService:
             status='pending',
             booking_full_name=booking_full_name,
             booking_email=booking_email,
-            booking_phone=booking_phone,
-            booking_lines=booking_details
+            booking_phone=booking_phone
         )
-        
         db.session.add(new_booking)
-        db.session.commit()
+        db.session.flush()
+        booking_id = new_booking.booking_id
         
-        return {
-            'success': True,
-            'message': 'Đặt vé thành công',
-            'booking_id': new_booking.booking_id
-        }, 201
+        db.session.execute(insert(BookingLine), [
+            {
+                'booking_id': booking_id,
+                'ticket_id': ticket_id,
+                'quantity': quantity,
+                'unit_price': tickets[ticket_id].price
+            }
+            for ticket_id, quantity in quantities.items()
+        ])
+        expires_at = InventoryService.hold_tickets(
+            booking_id, tickets, quantities, update_tickets=not flash_sale
+        )
+        return booking_id, expires_at
     
     @staticmethod
-    def get_user_bookings(user_id):
-        """Get all bookings for a user"""
-        bookings = Booking.query.filter_by(user_id=user_id).all()
+    def get_user_bookings(user_id, status=None, cursor=None, limit=20):
+        """Get a page of the user's bookings.
+
+        ``status`` is one of BOOKING_FILTERS (None = all). The event, lines
+        and tickets are eager-loaded, so a page costs the same two queries
+        whatever its size; pages are keyset-paginated with ``cursor``.
+        """
+        if status not in BOOKING_FILTERS:
+            raise ValueError("Invalid booking status filter")
+        sort_column, direction = BOOKING_FILTERS[status]
+        
+        query = (
+            Booking.query
+            .join(Booking.event)
+            .options(
+                contains_eager(Booking.event),
+                selectinload(Booking.booking_lines).joinedload(BookingLine.ticket)
+            )
+            .filter(Booking.user_id == user_id)
+        )
+        now = datetime.utcnow()
+        if status == 'upcoming':
+            query = query.filter(Booking.status != 'cancelled', Event.start_time >= now)
+        elif status == 'past':
+            query = query.filter(Booking.status != 'cancelled', Event.start_time < now)
+        elif status == 'cancelled':
+            query = query.filter(Booking.status == 'cancelled')
+        
+        key = tuple_(sort_column, Booking.booking_id)
+        if cursor:
+            cursor_value, cursor_id = decode_cursor(cursor, status or 'all')
+            bound = tuple_(literal(cursor_value), literal(cursor_id))
+            query = query.filter(key < bound if direction == 'desc' else key > bound)
+        if direction == 'desc':
+            query = query.order_by(sort_column.desc(), Booking.booking_id.desc())
+        else:
+            query = query.order_by(sort_column.asc(), Booking.booking_id.asc())
+        
+        bookings = query.limit(limit + 1).all()
+        has_more = len(bookings) > limit
+        bookings = bookings[:limit]
+        next_cursor = None
+        if has_more:
+            last = bookings[-1]
+            last_value = last.event.start_time if sort_column is Event.start_time else last.booking_date
+            next_cursor = encode_cursor(status or 'all', last_value, last.booking_id)
         
         bookings_list = []
         for booking in bookings:
@@ -91,7 +220,8 @@ class BookingService:
         return {
             'success': True,
             'bookings': bookings_list,
-            'total': len(bookings_list)
+            'next_cursor': next_cursor,
+            'has_more': has_more
         }, 200
     
     @staticmethod
@@ -169,6 +299,23 @@ class BookingService:
             }
         }, 200
     
+    @staticmethod
+    def release_expired_holds(batch_size=None):
+        """Return expired holds to inventory, one committed batch at a time.
+        Safe to run on several nodes at once. Returns the number released."""
+        batch_size = batch_size or current_app.config['HOLD_SWEEP_BATCH_SIZE']
+        total = 0
+        while True:
+            released, event_ids, quantities = InventoryService.release_expired_holds(batch_size)
+            db.session.commit()
+            if quantities:
+                FlashSaleService.release_holds(quantities, event_ids)
+            for event_id in event_ids:
+                EventService.invalidate_event(event_id)
+            total += released
+            if released < batch_size:
+                return total
+    
     @staticmethod
     def check_availability(event_id, quantity):
         """Check event ticket availability - to be implemented"""
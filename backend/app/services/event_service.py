@@ -1,64 +1,168 @@
 # Event service - Business logic
 from app.extensions import db
-from app.models.event import Event, Ticket
+from app.models.event import Event, Ticket, EventSummary
+from app.services.inventory_service import InventoryService
+from app.services.notification_service import NotificationService, format_event_time
+from app.utils.cache import cache_get, cache_set, TwoTierCache, VersionedCache
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.http_cache import make_etag
+from app.utils.text_utils import search_terms, highlight_snippet
+from app.utils.storage import get_storage, key_for_url, spool_upload
+from app.utils.images import render_variants, srcset, pick_width
+from app.utils.background import BackgroundExecutor
 from datetime import datetime
+from flask import current_app
+from redis.exceptions import RedisError
 from sqlalchemy import text
-import boto3
+from sqlalchemy.orm import joinedload
+import hashlib
+import json
+import mimetypes
 import os
+import re
+import tempfile
 from dotenv import load_dotenv
 import uuid
 
 load_dotenv()
 
+# Catalog sort orders usable for keyset pagination:
+# name -> (SQL expression, direction, cursor value as compared to it)
+EVENT_SORTS = {
+    'newest': ('e.created_at', 'DESC', ':cursor_value'),
+    'upcoming': ('e.start_time', 'ASC', ':cursor_value'),
+    # Only valid together with a search query. word_similarity() is real: a
+    # float8 cursor would not equal the widened score, and rows tied on it
+    # would be skipped on the next page
+    'relevance': ('word_similarity(:search_query, e.search_document)', 'DESC', 'CAST(:cursor_value AS real)'),
+}
 
-def upload_file_to_s3(file, filename, acl="public-read"):
-    """Upload file to AWS S3 bucket"""
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_KEY"),
-        region_name=os.getenv("AWS_REGION")
-    )
-    filename = f"images/{filename}"
-    BUCKET = os.getenv("AWS_BUCKET")
-    s3.upload_fileobj(
-        file,
-        BUCKET,
-        filename,
-        ExtraArgs={
-            "ContentType": file.content_type
-        }
-    )
-    return f"https://{BUCKET}.s3.amazonaws.com/{filename}"
+# Serialized event detail payloads, keyed by event id
+event_detail_cache = TwoTierCache('event', 'EVENT_CACHE')
+
+# Catalog listing responses, keyed by normalized query parameters
+catalog_cache = VersionedCache('catalog', 'CATALOG_CACHE')
+
+# Uploads spooled event images to object storage off the request path
+image_upload_executor = BackgroundExecutor('image_upload', 'IMAGE_UPLOAD_WORKERS')
+
+# Renders resized WebP/JPEG copies of stored event images
+image_variant_executor = BackgroundExecutor('image_variants', 'IMAGE_VARIANT_WORKERS')
+
+# Image width served to catalog cards and to the event detail page
+CARD_IMAGE_WIDTH = 640
+DETAIL_IMAGE_WIDTH = 1280
+
+# Content types accepted for direct uploads -> object key extension
+IMAGE_CONTENT_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+
+
+def escape_like(value):
+    """Escape LIKE wildcards in user input"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
 
 
 class EventService:
     """Event service for managing events"""
     
     @staticmethod
-    def get_all_events(category=None, search=None, page=1, limit=10):
-        """Get all approved events with filtering and pagination"""
-        offset = (page - 1) * limit
+    def get_all_events(category=None, search=None, page=1, limit=10,
+                       cursor=None, sort=None, include_total=None,
+                       price_min=None, price_max=None, available_only=False):
+        """Get all approved events with filtering and pagination.
+
+        Offset mode (``page``) is kept for backwards compatibility. When a
+        ``cursor`` is given the page is fetched by keyset on the sort column
+        and the event id, so every page costs the same regardless of depth.
+        Searches match every query term against the stored search document
+        (trigram-indexed) and default to relevance order. Price and
+        availability filters read the denormalized event summary.
+        Responses are cached per normalized parameter set until the next
+        catalog write (see invalidate_event).
+        """
+        query = EventService._catalog_query(
+            category, search, page, limit, cursor, sort, include_total,
+            price_min, price_max, available_only
+        )
+        response = catalog_cache.get_or_load(query, lambda: EventService._query_events(**query))
+        return response, 200
+    
+    @staticmethod
+    def _catalog_query(category=None, search=None, page=1, limit=10,
+                       cursor=None, sort=None, include_total=None,
+                       price_min=None, price_max=None, available_only=False):
+        """Normalize catalog listing parameters (also the catalog cache key)"""
+        terms = search_terms(search) if search else []
+        if sort is None:
+            sort = 'relevance' if terms else 'newest'
+        if sort not in EVENT_SORTS or (sort == 'relevance' and not terms):
+            raise ValueError("Invalid sort")
+        
+        if include_total is None:
+            include_total = cursor is None
+        
+        return {
+            "category": category or None,
+            "terms": terms,
+            "page": None if cursor else page,
+            "limit": limit,
+            "cursor": cursor,
+            "sort": sort,
+            "include_total": include_total,
+            "price_min": price_min,
+            "price_max": price_max,
+            "available_only": bool(available_only),
+        }
+    
+    @staticmethod
+    def _query_events(category, terms, page, limit, cursor, sort, include_total,
+                      price_min, price_max, available_only):
+        """Run the catalog listing query for already-normalized parameters"""
+        sort_column, direction, cursor_column = EVENT_SORTS[sort]
+        comparator = '<' if direction == 'DESC' else '>'
         
         base_where = "WHERE e.approved = :approved"
         params = {
             "approved": "approved",
-            "limit": limit,
-            "offset": offset
         }
         
         if category:
             base_where += " AND e.category = :category"
             params["category"] = category
         
-        if search:
-            base_where += """
-                AND (
-                    unaccent(lower(e.name)) LIKE unaccent(lower(:search))
-                    OR unaccent(lower(e.description)) LIKE unaccent(lower(:search))
-                )
-            """
-            params["search"] = f"%{search}%"
+        if price_min is not None:
+            base_where += " AND s.max_price >= :price_min"
+            params["price_min"] = price_min
+        
+        if price_max is not None:
+            base_where += " AND s.min_price <= :price_max"
+            params["price_max"] = price_max
+        
+        if available_only:
+            base_where += " AND s.sold_out = FALSE"
+        
+        for i, term in enumerate(terms):
+            base_where += f" AND e.search_document LIKE :term_{i} ESCAPE '\\'"
+            params[f"term_{i}"] = f"%{escape_like(term)}%"
+        
+        rank_params = {"search_query": ' '.join(terms)} if terms else {}
+        
+        page_where = base_where
+        page_params = dict(params, limit=limit + 1, **rank_params)
+        if cursor:
+            cursor_value, cursor_id = decode_cursor(cursor, sort)
+            page_where += f" AND ({sort_column}, e.event_id) {comparator} ({cursor_column}, :cursor_id)"
+            page_params["cursor_value"] = cursor_value
+            page_params["cursor_id"] = cursor_id
+            pagination = "LIMIT :limit"
+        else:
+            page_params["offset"] = (page - 1) * limit
+            pagination = "LIMIT :limit OFFSET :offset"
         
         sql = text(f"""
             SELECT
@@ -66,41 +170,93 @@ class EventService:
                 e.name as title,
                 e.description,
                 e.image_url as image,
+                e.image_variants,
                 to_char(e.start_time, 'YYYY-MM-DD HH:MI AM') as date,
                 e.venue_name as location,
                 e.address,
                 e.category,
                 e.created_at,
-                COALESCE(p.min_price, 0) AS price
+                {sort_column} as sort_key,
+                COALESCE(s.min_price, 0) AS price,
+                COALESCE(s.max_price, 0) AS max_price,
+                COALESCE(s.sold_out, TRUE) AS sold_out
             FROM events e
-            LEFT JOIN (
-                SELECT event_id, MIN(price) AS min_price
-                FROM tickets
-                GROUP BY event_id
-            ) p ON p.event_id = e.event_id
-            {base_where}
-            LIMIT :limit OFFSET :offset
+            LEFT JOIN event_summaries s ON s.event_id = e.event_id
+            {page_where}
+            ORDER BY {sort_column} {direction}, e.event_id {direction}
+            {pagination}
         """)
         
-        result = db.session.execute(sql, params).mappings().all()
+        result = db.session.execute(sql, page_params).mappings().all()
         result = [dict(row) for row in result]
         
+        has_more = len(result) > limit
+        result = result[:limit]
+        next_cursor = None
+        if has_more:
+            last = result[-1]
+            next_cursor = encode_cursor(sort, last['sort_key'], last['id'])
+        storage = get_storage()
+        for row in result:
+            row.pop('sort_key')
+            row.update(EventService._image_fields(
+                storage, row['image'], row.pop('image_variants'), CARD_IMAGE_WIDTH
+            ))
+            if terms:
+                row['highlight'] = {
+                    'title': highlight_snippet(row['title'], terms),
+                    'description': highlight_snippet(row['description'], terms)
+                }
+        
+        response = {
+            "success": True,
+            "events": result,
+            "next_cursor": next_cursor,
+            "has_more": has_more
+        }
+        
+        if cursor is None:
+            response["page"] = page
+        
+        if include_total:
+            total = EventService._count_events(base_where, params)
+            response["total"] = total
+            response["totalPages"] = (total + limit - 1) // limit
+        
+        return response
+    
+    @staticmethod
+    def _count_events(base_where, params):
+        """Count catalog rows, served from a short-lived Redis entry when possible"""
+        ttl = current_app.config.get('EVENT_COUNT_CACHE_TTL', 0)
+        cache_key = None
+        if ttl:
+            digest = hashlib.sha1(
+                json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+            ).hexdigest()
+            cache_key = f"events:count:{digest}"
+            try:
+                cached = cache_get(cache_key)
+                if cached is not None:
+                    return int(cached)
+            except RedisError as exc:
+                print("Event count cache unavailable:", str(exc), flush=True)
+                cache_key = None
+        
         count_sql = text(f"""
             SELECT COUNT(*)
             FROM events e
+            LEFT JOIN event_summaries s ON s.event_id = e.event_id
             {base_where}
         """)
-        
         total = db.session.execute(count_sql, params).scalar()
-        total_pages = (total + limit - 1) // limit
         
-        return {
-            "success": True,
-            "events": result,
-            "total": total,
-            "page": page,
-            "totalPages": total_pages
-        }, 200
+        if cache_key:
+            try:
+                cache_set(cache_key, total, ex=ttl)
+            except RedisError as exc:
+                print("Event count cache unavailable:", str(exc), flush=True)
+        return total
     
     @staticmethod
     def get_my_events(user_id, page=1, limit=10):
@@ -113,19 +269,18 @@ class EventService:
                 e.name as title,
                 e.description,
                 e.image_url as image,
+                e.image_variants,
                 to_char(e.start_time, 'YYYY-MM-DD HH:MI AM') as date,
                 e.venue_name as location,
                 e.address,
                 e.category,
                 e.approved,
                 e.created_at,
-                COALESCE(p.min_price, 0) AS price
+                COALESCE(s.min_price, 0) AS price,
+                COALESCE(s.max_price, 0) AS max_price,
+                COALESCE(s.sold_out, TRUE) AS sold_out
             FROM events e
-            LEFT JOIN (
-                SELECT event_id, MIN(price) AS min_price
-                FROM tickets
-                GROUP BY event_id
-            ) p ON p.event_id = e.event_id
+            LEFT JOIN event_summaries s ON s.event_id = e.event_id
             WHERE e.organizer_id = :user_id
             ORDER BY e.created_at DESC
             LIMIT :limit OFFSET :offset
@@ -139,6 +294,11 @@ class EventService:
         
         result = db.session.execute(sql, params).mappings().all()
         result = [dict(row) for row in result]
+        storage = get_storage()
+        for row in result:
+            row.update(EventService._image_fields(
+                storage, row['image'], row.pop('image_variants'), CARD_IMAGE_WIDTH
+            ))
         
         count_sql = text("""
             SELECT COUNT(*)
@@ -160,10 +320,71 @@ class EventService:
     @staticmethod
     def get_event_by_id(event_id):
         """Get single event by ID"""
-        event = Event.query.filter(Event.approved == 'approved').filter_by(event_id=event_id).first()
-        if not event:
+        detail = EventService.get_event_detail(event_id)
+        if detail is None:
             return {'success': False, 'message': 'Không tìm thấy sự kiện'}, 404
         
+        return {'success': True, 'event': detail['event']}, 200
+    
+    @staticmethod
+    def get_event_detail(event_id):
+        """Get the cached detail entry of an approved event: its payload plus
+        ``etag`` and ``last_modified`` validators. Returns None if not found."""
+        return event_detail_cache.get_or_load(
+            event_id, lambda: EventService._load_event_detail(event_id)
+        )
+    
+    @staticmethod
+    def get_event_validators(event_id):
+        """Get ``(etag, last_modified)`` for an approved event without loading
+        its tickets: from the detail cache when present, else from the event
+        and summary rows. Returns None if not found."""
+        detail = event_detail_cache.peek(event_id)
+        if detail is not None:
+            return detail['etag'], datetime.fromisoformat(detail['last_modified'])
+        
+        row = (
+            db.session.query(Event.updated_at, EventSummary.updated_at, EventSummary.remaining_quantity)
+            .outerjoin(EventSummary, EventSummary.event_id == Event.event_id)
+            .filter(Event.event_id == event_id, Event.approved == 'approved')
+            .first()
+        )
+        if row is None:
+            return None
+        return EventService._validators(*row)
+    
+    @staticmethod
+    def _validators(event_updated_at, summary_updated_at, remaining_quantity):
+        """ETag and Last-Modified of an event detail. Every ticket change goes
+        through InventoryService.refresh_event_summary, which stamps the summary."""
+        etag = make_etag(
+            event_updated_at.isoformat() if event_updated_at else None,
+            summary_updated_at.isoformat() if summary_updated_at else None,
+            remaining_quantity
+        )
+        last_modified = max(filter(None, (event_updated_at, summary_updated_at)), default=None)
+        return etag, last_modified
+    
+    @staticmethod
+    def _load_event_detail(event_id):
+        """Load and serialize an approved event with its tickets in one query"""
+        event = (
+            Event.query
+            .options(joinedload(Event.tickets), joinedload(Event.summary))
+            .filter(Event.approved == 'approved')
+            .filter_by(event_id=event_id)
+            .first()
+        )
+        if not event:
+            return None
+        
+        summary = event.summary
+        etag, last_modified = EventService._validators(
+            event.updated_at,
+            summary.updated_at if summary else None,
+            summary.remaining_quantity if summary else None
+        )
+        
         event_data = {
             'id': event.event_id,
             'title': event.name,
@@ -176,17 +397,60 @@ class EventService:
             'district': event.district if event.district else '',
             'ward': event.ward if event.ward else '',
             'address': event.address if event.address else '',
-            'image': event.image_url if event.image_url else '',
+            **EventService._image_fields(
+                get_storage(), event.image_url, event.image_variants, DETAIL_IMAGE_WIDTH
+            ),
             'createdAt': event.created_at.isoformat() if event.created_at else None,
             'ticket_types': [{
                 'id': ticket.ticket_id,
                 'typeName': ticket.name,
                 'price': float(ticket.price),
-                'quantity': ticket.quantity
+                'quantity': ticket.available_quantity
             } for ticket in event.tickets]
         }
         
-        return {'success': True, 'event': event_data}, 200
+        return {
+            'event': event_data,
+            'etag': etag,
+            'last_modified': last_modified.isoformat() if last_modified else None
+        }
+    
+    @staticmethod
+    def _image_fields(storage, image_url, variants, width):
+        """``image`` (a JPEG variant near ``width``, else the original) and
+        ``imageSrcset`` (per-format srcset strings, None until generated)"""
+        if isinstance(variants, str):
+            variants = json.loads(variants)
+        if not variants or not variants.get('jpg'):
+            return {'image': image_url or '', 'imageSrcset': None}
+        
+        jpeg = {int(w): storage.public_url(key) for w, key in variants['jpg'].items()}
+        return {
+            'image': jpeg[pick_width(jpeg, width)],
+            'imageSrcset': {
+                fmt: srcset({int(w): storage.public_url(key) for w, key in keys.items()})
+                for fmt, keys in variants.items()
+            }
+        }
+    
+    @staticmethod
+    def get_catalog_etag(**kwargs):
+        """ETag for a catalog listing, derived from the catalog cache version.
+
+        Takes the same arguments as get_all_events. Returns None when the
+        catalog cache is unavailable.
+        """
+        return catalog_cache.etag(EventService._catalog_query(**kwargs))
+    
+    @staticmethod
+    def invalidate_event(event_id):
+        """Drop cached copies of an event after it (or its tickets) changed.
+
+        Also moves the catalog listing cache to a new version. Call after the
+        change is committed.
+        """
+        event_detail_cache.invalidate(event_id)
+        catalog_cache.bump()
     
     @staticmethod
     def create_event(user_id, data, file=None):
@@ -222,15 +486,21 @@ class EventService:
             image_url=None,
             organizer_id=user_id
         )
+        new_event.refresh_search_document()
         db.session.add(new_event)
         db.session.flush()
         
-        # Upload image if provided
+        # Spool the image locally; it is uploaded after the commit
+        image_upload = None
         if file:
-            ext = file.filename.rsplit(".", 1)[-1]
+            ext = file.filename.rsplit(".", 1)[-1].lower()
+            if not re.fullmatch(r'[a-z0-9]{1,5}', ext):
+                ext = 'bin'
             filename = f"event_{new_event.event_id}.{ext}"
-            image_url = upload_file_to_s3(file, filename)
-            new_event.image_url = image_url
+            spool_path = spool_upload(file, filename)
+            content_type = file.content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            image_upload = (spool_path, f"images/{filename}", content_type)
+            new_event.image_status = 'pending'
         
         # Add tickets
         for t in ticket_types:
@@ -242,7 +512,12 @@ class EventService:
             )
             db.session.add(ticket)
         
+        InventoryService.refresh_event_summary(new_event.event_id)
         db.session.commit()
+        EventService.invalidate_event(new_event.event_id)
+        
+        if image_upload:
+            image_upload_executor.submit(EventService.store_event_image, new_event.event_id, *image_upload)
         
         return {
             'success': True,
@@ -250,10 +525,169 @@ class EventService:
             'event': {
                 'id': new_event.event_id,
                 'title': new_event.name,
-                'image': new_event.image_url
+                'image': new_event.image_url,
+                'imageStatus': new_event.image_status
             }
         }, 201
     
+    @staticmethod
+    def store_event_image(event_id, spool_path, key, content_type):
+        """Upload a spooled event image and record its URL (background task)"""
+        event = db.session.get(Event, event_id)
+        if event is None:
+            os.remove(spool_path)
+            return None
+        
+        try:
+            image_url = get_storage().upload_file(spool_path, key, content_type)
+        except Exception:
+            event.image_status = 'failed'
+            db.session.commit()
+            raise
+        
+        event.image_url = image_url
+        event.image_status = 'ready'
+        event.image_variants = None
+        db.session.commit()
+        os.remove(spool_path)
+        EventService.invalidate_event(event_id)
+        image_variant_executor.submit(EventService.generate_image_variants, event_id)
+        return image_url
+    
+    @staticmethod
+    def retry_image_uploads():
+        """Upload images still spooled for events left pending or failed
+        (e.g. after a worker restart). Returns the number of images stored."""
+        spool_dir = current_app.config['IMAGE_SPOOL_DIR']
+        if not os.path.isdir(spool_dir):
+            return 0
+        
+        stored = 0
+        for filename in sorted(os.listdir(spool_dir)):
+            match = re.fullmatch(r'event_(\d+)\.[a-z0-9]+', filename)
+            if not match:
+                continue
+            event = db.session.get(Event, int(match.group(1)))
+            if event is None or event.image_status not in ('pending', 'failed'):
+                continue
+            content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            EventService.store_event_image(
+                event.event_id, os.path.join(spool_dir, filename), f"images/{filename}", content_type
+            )
+            stored += 1
+        return stored
+    
+    @staticmethod
+    def generate_image_variants(event_id):
+        """Render and store the resized variants of an event's image and
+        record their keys (background task). Returns the recorded keys, or
+        None when the event has no image hosted in our storage."""
+        event = db.session.get(Event, event_id)
+        if event is None or not event.image_url:
+            return None
+        storage = get_storage()
+        source_url = event.image_url
+        source_key = key_for_url(storage, source_url)
+        # Do not hold the transaction open while images are processed
+        db.session.rollback()
+        if source_key is None:
+            return None
+        
+        with tempfile.TemporaryDirectory(prefix='variants_') as workdir:
+            source_path = os.path.join(workdir, 'source')
+            storage.download_file(source_key, source_path)
+            with open(source_path, 'rb') as fh:
+                # Content-addressed keys: a replaced image never reuses cached URLs
+                digest = hashlib.sha1(fh.read()).hexdigest()[:12]
+            
+            variants = {}
+            for width, fmt, path, content_type in render_variants(source_path, workdir, digest):
+                key = f"images/variants/event_{event_id}/{digest}_{width}.{fmt}"
+                storage.upload_file(path, key, content_type)
+                variants.setdefault(fmt, {})[str(width)] = key
+        
+        event = db.session.get(Event, event_id)
+        if event is None or event.image_url != source_url:
+            # The image was replaced meanwhile; its own task records variants
+            return None
+        event.image_variants = variants
+        db.session.commit()
+        EventService.invalidate_event(event_id)
+        return variants
+    
+    @staticmethod
+    def _owned_event(event_id, user_id):
+        """Return ``(event, error_response)`` for an event the user organizes"""
+        event = db.session.get(Event, event_id)
+        if event is None:
+            return None, ({'success': False, 'message': 'Không tìm thấy sự kiện'}, 404)
+        if str(event.organizer_id) != str(user_id):
+            return None, ({'success': False, 'message': 'Bạn không có quyền chỉnh sửa sự kiện này'}, 403)
+        return event, None
+    
+    @staticmethod
+    def create_image_upload(event_id, user_id, content_type, size=None):
+        """Issue a presigned URL so the client uploads the event image straight
+        to storage; the bytes never pass through the API workers"""
+        event, error = EventService._owned_event(event_id, user_id)
+        if error:
+            return error
+        
+        ext = IMAGE_CONTENT_TYPES.get((content_type or '').lower())
+        if ext is None:
+            return {'success': False, 'message': 'Định dạng ảnh không được hỗ trợ'}, 400
+        max_bytes = current_app.config['IMAGE_MAX_BYTES']
+        if size is not None and not 0 < size <= max_bytes:
+            return {'success': False, 'message': 'Kích thước ảnh không hợp lệ'}, 400
+        
+        key = f"images/event_{event.event_id}.{ext}"
+        expires_in = current_app.config['IMAGE_UPLOAD_URL_TTL']
+        upload = get_storage().presign_upload(key, content_type.lower(), max_bytes, expires_in)
+        
+        return {
+            'success': True,
+            'upload': dict(upload, key=key, expiresIn=expires_in, maxBytes=max_bytes)
+        }, 200
+    
+    @staticmethod
+    def finalize_image_upload(event_id, user_id, key):
+        """Verify a directly uploaded image and attach it to the event"""
+        event, error = EventService._owned_event(event_id, user_id)
+        if error:
+            return error
+        
+        match = re.fullmatch(rf'images/event_{event.event_id}\.([a-z]+)', key or '')
+        if not match or match.group(1) not in IMAGE_CONTENT_TYPES.values():
+            return {'success': False, 'message': 'Khóa ảnh không hợp lệ'}, 400
+        
+        storage = get_storage()
+        meta = storage.head(key)
+        if meta is None:
+            return {'success': False, 'message': 'Chưa tìm thấy ảnh đã tải lên'}, 404
+        
+        content_type = (meta['content_type'] or '').lower()
+        if (IMAGE_CONTENT_TYPES.get(content_type) != match.group(1)
+                or not 0 < meta['size'] <= current_app.config['IMAGE_MAX_BYTES']):
+            storage.delete(key)
+            return {'success': False, 'message': 'Ảnh không hợp lệ'}, 400
+        
+        event.image_url = storage.public_url(key)
+        event.image_status = 'ready'
+        event.image_variants = None
+        db.session.commit()
+        EventService.invalidate_event(event.event_id)
+        image_variant_executor.submit(EventService.generate_image_variants, event.event_id)
+        
+        return {
+            'success': True,
+            'message': 'Cập nhật ảnh sự kiện thành công',
+            'event': {
+                'id': event.event_id,
+                'image': event.image_url,
+                'imageStatus': event.image_status
+            }
+        }, 200
+    
     @staticmethod
     def update_event(event_id, data):
         """Update an event"""
@@ -261,6 +695,13 @@ class EventService:
         if not event:
             return {'success': False, 'message': 'Không tìm thấy sự kiện'}, 404
         
+        # What attendees are told about when it changes
+        before = {
+            'Time': format_event_time(event.start_time),
+            'Venue': event.venue_name,
+            'Address': event.address or '',
+        }
+        
         # Update fields if provided
         if 'title' in data:
             event.name = data['title'].strip()
@@ -275,10 +716,33 @@ class EventService:
         elif 'date' in data:
             date_str = data['date']
             event.start_time = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-        if 'image' in data:
+        if 'location' in data:
+            event.venue_name = data['location'].strip()
+        if 'address' in data:
+            event.address = data['address'].strip()
+        image_changed = 'image' in data and data['image'] != event.image_url
+        if image_changed:
             event.image_url = data['image']
+            event.image_status = 'ready' if data['image'] else None
+            event.image_variants = None
         
+        event.refresh_search_document()
         db.session.commit()
+        EventService.invalidate_event(event_id)
+        if image_changed and event.image_url:
+            image_variant_executor.submit(EventService.generate_image_variants, event_id)
+        
+        after = {
+            'Time': format_event_time(event.start_time),
+            'Venue': event.venue_name,
+            'Address': event.address or '',
+        }
+        changes = [
+            {'field': field, 'old': before[field], 'new': after[field]}
+            for field in before if before[field] != after[field]
+        ]
+        if changes:
+            NotificationService.announce_changes(event_id, changes)
         
         return {
             'success': True,
@@ -298,6 +762,7 @@ class EventService:
         
         db.session.delete(event)
         db.session.commit()
+        EventService.invalidate_event(event_id)
         
         return {
             'success': True,
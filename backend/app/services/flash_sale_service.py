@@ -0,0 +1,133 @@
+# Flash sale service - Business logic
+import threading
+from app.extensions import db
+from app.models.booking import TicketHold
+from app.models.event import Event, Ticket
+from app.services.inventory_service import InventoryService
+from app.services.event_service import EventService
+from app.utils import metrics
+from app.utils.background import BackgroundExecutor
+from app.utils.inventory_gate import get_inventory_gate, CountersMissing
+from sqlalchemy import and_, func
+
+# Applies flash-sale holds to tickets.held_quantity and the event summary
+reconcile_executor = BackgroundExecutor('flash_reconcile', 'FLASH_SALE_RECONCILE_WORKERS')
+
+_pending_lock = threading.Lock()
+_pending_events = set()
+
+
+class FlashSaleService:
+    """Flash-sale inventory: bookings reserve from atomic per-ticket counters
+    (see app.utils.inventory_gate) instead of queueing on ticket row locks.
+
+    The counters are a cache of ``quantity - active holds``; Postgres stays
+    the source of truth and the counters can always be rebuilt from it.
+    """
+    
+    @staticmethod
+    def is_enabled(event_id):
+        return bool(db.session.query(Event.flash_sale).filter_by(event_id=event_id).scalar())
+    
+    @staticmethod
+    def remaining_counts(event_id):
+        """{ticket_id: quantity - active holds}, read from the holds table
+        (tickets.held_quantity may lag behind while reconciliation is queued)"""
+        held = func.coalesce(func.sum(TicketHold.quantity), 0)
+        rows = (
+            db.session.query(Ticket.ticket_id, Ticket.quantity - held)
+            .outerjoin(TicketHold, and_(TicketHold.ticket_id == Ticket.ticket_id, TicketHold.status == 'active'))
+            .filter(Ticket.event_id == event_id)
+            .group_by(Ticket.ticket_id, Ticket.quantity)
+            .all()
+        )
+        return {ticket_id: int(remaining) for ticket_id, remaining in rows}
+    
+    @staticmethod
+    def rebuild_counters(event_id, overwrite=True):
+        """Load the event's counters from the database. Overwriting while
+        bookings are in flight can hand out their quantity again, so the
+        lazy recovery path only fills in missing counters."""
+        counts = FlashSaleService.remaining_counts(event_id)
+        get_inventory_gate().load(counts, overwrite=overwrite)
+        metrics.incr('flash_sale.counter_rebuild')
+        return counts
+    
+    @staticmethod
+    def set_flash_sale(event_id, enabled):
+        """Turn flash-sale mode on (loading counters) or off (dropping them)"""
+        event = db.session.get(Event, event_id)
+        if not event:
+            return {'success': False, 'message': 'Không tìm thấy sự kiện'}, 404
+        
+        event.flash_sale = bool(enabled)
+        InventoryService.reconcile_held_quantities(event_id)
+        InventoryService.refresh_event_summary(event_id)
+        db.session.commit()
+        
+        ticket_ids = [ticket_id for (ticket_id,) in db.session.query(Ticket.ticket_id).filter_by(event_id=event_id)]
+        if event.flash_sale:
+            FlashSaleService.rebuild_counters(event_id)
+        else:
+            get_inventory_gate().clear(ticket_ids)
+        EventService.invalidate_event(event_id)
+        
+        return {
+            'success': True,
+            'event': {'id': event.event_id, 'flashSale': event.flash_sale}
+        }, 200
+    
+    @staticmethod
+    def reserve(event_id, quantities):
+        """Reserve ``quantities`` ({ticket_id: qty}) all-or-nothing.
+        Returns None on success, else the ticket id that ran short."""
+        gate = get_inventory_gate()
+        try:
+            short = gate.reserve(quantities)
+        except CountersMissing:
+            FlashSaleService.rebuild_counters(event_id, overwrite=False)
+            short = gate.reserve(quantities)
+        metrics.incr('flash_sale.reserved' if short is None else 'flash_sale.sold_out')
+        return short
+    
+    @staticmethod
+    def release(quantities):
+        """Give reserved quantities back to the counters"""
+        get_inventory_gate().release(quantities)
+        metrics.incr('flash_sale.released')
+    
+    @staticmethod
+    def release_holds(quantities, event_ids):
+        """Return released hold quantities of flash-sale events to the counters"""
+        flash_events = {
+            event_id for (event_id,) in
+            db.session.query(Event.event_id).filter(Event.event_id.in_(event_ids), Event.flash_sale)
+        }
+        if not flash_events:
+            return
+        ticket_ids = {
+            ticket_id for (ticket_id,) in
+            db.session.query(Ticket.ticket_id).filter(Ticket.ticket_id.in_(quantities), Ticket.event_id.in_(flash_events))
+        }
+        FlashSaleService.release({ticket_id: quantities[ticket_id] for ticket_id in ticket_ids})
+    
+    @staticmethod
+    def schedule_reconcile(event_id):
+        """Queue a reconciliation of the event's held quantities; bookings
+        arriving while one is queued share it"""
+        with _pending_lock:
+            if event_id in _pending_events:
+                return
+            _pending_events.add(event_id)
+        reconcile_executor.submit(FlashSaleService.reconcile_event, event_id)
+    
+    @staticmethod
+    def reconcile_event(event_id):
+        """Write the event's active holds into tickets.held_quantity and its summary"""
+        with _pending_lock:
+            _pending_events.discard(event_id)
+        InventoryService.reconcile_held_quantities(event_id)
+        InventoryService.refresh_event_summary(event_id)
+        db.session.commit()
+        EventService.invalidate_event(event_id)
+        metrics.incr('flash_sale.reconciled')
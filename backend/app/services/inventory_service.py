@@ -0,0 +1,228 @@
+# Inventory service - Business logic
+from app.extensions import db
+from app.models.booking import TicketHold
+from app.models.event import Ticket, EventSummary
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import case, func, insert, update
+
+
+class InsufficientInventory(ValueError):
+    """Selling would take a ticket type below zero"""
+
+    def __init__(self, ticket_ids):
+        super().__init__(f"Not enough tickets left for ticket IDs {sorted(ticket_ids)}")
+        self.ticket_ids = ticket_ids
+
+
+class InventoryService:
+    """Inventory service for per-event price and availability figures.
+
+    Lock order, everywhere: ticket holds -> tickets -> event summary.
+    """
+
+    @staticmethod
+    def refresh_event_summary(event_id):
+        """Recompute the event summary from its tickets inside the current transaction.
+
+        The summary row is locked before the tickets are aggregated, so
+        concurrent refreshes of the same event serialize and the later one
+        sees the earlier one's committed ticket changes. Callers that also
+        lock tickets must lock them first (tickets -> summary).
+        """
+        summary = (
+            db.session.query(EventSummary)
+            .filter_by(event_id=event_id)
+            .with_for_update()
+            .first()
+        )
+        if summary is None:
+            summary = EventSummary(event_id=event_id)
+            db.session.add(summary)
+
+        db.session.flush()
+        min_price, max_price, remaining = (
+            db.session.query(
+                func.min(Ticket.price),
+                func.max(Ticket.price),
+                func.coalesce(func.sum(Ticket.quantity - Ticket.held_quantity), 0)
+            )
+            .filter(Ticket.event_id == event_id)
+            .one()
+        )
+
+        summary.min_price = min_price
+        summary.max_price = max_price
+        summary.remaining_quantity = int(remaining)
+        summary.sold_out = summary.remaining_quantity <= 0
+        # Always stamp, even if the aggregates did not move: event ETags rely on it
+        summary.updated_at = datetime.utcnow()
+        return summary
+    
+    @staticmethod
+    def lock_tickets(ticket_ids):
+        """Load and lock the given tickets in ticket id order; returns {id: ticket}"""
+        tickets = (
+            Ticket.query
+            .filter(Ticket.ticket_id.in_(ticket_ids))
+            .order_by(Ticket.ticket_id)
+            .with_for_update()
+            .all()
+        )
+        return {ticket.ticket_id: ticket for ticket in tickets}
+    
+    @staticmethod
+    def hold_tickets(booking_id, tickets, quantities, update_tickets=True):
+        """Reserve ``quantities`` ({ticket_id: qty}) of already locked ``tickets``
+        for a booking. Returns the expiry of the new holds.
+
+        Flash-sale bookings pass ``update_tickets=False``: their quantity is
+        already reserved in the inventory gate and held_quantity is caught up
+        later by reconcile_held_quantities.
+        """
+        expires_at = datetime.utcnow() + timedelta(seconds=current_app.config['BOOKING_HOLD_TTL'])
+        if update_tickets:
+            for ticket_id, quantity in quantities.items():
+                ticket = tickets[ticket_id]
+                ticket.held_quantity = (ticket.held_quantity or 0) + quantity
+        
+        db.session.execute(insert(TicketHold), [
+            {
+                'booking_id': booking_id,
+                'ticket_id': ticket_id,
+                'quantity': quantity,
+                'status': 'active',
+                'expires_at': expires_at,
+                'created_at': datetime.utcnow()
+            }
+            for ticket_id, quantity in quantities.items()
+        ])
+        return expires_at
+    
+    @staticmethod
+    def reconcile_held_quantities(event_id):
+        """Recompute held_quantity of the event's tickets from their active holds"""
+        held = dict(
+            db.session.query(TicketHold.ticket_id, func.sum(TicketHold.quantity))
+            .join(Ticket, Ticket.ticket_id == TicketHold.ticket_id)
+            .filter(Ticket.event_id == event_id, TicketHold.status == 'active')
+            .group_by(TicketHold.ticket_id)
+            .all()
+        )
+        tickets = (
+            Ticket.query
+            .filter_by(event_id=event_id)
+            .order_by(Ticket.ticket_id)
+            .with_for_update()
+            .all()
+        )
+        for ticket in tickets:
+            ticket.held_quantity = int(held.get(ticket.ticket_id, 0))
+        return tickets
+    
+    @staticmethod
+    def active_hold_expiry(booking_id):
+        """Earliest expiry among the booking's active holds, or None"""
+        return (
+            db.session.query(func.min(TicketHold.expires_at))
+            .filter(TicketHold.booking_id == booking_id, TicketHold.status == 'active')
+            .scalar()
+        )
+    
+    @staticmethod
+    def sell_tickets(quantities, converted=None):
+        """Take sold ``quantities`` ({ticket_id: qty}) off the tickets, all or nothing.
+
+        ``converted`` ({ticket_id: qty}, from convert_holds) is what the
+        booking's own holds covered. A line it fully covers only needs the
+        quantity; any other line may only take stock no one else holds
+        (``quantity - held_quantity``), so a booking paid after its hold
+        expired cannot sell tickets reserved by other buyers' holds.
+
+        The rows are locked in ticket id order in one statement, then
+        decremented by one conditional UPDATE; if any ticket lacks the
+        quantity, InsufficientInventory is raised and the caller must roll
+        back. Two round-trips regardless of the number of lines.
+        """
+        if not quantities:
+            return
+        converted = converted or {}
+        InventoryService.lock_tickets(quantities)
+        
+        amount = case(quantities, value=Ticket.ticket_id)
+        needed = amount
+        uncovered = [ticket_id for ticket_id, quantity in quantities.items() if converted.get(ticket_id, 0) < quantity]
+        if uncovered:
+            needed = amount + case((Ticket.ticket_id.in_(uncovered), Ticket.held_quantity), else_=0)
+        sold = db.session.execute(
+            update(Ticket)
+            .where(Ticket.ticket_id.in_(quantities), Ticket.quantity >= needed)
+            .values(quantity=Ticket.quantity - amount)
+            .returning(Ticket.ticket_id)
+            .execution_options(synchronize_session='fetch')
+        ).scalars().all()
+        
+        missing = set(quantities) - set(sold)
+        if missing:
+            raise InsufficientInventory(missing)
+    
+    @staticmethod
+    def convert_holds(booking_id):
+        """Turn a booking's active holds into sales: the held quantity stops
+        counting as held (the caller decrements the sold quantity). Returns
+        the converted quantities as ``{ticket_id: qty}``, empty when the
+        holds were already released."""
+        holds = (
+            TicketHold.query
+            .filter_by(booking_id=booking_id, status='active')
+            .order_by(TicketHold.hold_id)
+            .with_for_update()
+            .all()
+        )
+        InventoryService._settle_holds(holds, 'converted')
+        converted = {}
+        for hold in holds:
+            converted[hold.ticket_id] = converted.get(hold.ticket_id, 0) + hold.quantity
+        return converted
+    
+    @staticmethod
+    def release_expired_holds(batch_size):
+        """Release up to ``batch_size`` expired holds inside the current
+        transaction. Holds locked by another sweeper or by a payment being
+        confirmed are skipped. Returns ``(released_count, event_ids, quantities)``
+        where ``quantities`` maps ticket ids to the quantity released."""
+        grace = timedelta(seconds=current_app.config.get('HOLD_RELEASE_GRACE', 60))
+        holds = (
+            TicketHold.query
+            .filter(TicketHold.status == 'active', TicketHold.expires_at <= datetime.utcnow() - grace)
+            .order_by(TicketHold.expires_at, TicketHold.hold_id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not holds:
+            return 0, set(), {}
+        
+        tickets = InventoryService._settle_holds(holds, 'released')
+        event_ids = {ticket.event_id for ticket in tickets.values()}
+        for event_id in sorted(event_ids):
+            InventoryService.refresh_event_summary(event_id)
+        quantities = {}
+        for hold in holds:
+            quantities[hold.ticket_id] = quantities.get(hold.ticket_id, 0) + hold.quantity
+        return len(holds), event_ids, quantities
+    
+    @staticmethod
+    def _settle_holds(holds, status):
+        """Mark locked holds ``status`` and take them off the tickets' held quantity"""
+        held = {}
+        for hold in holds:
+            held[hold.ticket_id] = held.get(hold.ticket_id, 0) + hold.quantity
+            hold.status = status
+        
+        tickets = InventoryService.lock_tickets(held) if held else {}
+        for ticket_id, quantity in held.items():
+            ticket = tickets.get(ticket_id)
+            if ticket is not None:
+                ticket.held_quantity = max(0, (ticket.held_quantity or 0) - quantity)
+        return tickets
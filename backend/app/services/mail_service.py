@@ -0,0 +1,126 @@
+# Mail service - delivers the transactional mail outbox
+import email
+from datetime import datetime, timedelta
+from email import policy
+from sqlalchemy import and_, func, or_
+from app.extensions import db
+from app.models.notification import OutboundEmail
+from app.utils import metrics
+from app.utils.mail import outbox
+from app.utils.mail.outbox import SMTPPool, is_permanent
+
+
+class MailService:
+
+    @staticmethod
+    def pool(size=None, **session_options):
+        """SMTP sessions for send_batch. A dropped session is reopened and the
+        message retried once at once; anything longer waits for the outbox
+        backoff instead of holding a session."""
+        return SMTPPool(size or outbox.MAIL_WORKERS, max_attempts=2, retry_delay=0, **session_options)
+
+    @staticmethod
+    def outbox_status(recent=20):
+        """Backlog and failures of the outbox, for alerting: the senders
+        are separate processes, so their counters are not visible here"""
+        now = datetime.utcnow()
+        unsent, oldest = (
+            db.session.query(func.count(OutboundEmail.mail_id), func.min(OutboundEmail.created_at))
+            .filter(OutboundEmail.status.in_(outbox.UNSENT))
+            .one()
+        )
+        failed = OutboundEmail.query.filter(
+            OutboundEmail.status == 'failed', OutboundEmail.processed_at >= now - timedelta(days=1)
+        )
+        return {
+            'success': True,
+            'queueDepth': unsent,
+            'oldestUnsentSeconds': round((now - oldest).total_seconds(), 1) if oldest else 0,
+            'failedLastDay': failed.count(),
+            'recentFailures': [
+                {
+                    'mailId': mail.mail_id,
+                    'recipient': mail.recipient,
+                    'subject': mail.subject,
+                    'attempts': mail.attempts,
+                    'error': mail.last_error,
+                    'failedAt': mail.processed_at.isoformat(),
+                }
+                for mail in failed.order_by(OutboundEmail.processed_at.desc()).limit(recent)
+            ],
+        }, 200
+
+    @staticmethod
+    def claim_batch(batch_size):
+        """Claim up to ``batch_size`` due outbox rows for this sender.
+
+        Rows locked by another sender are skipped, and rows whose sender died
+        are claimed again once MAIL_LEASE_SECONDS have passed (the message
+        may then go out twice). Returns the claimed mail ids.
+        """
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=outbox.MAIL_LEASE_SECONDS)
+        mails = (
+            OutboundEmail.query
+            .filter(or_(
+                and_(OutboundEmail.status == 'pending', OutboundEmail.available_at <= now),
+                and_(OutboundEmail.status == 'sending', OutboundEmail.claimed_at <= lease_expired),
+            ))
+            .order_by(OutboundEmail.available_at, OutboundEmail.mail_id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        mail_ids = []
+        for mail in mails:
+            mail.status = 'sending'
+            mail.claimed_at = now
+            mail.attempts += 1
+            mail_ids.append(mail.mail_id)
+        db.session.commit()
+        return mail_ids
+
+    @staticmethod
+    def send_batch(pool, batch_size=None):
+        """Claim one batch and send it over ``pool``. Failures are retried
+        with backoff until MAIL_MAX_ATTEMPTS (5xx replies at once) and then
+        marked 'failed'. Returns how many messages were handled."""
+        mail_ids = MailService.claim_batch(batch_size or outbox.MAIL_BATCH_SIZE)
+        if not mail_ids:
+            return 0
+
+        mails = OutboundEmail.query.filter(OutboundEmail.mail_id.in_(mail_ids)).order_by(OutboundEmail.mail_id).all()
+        batch = [
+            (mail.mail_id, mail.claimed_at, mail.attempts, email.message_from_string(mail.message, policy=policy.default))
+            for mail in mails
+        ]
+        started = datetime.utcnow()
+        for mail in mails:
+            if mail.attempts == 1:
+                metrics.observe('mail.queue_wait', (started - mail.created_at).total_seconds())
+        # No transaction stays open while the SMTP server takes its time
+        db.session.commit()
+
+        outcomes = pool.send_all([msg for *_, msg in batch])
+
+        now = datetime.utcnow()
+        mails = {mail.mail_id: mail for mail in OutboundEmail.query.filter(OutboundEmail.mail_id.in_(mail_ids))}
+        for (mail_id, claimed_at, attempts, msg), error in zip(batch, outcomes):
+            mail = mails[mail_id]
+            if mail.status != 'sending' or mail.claimed_at != claimed_at:
+                # The lease ran out and another sender claimed the row
+                continue
+            if error is None:
+                mail.status, mail.last_error, mail.processed_at = 'sent', None, now
+                continue
+            mail.last_error = repr(error)
+            if is_permanent(error) or attempts >= outbox.MAIL_MAX_ATTEMPTS:
+                mail.status, mail.processed_at = 'failed', now
+                metrics.incr('mail.failed')
+                print(f"Mail {mail_id} to {msg['To']} failed after {attempts} attempts: {error!r}", flush=True)
+            else:
+                mail.status = 'pending'
+                mail.available_at = now + timedelta(seconds=outbox.MAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1))
+                metrics.incr('mail.deferred')
+        db.session.commit()
+        return len(batch)
@@ -0,0 +1,247 @@
+# Notification service - Event reminders and change announcements
+from app.extensions import db
+from app.models.booking import Booking
+from app.models.event import Event
+from app.models.notification import NotificationCampaign, CampaignRecipient
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from app.utils import metrics
+from app.utils.mail.outbox import SMTPPool
+from app.utils.mail.sender import build_campaign_email
+
+CAMPAIGN_KINDS = ('reminder', 'change')
+DATETIME_FORMAT = '%H:%M %d/%m/%Y'
+
+
+def format_event_time(value):
+    """How event times appear in notification emails"""
+    return value.strftime(DATETIME_FORMAT) if value else ''
+
+
+class NotificationService:
+    """Email campaigns to every confirmed booking of an event"""
+
+    @staticmethod
+    def create_campaign(event_id, kind, context=None, dedupe_key=None):
+        """Queue a campaign for 'flask send-notifications'. Returns its id, or
+        None when the event already has a ``kind`` campaign with ``dedupe_key``."""
+        if kind not in CAMPAIGN_KINDS:
+            raise ValueError(f"Unknown campaign kind: {kind}")
+        campaign = NotificationCampaign(event_id=event_id, kind=kind, context=context or {}, dedupe_key=dedupe_key)
+        db.session.add(campaign)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return None
+        metrics.incr(f'notifications.{kind}.created')
+        return campaign.campaign_id
+
+    @staticmethod
+    def announce_changes(event_id, changes):
+        """Queue a change announcement; ``changes`` is a list of
+        ``{'field', 'old', 'new'}`` shown to every attendee"""
+        return NotificationService.create_campaign(event_id, 'change', {'changes': changes})
+
+    @staticmethod
+    def schedule_reminders(now=None):
+        """Queue a reminder for each approved event starting within
+        REMINDER_LEAD_HOURS. One reminder per start time: rerunning is a
+        no-op, and a rescheduled event is reminded again."""
+        now = now or datetime.utcnow()
+        horizon = now + timedelta(hours=current_app.config['REMINDER_LEAD_HOURS'])
+        events = db.session.execute(
+            select(Event.event_id, Event.start_time)
+            .where(Event.start_time > now, Event.start_time <= horizon, Event.approved == 'approved')
+        ).all()
+        created = 0
+        for event_id, start_time in events:
+            if NotificationService.create_campaign(event_id, 'reminder', dedupe_key=start_time.isoformat()):
+                created += 1
+        return created
+
+    @staticmethod
+    def claim_campaign(campaign_id=None):
+        """Mark the oldest pending campaign (or ``campaign_id``) as running on
+        this node. Campaigns whose runner stopped heartbeating for
+        NOTIFICATION_LEASE seconds are claimed again and resume. Returns
+        ``(campaign_id, claimed_at)`` or None."""
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=current_app.config['NOTIFICATION_LEASE'])
+        query = NotificationCampaign.query.filter(or_(
+            NotificationCampaign.status == 'pending',
+            and_(NotificationCampaign.status == 'running', NotificationCampaign.claimed_at <= lease_expired),
+        ))
+        if campaign_id is not None:
+            query = query.filter(NotificationCampaign.campaign_id == campaign_id)
+        campaign = query.order_by(NotificationCampaign.campaign_id).with_for_update(skip_locked=True).first()
+        if campaign is None:
+            db.session.rollback()
+            return None
+        campaign.status = 'running'
+        campaign.claimed_at = now
+        campaign.started_at = campaign.started_at or now
+        db.session.commit()
+        return campaign.campaign_id, now
+
+    @staticmethod
+    def campaign_progress(campaign):
+        """Progress figures of a campaign (also what the CLI prints)"""
+        processed = campaign.sent + campaign.failed
+        return {
+            'campaignId': campaign.campaign_id,
+            'eventId': campaign.event_id,
+            'kind': campaign.kind,
+            'status': campaign.status,
+            'total': campaign.total,
+            'sent': campaign.sent,
+            'failed': campaign.failed,
+            'percent': round(100 * processed / campaign.total, 1) if campaign.total else 100.0,
+            'createdAt': campaign.created_at.isoformat() if campaign.created_at else None,
+            'startedAt': campaign.started_at.isoformat() if campaign.started_at else None,
+            'finishedAt': campaign.finished_at.isoformat() if campaign.finished_at else None,
+        }
+
+    @staticmethod
+    def _finish(campaign_id):
+        db.session.execute(
+            update(NotificationCampaign)
+            .where(NotificationCampaign.campaign_id == campaign_id)
+            .values(status='done', finished_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+    @staticmethod
+    def run_campaign(campaign_id, claimed_at, pool=None, batch_size=None, progress=None):
+        """Send a claimed campaign and return its progress.
+
+        Recipients are streamed from ``bookings`` in booking_id order with a
+        server-side cursor (``yield_per``), so memory stays flat however many
+        there are. Each batch is rendered, sent in parallel over ``pool``
+        (NOTIFICATION_WORKERS persistent SMTP sessions by default), and its
+        per-booking outcomes, counters and checkpoint are committed together;
+        after a crash at most one batch is sent twice. ``progress`` is called
+        with campaign_progress() after every batch. Stops early if another
+        node took the campaign over.
+        """
+        config = current_app.config
+        batch_size = batch_size or config['NOTIFICATION_BATCH_SIZE']
+        campaign = db.session.get(NotificationCampaign, campaign_id)
+        event_id, kind = campaign.event_id, campaign.kind
+        event = db.session.get(Event, event_id)
+
+        if kind == 'reminder' and campaign.dedupe_key != event.start_time.isoformat():
+            # The event was rescheduled; its new start time gets its own reminder
+            metrics.incr('notifications.reminder.stale')
+            NotificationService._finish(campaign_id)
+            return NotificationService.campaign_progress(db.session.get(NotificationCampaign, campaign_id))
+
+        values = dict(
+            campaign.context or {},
+            event_name=event.name,
+            start_time=format_event_time(event.start_time),
+            venue_name=event.venue_name,
+            address=event.address,
+        )
+        if not campaign.total:
+            campaign.total = db.session.execute(
+                select(func.count(Booking.booking_id))
+                .where(Booking.event_id == event_id, Booking.status == 'confirmed')
+            ).scalar()
+        last_booking_id = campaign.last_booking_id
+        db.session.commit()
+
+        stream = (
+            select(Booking.booking_id, Booking.booking_email, Booking.booking_full_name)
+            .where(Booking.event_id == event_id, Booking.status == 'confirmed',
+                   Booking.booking_id > last_booking_id)
+            .order_by(Booking.booking_id)
+        )
+        own_pool = pool is None
+        pool = pool or SMTPPool(config['NOTIFICATION_WORKERS'])
+        owned = True
+        try:
+            # A connection of its own: the session commits after every batch,
+            # which would close a cursor opened on the session's connection
+            with db.engine.connect() as connection:
+                result = connection.execution_options(yield_per=batch_size).execute(stream)
+                for batch in result.partitions():
+                    started = time.perf_counter()
+                    outcomes = pool.send_all([
+                        build_campaign_email(kind, email, user_name=name or 'User', booking_id=booking_id, **values)
+                        for booking_id, email, name in batch
+                    ])
+                    now = datetime.utcnow()
+                    db.session.execute(insert(CampaignRecipient), [
+                        {
+                            'campaign_id': campaign_id,
+                            'booking_id': booking_id,
+                            'email': email,
+                            'status': 'sent' if error is None else 'failed',
+                            'error': None if error is None else repr(error)[:500],
+                            'processed_at': now,
+                        }
+                        for (booking_id, email, _), error in zip(batch, outcomes)
+                    ])
+                    failed = sum(1 for error in outcomes if error is not None)
+                    # Heartbeat and checkpoint, only while the claim is still ours
+                    heartbeat = db.session.execute(
+                        update(NotificationCampaign)
+                        .where(NotificationCampaign.campaign_id == campaign_id,
+                               NotificationCampaign.claimed_at == claimed_at)
+                        .values(
+                            sent=NotificationCampaign.sent + len(batch) - failed,
+                            failed=NotificationCampaign.failed + failed,
+                            last_booking_id=batch[-1].booking_id,
+                            claimed_at=now,
+                        )
+                    )
+                    if heartbeat.rowcount == 0:
+                        db.session.rollback()
+                        metrics.incr('notifications.lease_lost')
+                        owned = False
+                        break
+                    db.session.commit()
+                    claimed_at = now
+                    metrics.incr(f'notifications.{kind}.sent', len(batch) - failed)
+                    metrics.incr(f'notifications.{kind}.failed', failed)
+                    metrics.observe('notifications.batch', time.perf_counter() - started)
+                    if progress is not None:
+                        progress(NotificationService.campaign_progress(db.session.get(NotificationCampaign, campaign_id)))
+        finally:
+            if own_pool:
+                pool.close()
+
+        if owned:
+            NotificationService._finish(campaign_id)
+        return NotificationService.campaign_progress(db.session.get(NotificationCampaign, campaign_id))
+
+    @staticmethod
+    def send_pending_campaigns(pool=None, batch_size=None, progress=None):
+        """Claim and send campaigns until none is pending; returns their progress"""
+        results = []
+        while True:
+            claim = NotificationService.claim_campaign()
+            if claim is None:
+                return results
+            campaign_id, claimed_at = claim
+            results.append(NotificationService.run_campaign(
+                campaign_id, claimed_at, pool=pool, batch_size=batch_size, progress=progress
+            ))
+
+    @staticmethod
+    def get_event_campaigns(event_id):
+        """Progress of the event's campaigns, newest first"""
+        campaigns = (
+            NotificationCampaign.query
+            .filter_by(event_id=event_id)
+            .order_by(NotificationCampaign.campaign_id.desc())
+            .all()
+        )
+        return {
+            'success': True,
+            'campaigns': [NotificationService.campaign_progress(campaign) for campaign in campaigns]
+        }, 200
@@ -1,20 +1,118 @@
 # Payment service - Business logic
 from app.extensions import db
-from app.models.payment import Payment
+from app.models.payment import Payment, PaymentWebhookEvent
 from app.models.booking import Booking
 from app.models.event import Ticket
-from datetime import datetime
+from app.services.inventory_service import InventoryService, InsufficientInventory
+from app.services.event_service import EventService
+import calendar
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from decimal import Decimal, ROUND_DOWN
-from app.utils.payment.payos_payment import payos_setup, client
+from flask import current_app
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from app.utils import metrics
+from app.utils.db_retry import retry_on_conflict
+from app.utils.payment.payos_payment import (
+    payos_setup, get_client, get_gateway_client, is_gateway_failure, PAYOS_TIMEOUT, PAYOS_CHECKOUT_URL
+)
+from payos import NotFoundError, PayOSError
 from payos.types import CreatePaymentLinkRequest
 
 
+# PayOS answers lookups for unknown order codes with this error code
+PAYOS_ORDER_NOT_FOUND = '101'
+# Link states after which the payment can no longer complete
+GATEWAY_FINAL_FAILURES = ('CANCELLED', 'EXPIRED', 'FAILED', 'MISSING')
+# A booking's first order code is booking_id + ORDER_CODE_BASE; each later
+# checkout attempt that needs a new PayOS link adds ORDER_CODE_STRIDE, since
+# PayOS refuses to create a second link for an order code it has seen. Order
+# codes are bigint columns (migration 015); PayOS takes up to 2^53 - 1.
+ORDER_CODE_BASE = 10000
+ORDER_CODE_STRIDE = 10 ** 9
+
+
+def order_code_for(booking_id):
+    """Order code of a booking's first checkout attempt"""
+    return booking_id + ORDER_CODE_BASE
+
+
+def booking_id_for(order_code):
+    """Booking an order code of any attempt belongs to"""
+    return order_code % ORDER_CODE_STRIDE - ORDER_CODE_BASE
+
+
+class PaymentGatewayError(Exception):
+    """The payment gateway failed or timed out"""
+
+
+class PaymentNotFound(ValueError):
+    """No payment exists for the order code"""
+
+
+class InvalidWebhook(ValueError):
+    """The webhook body is malformed or its checksum signature is wrong"""
+
+
+class PaymentInProgress(ValueError):
+    """Another checkout for the same booking is still talking to the gateway"""
+
+
 class PaymentService:
     """Payment service for handling transactions"""
     
     @staticmethod
     def create_payos_payment(booking_id, amount, ticket_types):
-        """Create a PayOS payment"""
+        """Create a PayOS payment link in two phases.
+
+        The pending payment is committed by ``reserve_payment`` first, the
+        gateway is called with no transaction (and no row lock) open, and the
+        checkout URL is recorded afterwards. If the gateway call fails the
+        reservation is released so the booking can try again. A retry first
+        asks PayOS whether the failed call created the link after all and
+        reuses it; otherwise it moves to a fresh order code.
+        """
+        if get_gateway_client().breaker.state == 'open':
+            # Fail fast instead of reserving a payment PayOS cannot serve
+            raise PaymentGatewayError("PayOS is temporarily unavailable")
+        
+        payment_id, order_code, amount, hold_expiry, checkout_url, taken_over = \
+            PaymentService.reserve_payment(booking_id, amount, ticket_types)
+        if checkout_url:
+            # A previous attempt already got a link for this order
+            return {"payment_url": checkout_url, "order_code": order_code}
+        
+        try:
+            if taken_over:
+                checkout_url = PaymentService._resume_payment_link(order_code, amount)
+                if not checkout_url:
+                    order_code = PaymentService.next_order_code(payment_id)
+            if not checkout_url:
+                checkout_url = PaymentService._request_payment_link(order_code, amount, hold_expiry)
+        except PaymentInProgress:
+            raise
+        except Exception as exc:
+            PaymentService.release_payment(payment_id)
+            raise PaymentGatewayError(f"PayOS could not create the payment link: {exc}") from exc
+        
+        PaymentService.record_checkout_url(payment_id, checkout_url)
+        return {
+            "payment_url": checkout_url,
+            "order_code": order_code
+        }
+    
+    @staticmethod
+    def reserve_payment(booking_id, amount, ticket_types):
+        """Phase one: validate the request and commit a pending payment.
+
+        Returns ``(payment_id, order_code, amount, hold_expiry, checkout_url,
+        taken_over)``; ``checkout_url`` is set when an earlier attempt already
+        has a link, and ``taken_over`` when this attempt replaces a failed or
+        abandoned one whose order code PayOS may already know. Only the
+        booking row is locked, and only until the commit.
+        """
         # Validate and prepare amount
         amount = int(Decimal(str(amount)).quantize(Decimal("1"), rounding=ROUND_DOWN))
         
@@ -24,56 +122,171 @@ class PaymentService:
         if not ticket_types or not isinstance(ticket_types, list):
             raise ValueError("ticket_types must be a non-empty list")
         
-        # Create payment record
-        payment = Payment(
-            booking_id=booking_id,
-            amount=amount,
-            payment_method="payos",
-            payment_status="pending",
-            transaction_id=booking_id + 10000
-        )
-        db.session.add(payment)
-        
-        # Lock tickets to prevent double booking
-        ticket_ids = [t["ticket_id"] for t in ticket_types]
-        tickets = (
-            db.session.query(Ticket)
-            .filter(Ticket.ticket_id.in_(ticket_ids))
-            .with_for_update()
-            .all()
-        )
-        
-        ticket_map = {t.ticket_id: t for t in tickets}
-        
-        # Validate ticket quantities
-        for item in ticket_types:
-            ticket = ticket_map.get(item["ticket_id"])
-            if not ticket:
-                raise ValueError(f"Ticket {item['ticket_id']} not found")
+        try:
+            # Serializes checkout attempts for the same booking
+            booking = (
+                db.session.query(Booking)
+                .filter_by(booking_id=booking_id)
+                .with_for_update()
+                .one_or_none()
+            )
+            if not booking:
+                raise ValueError("Booking not found")
             
-            if ticket.quantity < item["quantity"]:
-                raise ValueError(f"Not enough tickets for {ticket.name}")
-        
-        db.session.flush()
+            # The booking's holds already reserve the quantity, so the tickets
+            # are only read here
+            ticket_ids = [t["ticket_id"] for t in ticket_types]
+            tickets = (
+                db.session.query(Ticket)
+                .filter(Ticket.ticket_id.in_(ticket_ids))
+                .all()
+            )
+            
+            ticket_map = {t.ticket_id: t for t in tickets}
+            
+            # Validate ticket quantities
+            for item in ticket_types:
+                ticket = ticket_map.get(item["ticket_id"])
+                if not ticket:
+                    raise ValueError(f"Ticket {item['ticket_id']} not found")
+                
+                if ticket.quantity < item["quantity"]:
+                    raise ValueError(f"Not enough tickets for {ticket.name}")
+            
+            # The payment link must not outlive the booking's inventory hold
+            hold_expiry = InventoryService.active_hold_expiry(booking_id)
+            if hold_expiry is None or hold_expiry <= datetime.utcnow():
+                raise ValueError("Booking hold has expired, please book again")
+            
+            payment = (
+                Payment.query
+                .filter_by(booking_id=booking_id, payment_method="payos")
+                .order_by(Payment.payment_id.desc())
+                .first()
+            )
+            order_code = payment.transaction_id if payment else order_code_for(booking_id)
+            if payment and payment.payment_status == "completed":
+                raise ValueError("Booking is already paid")
+            if payment and payment.payment_status == "pending":
+                if payment.checkout_url:
+                    resumed = (payment.payment_id, order_code, int(payment.amount), hold_expiry,
+                               payment.checkout_url, False)
+                    db.session.commit()
+                    return resumed
+                if payment.created_at > datetime.utcnow() - timedelta(seconds=2 * PAYOS_TIMEOUT):
+                    raise PaymentInProgress("A payment link for this booking is still being created")
+            
+            if payment:
+                # Take over a failed or abandoned attempt
+                payment.payment_status = "pending"
+                payment.amount = amount
+                payment.checkout_url = None
+                payment.created_at = datetime.utcnow()
+            else:
+                payment = Payment(
+                    booking_id=booking_id,
+                    amount=amount,
+                    payment_method="payos",
+                    payment_status="pending",
+                    transaction_id=order_code
+                )
+                db.session.add(payment)
+            taken_over = payment.payment_id is not None
+            db.session.flush()
+            # Read before commit so the gateway phase does not reopen a transaction
+            payment_id = payment.payment_id
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
         
-        # Prepare PayOS request
-        order_code = booking_id + 10000
-        payment_data = payos_setup(order_code, amount)
+        return payment_id, order_code, amount, hold_expiry, None, taken_over
+    
+    @staticmethod
+    def _resume_payment_link(order_code, amount):
+        """Checkout URL of a link PayOS made for an earlier attempt even though
+        that call failed on our side (e.g. timed out after creating it), or
+        None when a new order code is needed. A pending link for another
+        amount is cancelled; a paid one is queued for the webhook workers."""
+        link = PaymentService._gateway_link(order_code)
+        if link is None:
+            return None
+        if link.status == 'PAID':
+            PaymentService._queue_gateway_result(order_code, link.status, 'checkout')
+            raise PaymentInProgress("This booking has already been paid and is being confirmed")
+        if link.status == 'PENDING':
+            if int(link.amount) == amount:
+                metrics.incr('payment.gateway.link_resumed')
+                return f"{PAYOS_CHECKOUT_URL}/{link.id}"
+            gateway = get_gateway_client()
+            gateway.call(
+                'cancel_link',
+                lambda: gateway.payos.payment_requests.cancel(
+                    order_code, 'Replaced by a new checkout', timeout=gateway.timeout
+                ),
+                is_failure=is_gateway_failure
+            )
+        return None
+    
+    @staticmethod
+    def next_order_code(payment_id):
+        """Move a taken-over payment to its next order code, committed before
+        PayOS sees it so the following retry looks up the right link"""
+        payment = db.session.get(Payment, payment_id)
+        payment.transaction_id += ORDER_CODE_STRIDE
+        order_code = payment.transaction_id
+        db.session.commit()
+        return order_code
+    
+    @staticmethod
+    def _request_payment_link(order_code, amount, hold_expiry):
+        """Phase two: ask PayOS for a checkout URL through the pooled,
+        circuit-broken gateway client (bounded by PAYOS_TIMEOUT)"""
+        payment_data = payos_setup(order_code, amount, expired_at=calendar.timegm(hold_expiry.utctimetuple()))
         payment_data = CreatePaymentLinkRequest(**payment_data)
-        response = client.payment_requests.create(payment_data=payment_data)
-        response = response.model_dump_camel_case()
-        
-        return {
-            "payment_url": response.get("checkoutUrl"),
-            "order_code": order_code
-        }
+        gateway = get_gateway_client()
+        response = gateway.call(
+            'create_link',
+            lambda: gateway.payos.payment_requests.create(payment_data=payment_data, timeout=gateway.timeout),
+            is_failure=is_gateway_failure
+        )
+        return response.model_dump_camel_case().get("checkoutUrl")
     
     @staticmethod
+    def record_checkout_url(payment_id, checkout_url):
+        """Phase three: store the link so retries can resume it"""
+        payment = db.session.get(Payment, payment_id)
+        payment.checkout_url = checkout_url
+        db.session.commit()
+    
+    @staticmethod
+    def release_payment(payment_id):
+        """Compensate a failed gateway call: give up the pending payment so a
+        new attempt can reserve it again (the booking's holds stay)"""
+        try:
+            db.session.rollback()
+            payment = db.session.get(Payment, payment_id)
+            if payment and payment.payment_status == "pending" and not payment.checkout_url:
+                payment.payment_status = "failed"
+                db.session.commit()
+            metrics.incr('payment.gateway.released')
+        except Exception as exc:
+            db.session.rollback()
+            print("Could not release payment", payment_id, ":", str(exc), flush=True)
+    
+    @staticmethod
+    @retry_on_conflict('success_payment')
     def success_payment(order_id):
-        """Mark payment as successful and update ticket quantities"""
-        payment = Payment.query.filter_by(transaction_id=order_id).first()
+        """Mark payment as successful and update ticket quantities.
+
+        Lock order: payment -> holds -> tickets (by id) -> summary, so
+        concurrent confirmations cannot deadlock each other; any remaining
+        serialization/deadlock abort is retried with backoff. If any line
+        cannot be covered nothing is confirmed (InsufficientInventory).
+        """
+        payment = PaymentService._payment_for_order(order_id).with_for_update().first()
         if not payment:
-            raise ValueError("Payment not found")
+            raise PaymentNotFound("Payment not found")
         
         # Idempotency check
         if payment.payment_status == "completed":
@@ -87,37 +300,56 @@ class PaymentService:
         payment.paid_at = datetime.utcnow()
         
         # Update ticket quantities
-        booking = Booking.query.get(payment.booking_id)
+        booking = db.session.get(Booking, payment.booking_id)
         if not booking:
             raise ValueError("Booking not found")
         
+        converted = InventoryService.convert_holds(booking.booking_id)
+        
+        quantities = {}
         for line in booking.booking_lines:
-            ticket = (
-                db.session.query(Ticket)
-                .filter_by(ticket_id=line.ticket_id)
-                .with_for_update()
-                .one()
-            )
-            ticket.quantity -= line.quantity
+            quantities[line.ticket_id] = quantities.get(line.ticket_id, 0) + line.quantity
+        try:
+            # Lines whose hold was released compete for unheld stock only
+            InventoryService.sell_tickets(quantities, converted)
+        except InsufficientInventory:
+            metrics.incr('payment.success_payment.insufficient_inventory')
+            raise
+        
+        InventoryService.refresh_event_summary(booking.event_id)
         
         # Update booking status
         booking.status = 'confirmed'
         db.session.commit()
+        metrics.incr('payment.success_payment.confirmed')
+        EventService.invalidate_event(booking.event_id)
         
         return {
             "orderId": order_id,
             "status": "completed"
         }
     
+    @staticmethod
+    def _payment_for_order(order_code):
+        """Query for the payment an order code belongs to, including codes of
+        the booking's earlier attempts: money paid on any of its links
+        confirms it. Failures only ever apply to the current code."""
+        return Payment.query.filter(or_(
+            Payment.transaction_id == order_code,
+            and_(Payment.booking_id == booking_id_for(order_code), Payment.transaction_id > order_code)
+        ))
+    
     @staticmethod
     def fail_payment(order_id):
         """Mark payment as failed"""
         payment = Payment.query.filter_by(transaction_id=order_id).first()
         if not payment:
-            raise ValueError("Payment not found")
+            raise PaymentNotFound("Payment not found")
         
-        payment.payment_status = "failed"
-        db.session.commit()
+        # A late failure notice never undoes a confirmed payment
+        if payment.payment_status != "completed":
+            payment.payment_status = "failed"
+            db.session.commit()
         
         return {
             "orderId": order_id,
@@ -126,18 +358,331 @@ class PaymentService:
     
     @staticmethod
     def process_payment(payment_id):
-        """Process payment through gateway - to be implemented"""
-        pass
+        """Bring one payment in line with the gateway; returns the outcome
+        ('paid', 'failed', 'pending', 'unfulfillable' or 'error')"""
+        payment = db.session.get(Payment, payment_id)
+        if not payment:
+            raise PaymentNotFound("Payment not found")
+        if payment.payment_status != "pending":
+            return payment.payment_status
+        order_code = payment.transaction_id
+        db.session.commit()
+        status = PaymentService._gateway_status(order_code)
+        return PaymentService._apply_gateway_statuses({payment_id: (order_code, status)})[payment_id]
     
     @staticmethod
     def get_payment_status(payment_id):
-        """Get payment status - to be implemented"""
-        pass
+        """Local status of a payment next to what PayOS reports for it"""
+        payment = db.session.get(Payment, payment_id)
+        if not payment:
+            raise PaymentNotFound("Payment not found")
+        result = {
+            "paymentId": payment.payment_id,
+            "bookingId": payment.booking_id,
+            "orderCode": payment.transaction_id,
+            "status": payment.payment_status,
+            "gatewayStatus": None
+        }
+        if payment.payment_status == "pending":
+            db.session.commit()
+            result["gatewayStatus"] = PaymentService._gateway_status(result["orderCode"])
+        return result
     
     @staticmethod
-    def handle_webhook(data):
-        """Handle payment gateway webhook - to be implemented"""
-        pass
+    def _gateway_link(order_code):
+        """PayOS's payment link for the order code, or None when it has none"""
+        gateway = get_gateway_client()
+        try:
+            return gateway.call(
+                'get_link',
+                lambda: gateway.payos.payment_requests.get(order_code, timeout=gateway.timeout),
+                is_failure=is_gateway_failure
+            )
+        except PayOSError as exc:
+            if isinstance(exc, NotFoundError) or getattr(exc, 'error_code', None) == PAYOS_ORDER_NOT_FOUND:
+                return None
+            raise
+    
+    @staticmethod
+    def _gateway_status(order_code):
+        """PayOS status of the order's link ('PAID', 'CANCELLED', ...), or
+        'MISSING' when PayOS has no link for it"""
+        link = PaymentService._gateway_link(order_code)
+        return 'MISSING' if link is None else link.status
+    
+    @staticmethod
+    def _apply_gateway_statuses(statuses):
+        """Apply ``{payment_id: (order_code, gateway_status)}``.
+
+        Paid orders are confirmed one by one (each moves inventory); all
+        cancelled, expired and missing links are failed with one UPDATE.
+        Returns ``{payment_id: outcome}``.
+        """
+        outcomes = {}
+        failed = []
+        for payment_id, (order_code, status) in statuses.items():
+            if status == 'PAID':
+                try:
+                    PaymentService.success_payment(order_code)
+                    outcomes[payment_id] = 'paid'
+                except InsufficientInventory as exc:
+                    db.session.rollback()
+                    print("Payment", order_code, "is paid but cannot be fulfilled:", str(exc), flush=True)
+                    outcomes[payment_id] = 'unfulfillable'
+                except Exception as exc:
+                    db.session.rollback()
+                    print("Could not confirm payment", order_code, ":", str(exc), flush=True)
+                    outcomes[payment_id] = 'error'
+            elif status in GATEWAY_FINAL_FAILURES:
+                failed.append(payment_id)
+            else:
+                outcomes[payment_id] = 'error' if status is None else 'pending'
+        
+        if failed:
+            # Same rule as fail_payment: only pending payments change
+            db.session.execute(
+                update(Payment)
+                .where(Payment.payment_id.in_(failed), Payment.payment_status == 'pending')
+                .values(payment_status='failed')
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            outcomes.update({payment_id: 'failed' for payment_id in failed})
+        return outcomes
+    
+    @staticmethod
+    def claim_stale_payments(older_than, batch_size, after_id=0):
+        """Claim up to ``batch_size`` payments pending for longer than
+        ``older_than`` seconds, with ids above ``after_id``.
+
+        Rows locked by another node are skipped and claimed rows are leased
+        for RECONCILE_LEASE seconds, so concurrent reconcilers never query
+        the same payment. Returns ``[(payment_id, order_code, created_at)]``.
+        """
+        now = datetime.utcnow()
+        payments = (
+            Payment.query
+            .filter(
+                Payment.payment_status == 'pending',
+                Payment.created_at <= now - timedelta(seconds=older_than),
+                Payment.payment_id > after_id,
+                or_(Payment.reconcile_after.is_(None), Payment.reconcile_after <= now)
+            )
+            .order_by(Payment.payment_id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        lease = now + timedelta(seconds=current_app.config['RECONCILE_LEASE'])
+        claimed = []
+        for payment in payments:
+            payment.reconcile_after = lease
+            claimed.append((payment.payment_id, payment.transaction_id, payment.created_at))
+        db.session.commit()
+        return claimed
+    
+    @staticmethod
+    def reconcile_pending_payments(older_than=None, batch_size=None, workers=None, limit=None):
+        """Check stuck pending payments against PayOS and apply the result.
+
+        Claims batches in payment id order, queries the gateway for each
+        batch on a bounded thread pool, then applies the transitions. Safe
+        to run on several nodes at once. Returns throughput and drift stats.
+        """
+        config = current_app.config
+        older_than = config['RECONCILE_OLDER_THAN'] if older_than is None else older_than
+        batch_size = batch_size or config['RECONCILE_BATCH_SIZE']
+        workers = workers or config['RECONCILE_WORKERS']
+        
+        stats = {'checked': 0, 'paid': 0, 'failed': 0, 'pending': 0, 'unfulfillable': 0, 'error': 0}
+        max_drift = 0.0
+        started = time.perf_counter()
+        after_id = 0
+        
+        def lookup(order_code):
+            try:
+                return PaymentService._gateway_status(order_code)
+            except Exception as exc:
+                print("Gateway lookup failed for", order_code, ":", str(exc), flush=True)
+                return None
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reconcile') as pool:
+            while limit is None or stats['checked'] < limit:
+                size = batch_size if limit is None else min(batch_size, limit - stats['checked'])
+                claimed = PaymentService.claim_stale_payments(older_than, size, after_id)
+                if not claimed:
+                    break
+                after_id = claimed[-1][0]
+                order_codes = [order_code for _, order_code, _ in claimed]
+                statuses = dict(zip(
+                    [payment_id for payment_id, _, _ in claimed],
+                    zip(order_codes, pool.map(lookup, order_codes))
+                ))
+                outcomes = PaymentService._apply_gateway_statuses(statuses)
+                
+                now = datetime.utcnow()
+                for payment_id, _, created_at in claimed:
+                    outcome = outcomes[payment_id]
+                    stats[outcome] += 1
+                    metrics.incr(f'reconcile.{outcome}')
+                    if outcome in ('paid', 'failed', 'unfulfillable'):
+                        # How long the payment sat in the wrong state
+                        max_drift = max(max_drift, (now - created_at).total_seconds())
+                stats['checked'] += len(claimed)
+        
+        elapsed = time.perf_counter() - started
+        stats['drifted'] = stats['paid'] + stats['failed'] + stats['unfulfillable']
+        stats['max_drift_seconds'] = round(max_drift, 1)
+        stats['elapsed_seconds'] = round(elapsed, 3)
+        stats['per_second'] = round(stats['checked'] / elapsed, 1) if elapsed else None
+        return stats
+    
+    @staticmethod
+    def handle_webhook(body):
+        """Verify a PayOS webhook and store it in the inbox for the workers.
+
+        Only the checksum check and one INSERT happen here so the gateway
+        gets its acknowledgement immediately. Returns False when the order
+        code is already in the inbox (a gateway retry).
+        """
+        try:
+            data = get_client().webhooks.verify(body)
+        except PayOSError as exc:
+            metrics.incr('webhook.invalid')
+            raise InvalidWebhook(str(exc))
+        
+        created = PaymentService._store_webhook_event(data.order_code, data.model_dump_camel_case())
+        metrics.incr('webhook.received' if created else 'webhook.duplicate')
+        return created
+    
+    @staticmethod
+    def _store_webhook_event(order_code, payload):
+        """Insert an inbox row; False when the order code is already there"""
+        db.session.add(PaymentWebhookEvent(provider='payos', order_code=order_code, payload=payload))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        return True
+    
+    @staticmethod
+    def check_return(order_code):
+        """Status shown when the buyer comes back from the PayOS page.
+
+        The caller is not trusted: a pending payment is looked up at PayOS,
+        and only a PAID or final failed link is queued in the webhook inbox
+        (a no-op when the webhook got there first). The workers apply it;
+        nothing is finalized here.
+        """
+        payment = PaymentService._payment_for_order(order_code).first()
+        if not payment:
+            raise PaymentNotFound("Payment not found")
+        result = {"orderId": order_code, "status": payment.payment_status, "gatewayStatus": None}
+        if payment.payment_status != "pending":
+            return result
+        db.session.commit()
+        
+        status = PaymentService._gateway_status(order_code)
+        result["gatewayStatus"] = status
+        # MISSING may just be a link still being created; the reconciler handles it
+        if status == 'PAID' or (status in GATEWAY_FINAL_FAILURES and status != 'MISSING'):
+            PaymentService._queue_gateway_result(order_code, status, 'return')
+            result["status"] = "processing"
+        return result
+    
+    @staticmethod
+    def _queue_gateway_result(order_code, status, source):
+        """Put a link status read from PayOS in the webhook inbox, shaped like
+        a webhook ('00' = paid), for the workers to apply"""
+        queued = PaymentService._store_webhook_event(order_code, {
+            'code': '00' if status == 'PAID' else '01',
+            'orderCode': order_code,
+            'status': status,
+            'source': source
+        })
+        metrics.incr(f'webhook.{source}_queued' if queued else 'webhook.duplicate')
+        return queued
+    
+    @staticmethod
+    def claim_webhook_events(batch_size):
+        """Claim up to ``batch_size`` due inbox rows for this worker.
+
+        Rows locked by another worker are skipped, and rows whose worker died
+        are claimed again once WEBHOOK_LEASE_SECONDS have passed. Returns
+        the claimed event ids.
+        """
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=current_app.config['WEBHOOK_LEASE_SECONDS'])
+        events = (
+            PaymentWebhookEvent.query
+            .filter(or_(
+                and_(PaymentWebhookEvent.status == 'pending', PaymentWebhookEvent.available_at <= now),
+                and_(PaymentWebhookEvent.status == 'processing', PaymentWebhookEvent.claimed_at <= lease_expired),
+            ))
+            .order_by(PaymentWebhookEvent.available_at, PaymentWebhookEvent.event_id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        event_ids = []
+        for event in events:
+            event.status = 'processing'
+            event.claimed_at = now
+            event.attempts += 1
+            event_ids.append(event.event_id)
+        db.session.commit()
+        return event_ids
+    
+    @staticmethod
+    def process_webhook_event(event_id):
+        """Apply one claimed inbox row; failures are retried with backoff
+        until WEBHOOK_MAX_ATTEMPTS. Returns the row's new status."""
+        event = db.session.get(PaymentWebhookEvent, event_id)
+        order_code, payload, attempts = event.order_code, event.payload, event.attempts
+        error = None
+        try:
+            if payload.get('code') == '00':
+                PaymentService.success_payment(order_code)
+            else:
+                PaymentService.fail_payment(order_code)
+            status = 'done'
+        except PaymentNotFound as exc:
+            # e.g. the test webhook PayOS sends when the URL is registered
+            db.session.rollback()
+            status, error = 'ignored', str(exc)
+        except InsufficientInventory as exc:
+            # Paid but unfulfillable: needs a refund, retrying will not help
+            db.session.rollback()
+            status, error = 'failed', str(exc)
+        except Exception as exc:
+            db.session.rollback()
+            error = str(exc)
+            status = 'failed' if attempts >= current_app.config['WEBHOOK_MAX_ATTEMPTS'] else 'pending'
+            print("Webhook", event_id, "failed (attempt", attempts, "):", error, flush=True)
+        
+        event = db.session.get(PaymentWebhookEvent, event_id)
+        event.status = status
+        event.last_error = error
+        if status == 'pending':
+            delay = current_app.config['WEBHOOK_RETRY_DELAY'] * 2 ** (attempts - 1)
+            event.available_at = datetime.utcnow() + timedelta(seconds=delay)
+            metrics.incr('webhook.retry')
+        else:
+            event.processed_at = datetime.utcnow()
+            metrics.incr(f'webhook.{status}')
+            metrics.observe('webhook.lag', (event.processed_at - event.received_at).total_seconds())
+        db.session.commit()
+        return status
+    
+    @staticmethod
+    def process_webhook_events(batch_size=None):
+        """Claim and apply one batch; returns how many events were handled"""
+        batch_size = batch_size or current_app.config['WEBHOOK_BATCH_SIZE']
+        event_ids = PaymentService.claim_webhook_events(batch_size)
+        for event_id in event_ids:
+            PaymentService.process_webhook_event(event_id)
+        return len(event_ids)
     
     @staticmethod
     def refund_payment(payment_id):
@@ -1,7 +1,7 @@
 # User service - Business logic
 from app.extensions import db
 from app.models.user import User
-from werkzeug.security import generate_password_hash
+from app.utils.passwords import hasher
 from datetime import datetime
 
 
@@ -53,7 +53,7 @@ class UserService:
         if not user:
             return {'success': False, 'message': 'Tài khoản không tồn tại'}, 401
         
-        hashed_password = generate_password_hash(new_password)
+        hashed_password = hasher.hash(new_password)
         user.password_hash = hashed_password
         db.session.commit()
         
@@ -0,0 +1,132 @@
+# Role-based authorization from JWT claims, without a user lookup per request
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, request, jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
+from redis.exceptions import RedisError
+from app.extensions import db
+from app.models.user import User
+from app.utils import cache, metrics
+from app.utils.cache import LocalLRUCache
+
+ROLE_CLAIM = 'role'
+VERSION_CLAIM = 'rv'
+
+# Version that no token carries: every token of a deleted user is revoked
+REVOKED = 2 ** 31 - 1
+
+# Per-worker copy of each user's current role version
+_versions = LocalLRUCache(maxsize=4096)
+
+
+class RoleChangeNotPublished(Exception):
+    """The principal store refused a role version: older tokens would stay valid"""
+
+
+def _version_key(user_id):
+    return f"principal:rv:{user_id}"
+
+
+def token_claims(user):
+    """Additional access-token claims for ``user`` (role and role version)"""
+    return {ROLE_CLAIM: user.role or 'user', VERSION_CLAIM: user.role_version or 0}
+
+
+def current_role_version(user_id):
+    """Lowest role version a token of ``user_id`` must carry.
+
+    Role changes are published to Redis for one token lifetime; no key means
+    nothing changed recently enough to matter. The answer is kept per worker
+    for PRINCIPAL_CACHE_TTL seconds. If Redis is down the database decides.
+    """
+    version = _versions.get(user_id)
+    if version is None:
+        try:
+            stored = cache.r.get(name=_version_key(user_id))
+            version = int(stored) if stored is not None else 0
+        except RedisError as exc:
+            print("Principal store unavailable:", str(exc), flush=True)
+            metrics.incr('auth.principal.redis_error')
+            version = db.session.query(User.role_version).filter_by(user_id=int(user_id)).scalar()
+            version = REVOKED if version is None else version
+        _versions.set(user_id, version, current_app.config['PRINCIPAL_CACHE_TTL'])
+    else:
+        metrics.incr('auth.principal.cache_hit')
+    return version
+
+
+def publish_role_version(user_id, version):
+    """Revoke tokens of ``user_id`` older than ``version`` (role changed or
+    account deleted). Takes effect at once on this worker and within
+    PRINCIPAL_CACHE_TTL seconds on the others. Raises RoleChangeNotPublished
+    if Redis is unavailable."""
+    _versions.delete(str(user_id))
+    ttl = int(current_app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds())
+    try:
+        cache.r.set(name=_version_key(user_id), value=version, ex=ttl)
+    except RedisError as exc:
+        print("Could not publish role change for user", user_id, ":", str(exc), flush=True)
+        metrics.incr('auth.principal.redis_error')
+        raise RoleChangeNotPublished(str(exc)) from exc
+
+
+@contextmanager
+def revoking_tokens(user_id, version, committed_version):
+    """Publish ``version`` before the role change is committed in the block.
+
+    Redis answers for the other workers, so if it refuses the version the
+    change must not commit (RoleChangeNotPublished is raised before the
+    block runs). If the commit then fails, the still committed version is
+    published back so the user's new tokens are not revoked too.
+    """
+    publish_role_version(user_id, version)
+    try:
+        yield
+    except Exception:
+        try:
+            publish_role_version(user_id, committed_version)
+        except RoleChangeNotPublished:
+            pass
+        raise
+
+
+def _principal():
+    """``(user_id, role, version)`` of the verified token"""
+    claims = get_jwt()
+    user_id = get_jwt_identity()
+    if ROLE_CLAIM in claims:
+        return user_id, claims[ROLE_CLAIM], claims.get(VERSION_CLAIM, 0)
+    # Issued before role claims existed; these expire within a token lifetime
+    metrics.incr('auth.principal.legacy_token')
+    user = db.session.get(User, int(user_id))
+    if user is None:
+        return user_id, None, -1
+    return user_id, user.role or 'user', user.role_version or 0
+
+
+def require_role(*roles):
+    """Allow the route only for tokens whose role claim is in ``roles``.
+
+    Authorizes from the token alone, plus a cached role-version check so a
+    role change or deletion revokes older tokens. OPTIONS requests pass.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method == 'OPTIONS':
+                return f(*args, **kwargs)
+            try:
+                verify_jwt_in_request()
+                user_id, role, version = _principal()
+            except Exception as exc:
+                print(f"Role verification failed: {str(exc)}", flush=True)
+                return jsonify({'success': False, 'message': 'Cần đăng nhập với quyền admin'}), 401
+
+            if version < current_role_version(user_id):
+                metrics.incr('auth.principal.revoked')
+                return jsonify({'success': False, 'message': 'Phiên đăng nhập đã hết hiệu lực, vui lòng đăng nhập lại'}), 401
+            if role not in roles:
+                return jsonify({'success': False, 'message': 'Chỉ admin mới có quyền truy cập'}), 403
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -0,0 +1,70 @@
+# Per-process background task executor
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import current_app
+from app.extensions import db
+from app.utils import metrics
+
+
+class BackgroundExecutor:
+    """Runs tasks on a thread pool inside an application context.
+
+    The pool is created lazily in each process (after gunicorn forks) and
+    sized by the ``workers_setting`` config key. Tasks get their own
+    database session, which is removed when they finish. Failures are
+    logged and counted; callers that need the result can keep the Future.
+    """
+
+    def __init__(self, name, workers_setting):
+        self.name = name
+        self.workers_setting = workers_setting
+        self._executor = None
+        self._lock = threading.Lock()
+        self._futures = set()
+
+    def _get_executor(self, app):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=app.config.get(self.workers_setting, 2),
+                        thread_name_prefix=self.name,
+                    )
+        return self._executor
+
+    def submit(self, func, *args, **kwargs):
+        """Queue ``func(*args, **kwargs)``; must be called inside an app context"""
+        app = current_app._get_current_object()
+        future = self._get_executor(app).submit(self._run, app, func, args, kwargs)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+        metrics.incr(f"background.{self.name}.submitted")
+        return future
+
+    def _discard(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def _run(self, app, func, args, kwargs):
+        with app.app_context():
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+                metrics.incr(f"background.{self.name}.succeeded")
+                return result
+            except Exception as exc:
+                db.session.rollback()
+                metrics.incr(f"background.{self.name}.failed")
+                app.logger.exception("Background task %s failed: %s", self.name, exc)
+                raise
+            finally:
+                metrics.observe(f"background.{self.name}.seconds", time.perf_counter() - started)
+                db.session.remove()
+
+    def drain(self, timeout=None):
+        """Wait for every queued task to finish (tests and shutdown)"""
+        with self._lock:
+            pending = list(self._futures)
+        wait(pending, timeout=timeout)
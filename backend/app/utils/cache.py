@@ -1,7 +1,15 @@
-
+import hashlib
+import json
+import random
+import threading
+import time
 import redis
 import os
+from collections import OrderedDict
 from dotenv import load_dotenv
+from flask import current_app
+from redis.exceptions import RedisError
+from app.utils import metrics
 load_dotenv()
 
 r = redis.Redis(
@@ -23,3 +31,226 @@ def cache_get(key):
 
 def cache_delete(key):
     r.delete(key)
+
+
+class LocalLRUCache:
+    """Small thread-safe in-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TwoTierCache:
+    """Read-through cache: per-worker LRU in front of Redis in front of a loader.
+
+    Settings are read from the app config at call time using ``config_prefix``:
+    ``<prefix>_ENABLED``, ``<prefix>_LOCAL_TTL`` and ``<prefix>_REDIS_TTL``.
+    Values must be JSON-serializable. Redis errors degrade to the loader.
+    Invalidation clears Redis and this worker's LRU; other workers keep their
+    copy for at most ``<prefix>_LOCAL_TTL`` seconds, so keep it short.
+    """
+
+    def __init__(self, namespace, config_prefix, maxsize=1024):
+        self.namespace = namespace
+        self.config_prefix = config_prefix
+        self.local = LocalLRUCache(maxsize)
+        metrics.register_ratio(
+            f"cache.{namespace}",
+            hits=[f"cache.{namespace}.local_hit", f"cache.{namespace}.redis_hit"],
+            misses=[f"cache.{namespace}.miss"]
+        )
+
+    def _setting(self, name, default=None):
+        return current_app.config.get(f"{self.config_prefix}_{name}", default)
+
+    def _key(self, key):
+        return f"cache:{self.namespace}:{key}"
+
+    def peek(self, key):
+        """Return the cached value for ``key`` from either tier, or None"""
+        if not self._setting('ENABLED', False):
+            return None
+
+        redis_key = self._key(key)
+        value = self.local.get(redis_key)
+        if value is not None:
+            metrics.incr(f"cache.{self.namespace}.local_hit")
+            return value
+
+        try:
+            raw = r.get(name=redis_key)
+        except RedisError as exc:
+            print(f"Cache {self.namespace} unavailable:", str(exc), flush=True)
+            metrics.incr(f"cache.{self.namespace}.redis_error")
+            raw = None
+        if raw is not None:
+            metrics.incr(f"cache.{self.namespace}.redis_hit")
+            value = json.loads(raw)
+            self.local.set(redis_key, value, self._setting('LOCAL_TTL', 5))
+            return value
+        return None
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for ``key`` or call ``loader()`` and cache it.
+
+        A loader result of None is returned as-is and never cached.
+        """
+        if not self._setting('ENABLED', False):
+            return loader()
+
+        value = self.peek(key)
+        if value is not None:
+            return value
+
+        redis_key = self._key(key)
+        metrics.incr(f"cache.{self.namespace}.miss")
+        value = loader()
+        if value is None:
+            return None
+
+        self.local.set(redis_key, value, self._setting('LOCAL_TTL', 5))
+        try:
+            r.set(name=redis_key, value=current_app.json.dumps(value), ex=self._setting('REDIS_TTL', 60))
+        except RedisError as exc:
+            print(f"Cache {self.namespace} unavailable:", str(exc), flush=True)
+            metrics.incr(f"cache.{self.namespace}.redis_error")
+        return value
+
+    def invalidate(self, key):
+        """Drop ``key`` from both tiers"""
+        redis_key = self._key(key)
+        self.local.delete(redis_key)
+        metrics.incr(f"cache.{self.namespace}.invalidation")
+        if not self._setting('ENABLED', False):
+            return
+        try:
+            r.delete(redis_key)
+        except RedisError as exc:
+            print(f"Cache {self.namespace} unavailable:", str(exc), flush=True)
+            metrics.incr(f"cache.{self.namespace}.redis_error")
+
+
+class VersionedCache:
+    """Response cache keyed by normalized parameters plus a global version.
+
+    Every write that can change a cached response bumps the version with a
+    single INCR; older entries are never read again and simply expire, so
+    invalidation costs O(1) instead of scanning keys. Settings are read from
+    the app config using ``config_prefix``: ``<prefix>_ENABLED``,
+    ``<prefix>_TTL_MIN`` and ``<prefix>_TTL_MAX`` (entries get a random TTL
+    in that range so they do not all expire at once).
+    """
+
+    def __init__(self, namespace, config_prefix):
+        self.namespace = namespace
+        self.config_prefix = config_prefix
+        self.version_key = f"cache:{namespace}:version"
+        metrics.register_ratio(f"cache.{namespace}", hits=[f"cache.{namespace}.hit"],
+                               misses=[f"cache.{namespace}.miss"])
+
+    def _setting(self, name, default=None):
+        return current_app.config.get(f"{self.config_prefix}_{name}", default)
+
+    def _ttl(self):
+        low = max(1, int(self._setting('TTL_MIN', 30)))
+        high = max(low, int(self._setting('TTL_MAX', low)))
+        return random.randint(low, high)
+
+    def _version(self):
+        """Current version; seeded from the clock if the counter is missing so
+        an evicted counter never hands out a previously used version"""
+        version = r.get(name=self.version_key)
+        if version is None:
+            r.set(name=self.version_key, value=int(time.time() * 1000), nx=True)
+            version = r.get(name=self.version_key)
+        return version
+
+    @staticmethod
+    def _digest(params):
+        return hashlib.sha1(
+            json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+
+    def etag(self, params):
+        """Validator for ``params`` that changes with every version bump.
+
+        Returns None when the cache is disabled or Redis is unavailable.
+        """
+        if not self._setting('ENABLED', False):
+            return None
+        try:
+            version = self._version()
+        except RedisError as exc:
+            print(f"Cache {self.namespace} unavailable:", str(exc), flush=True)
+            metrics.incr(f"cache.{self.namespace}.redis_error")
+            return None
+        return f"{self.namespace}-{version}-{self._digest(params)}"
+
+    def get_or_load(self, params, loader):
+        """Return the cached response for ``params`` or call ``loader()`` and cache it"""
+        if not self._setting('ENABLED', False):
+            return loader()
+
+        digest = self._digest(params)
+        try:
+            version = self._version()
+            entry_key = f"cache:{self.namespace}:{version}:{digest}"
+            raw = r.get(name=entry_key)
+        except RedisError as exc:
+            print(f"Cache {self.namespace} unavailable:", str(exc), flush=True)
+            metrics.incr(f"cache.{self.namespace}.redis_error")
+            return loader()
+
+        if raw is not None:
+            metrics.incr(f"cache.{self.namespace}.hit")
+            return json.loads(raw)
+
+        metrics.incr(f"cache.{self.namespace}.miss")
+        value = loader()
+        try:
+            r.set(name=entry_key, value=current_app.json.dumps(value), ex=self._ttl())
+        except RedisError as exc:
+            print(f"Cache {self.namespace} unavailable:", str(exc), flush=True)
+            metrics.incr(f"cache.{self.namespace}.redis_error")
+        return value
+
+    def bump(self):
+        """Invalidate every cached entry by moving to a new version"""
+        metrics.incr(f"cache.{self.namespace}.invalidation")
+        if not self._setting('ENABLED', False):
+            return
+        try:
+            self._version()
+            r.incr(self.version_key)
+        except RedisError as exc:
+            print(f"Cache {self.namespace} unavailable:", str(exc), flush=True)
+            metrics.incr(f"cache.{self.namespace}.redis_error")
@@ -0,0 +1,45 @@
+# Retry transactions that lost a serialization or deadlock race
+import random
+import time
+from functools import wraps
+from sqlalchemy.exc import DBAPIError
+from app.extensions import db
+from app.utils import metrics
+
+# Postgres SQLSTATEs worth retrying: serialization_failure, deadlock_detected
+RETRYABLE_SQLSTATES = {'40001', '40P01'}
+
+
+def is_retryable(exc):
+    """Whether a database error is a transient serialization/deadlock conflict"""
+    orig = getattr(exc, 'orig', None)
+    code = getattr(orig, 'pgcode', None) or getattr(orig, 'sqlstate', None)
+    return code in RETRYABLE_SQLSTATES
+
+
+def retry_on_conflict(name, attempts=3, base_delay=0.05, max_delay=1.0):
+    """Re-run a whole transaction (the decorated function) when Postgres aborts
+    it with a serialization failure or deadlock.
+
+    The session is rolled back before each retry, with exponential backoff
+    plus jitter. Counts ``db.retry.<name>`` per retry and
+    ``db.retry_exhausted.<name>`` when giving up.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            for attempt in range(1, attempts + 1):
+                try:
+                    return f(*args, **kwargs)
+                except DBAPIError as exc:
+                    if not is_retryable(exc):
+                        raise
+                    db.session.rollback()
+                    if attempt == attempts:
+                        metrics.incr(f"db.retry_exhausted.{name}")
+                        raise
+                    metrics.incr(f"db.retry.{name}")
+                    delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+                    time.sleep(delay + random.uniform(0, delay))
+        return decorated_function
+    return decorator
@@ -0,0 +1,47 @@
+# Conditional GET helpers (ETag / Last-Modified / Cache-Control)
+import hashlib
+from datetime import timezone
+from flask import request, make_response
+
+
+def make_etag(*parts):
+    """Build a strong ETag value (unquoted) from the given validator parts"""
+    raw = '|'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _as_utc(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def is_not_modified(etag=None, last_modified=None):
+    """Whether the request's validators still match the current representation.
+
+    If-None-Match takes precedence over If-Modified-Since (RFC 9110).
+    """
+    if request.if_none_match:
+        return etag is not None and request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return _as_utc(last_modified) <= request.if_modified_since
+    return False
+
+
+def apply_cache_headers(response, etag=None, last_modified=None, cache_control=None):
+    """Attach validators and Cache-Control to a response"""
+    if etag is not None:
+        response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def not_modified_response(etag=None, last_modified=None, cache_control=None):
+    """Empty 304 response carrying the same validators as a full one"""
+    response = make_response('', 304)
+    return apply_cache_headers(response, etag, last_modified, cache_control)
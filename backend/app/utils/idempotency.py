@@ -0,0 +1,142 @@
+# Idempotency-Key support for non-idempotent endpoints
+import hashlib
+import json
+from functools import wraps
+from flask import current_app, request, jsonify, make_response
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from redis.exceptions import RedisError
+from app.utils import cache, metrics
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+# Response headers worth keeping for a replay
+_REPLAY_HEADERS = ('Content-Type', 'Location')
+
+# Client errors that say "not now" rather than "never": a retry with the same
+# key must run again (e.g. 409 PaymentInProgress, 401 expired token)
+RETRYABLE_CLIENT_ERRORS = frozenset({401, 408, 409, 425, 429})
+
+
+def _is_final(status_code):
+    """Whether a response may be replayed for the rest of IDEMPOTENCY_TTL"""
+    if 200 <= status_code < 300:
+        return True
+    return 400 <= status_code < 500 and status_code not in RETRYABLE_CLIENT_ERRORS
+
+
+def _fingerprint():
+    digest = hashlib.sha256()
+    digest.update(request.method.encode('utf-8'))
+    digest.update(request.path.encode('utf-8'))
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _principal():
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity() or 'anonymous'
+    except Exception:
+        return 'anonymous'
+
+
+def _replay(record):
+    response = make_response(record['body'], record['status'])
+    for name, value in record['headers'].items():
+        response.headers[name] = value
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(scope):
+    """Make a POST route safe to retry with an ``Idempotency-Key`` header.
+
+    The first request for a key runs and its response, if final (2xx, or a
+    4xx outside RETRYABLE_CLIENT_ERRORS), is stored for IDEMPOTENCY_TTL seconds; retries with the same key and body get the
+    stored response back without running the handler. A retry that arrives
+    while the first request is still running gets 409, and reusing a key
+    for a different body gets 422. Keys are scoped per route and per user.
+    Requests without the header, and any request while Redis is down, run
+    normally.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if request.method == 'OPTIONS' or not key:
+                return f(*args, **kwargs)
+            if len(key) > 255:
+                return jsonify({'success': False, 'message': 'Idempotency-Key is too long'}), 400
+
+            config = current_app.config
+            key_hash = hashlib.sha256(key.encode('utf-8')).hexdigest()
+            redis_key = f"idem:{scope}:{_principal()}:{key_hash}"
+            fingerprint = _fingerprint()
+
+            try:
+                acquired = cache.r.set(
+                    name=redis_key,
+                    value=json.dumps({'state': 'in_flight', 'fp': fingerprint}),
+                    ex=config['IDEMPOTENCY_LOCK_TTL'],
+                    nx=True
+                )
+                record = None if acquired else cache.r.get(name=redis_key)
+            except RedisError as exc:
+                print("Idempotency store unavailable:", str(exc), flush=True)
+                metrics.incr('idempotency.redis_error')
+                return f(*args, **kwargs)
+
+            if not acquired:
+                if record is None:
+                    # Expired between SET and GET; treat as in flight
+                    record = json.dumps({'state': 'in_flight', 'fp': fingerprint})
+                record = json.loads(record)
+                if record['fp'] != fingerprint:
+                    metrics.incr('idempotency.mismatch')
+                    return jsonify({
+                        'success': False,
+                        'message': 'Idempotency-Key was already used for a different request'
+                    }), 422
+                if record['state'] == 'in_flight':
+                    metrics.incr('idempotency.in_flight')
+                    response = jsonify({
+                        'success': False,
+                        'message': 'A request with this Idempotency-Key is still being processed'
+                    })
+                    response.status_code = 409
+                    response.headers['Retry-After'] = '1'
+                    return response
+                metrics.incr('idempotency.replayed')
+                return _replay(record)
+
+            try:
+                response = make_response(f(*args, **kwargs))
+            except Exception:
+                try:
+                    cache.r.delete(redis_key)
+                except RedisError:
+                    pass
+                raise
+
+            try:
+                if not _is_final(response.status_code):
+                    # Let the client retry server and transient errors for real
+                    cache.r.delete(redis_key)
+                else:
+                    cache.r.set(name=redis_key, value=json.dumps({
+                        'state': 'done',
+                        'fp': fingerprint,
+                        'status': response.status_code,
+                        'body': response.get_data(as_text=True),
+                        'headers': {
+                            name: response.headers[name] for name in _REPLAY_HEADERS if name in response.headers
+                        }
+                    }), ex=config['IDEMPOTENCY_TTL'])
+                    metrics.incr('idempotency.stored')
+            except RedisError as exc:
+                print("Idempotency store unavailable:", str(exc), flush=True)
+                metrics.incr('idempotency.redis_error')
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,64 @@
+# Responsive image variants (resized, recompressed copies of event images)
+import os
+from PIL import Image, ImageOps
+
+# Target widths in pixels; images are never upscaled
+VARIANT_WIDTHS = (320, 640, 1280)
+
+
+def variant_widths(source_width):
+    """The target widths below ``source_width``, plus the source's own width
+    in place of the targets it cannot fill"""
+    widths = [width for width in VARIANT_WIDTHS if width < source_width]
+    if len(widths) < len(VARIANT_WIDTHS):
+        widths.append(source_width)
+    return widths
+
+# Output format -> (Pillow format, content type, save options)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def render_variants(source_path, out_dir, basename):
+    """Write every width/format variant of ``source_path`` into ``out_dir``.
+
+    Returns a list of ``(width, fmt, path, content_type)`` tuples; ``width``
+    is the real pixel width of the variant (see variant_widths).
+    """
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode != 'RGB':
+            # Flatten transparency onto white; JPEG has no alpha channel
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            rgba = image.convert('RGBA')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            image = background
+
+        rendered = []
+        for width in variant_widths(image.width):
+            if width == image.width:
+                resized = image
+            else:
+                height = max(1, round(image.height * width / image.width))
+                resized = image.resize((width, height), Image.LANCZOS)
+            for fmt, (pil_format, content_type, options) in VARIANT_FORMATS.items():
+                path = os.path.join(out_dir, f"{basename}_{width}.{fmt}")
+                resized.save(path, pil_format, **options)
+                rendered.append((width, fmt, path, content_type))
+        return rendered
+
+
+def srcset(urls):
+    """``{width: url}`` -> an HTML srcset string"""
+    return ', '.join(f"{url} {width}w" for width, url in sorted(urls.items()))
+
+
+def pick_width(widths, preferred):
+    """Smallest available width that is at least ``preferred`` (else the largest)"""
+    widths = sorted(widths)
+    for width in widths:
+        if width >= preferred:
+            return width
+    return widths[-1]
@@ -0,0 +1,161 @@
+# Atomic per-ticket inventory counters for flash sales
+import threading
+from flask import current_app
+from app.utils import cache
+
+# KEYS: counter keys, ARGV: quantities (same order).
+# Returns 1 when every counter covered its quantity and all were decremented,
+# 0 (plus the 1-based index of the short counter) when nothing was changed,
+# and -1 (plus the index) when a counter is missing and must be rebuilt.
+RESERVE_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    local remaining = redis.call('GET', key)
+    if not remaining then
+        return {-1, i}
+    end
+    if tonumber(remaining) < tonumber(ARGV[i]) then
+        return {0, i}
+    end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('DECRBY', key, ARGV[i])
+end
+return {1, 0}
+"""
+
+# Gives quantities back; missing counters are left missing so a release never
+# resurrects a counter with a partial value
+RELEASE_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('INCRBY', key, ARGV[i])
+    end
+end
+return 1
+"""
+
+
+class CountersMissing(Exception):
+    """A ticket's counter is not loaded; rebuild it from the database"""
+
+    def __init__(self, ticket_id):
+        super().__init__(f"Inventory counter for ticket {ticket_id} is not loaded")
+        self.ticket_id = ticket_id
+
+
+def _ordered(quantities):
+    return sorted(quantities.items())
+
+
+class RedisInventoryGate:
+    """Remaining ticket counts in Redis, reserved with one Lua script call"""
+
+    def __init__(self, client, prefix="inventory:ticket"):
+        self.client = client
+        self.prefix = prefix
+        self._reserve = client.register_script(RESERVE_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+
+    def key(self, ticket_id):
+        return f"{self.prefix}:{ticket_id}"
+
+    def reserve(self, quantities):
+        """Atomically take ``quantities`` ({ticket_id: qty}), all or nothing.
+
+        Returns None on success, else the ticket id that was short. Raises
+        CountersMissing when a counter has to be rebuilt first.
+        """
+        items = _ordered(quantities)
+        status, index = self._reserve(
+            keys=[self.key(ticket_id) for ticket_id, _ in items],
+            args=[quantity for _, quantity in items],
+        )
+        if status == 1:
+            return None
+        ticket_id = items[int(index) - 1][0]
+        if status == -1:
+            raise CountersMissing(ticket_id)
+        return ticket_id
+
+    def release(self, quantities):
+        """Give previously reserved quantities back"""
+        items = _ordered(quantities)
+        if items:
+            self._release(
+                keys=[self.key(ticket_id) for ticket_id, _ in items],
+                args=[quantity for _, quantity in items],
+            )
+
+    def load(self, counts, overwrite=True):
+        """Set counters from ``counts``; with ``overwrite=False`` only missing
+        counters are set, so live ones are never clobbered"""
+        pipe = self.client.pipeline()
+        for ticket_id, remaining in counts.items():
+            pipe.set(self.key(ticket_id), max(0, int(remaining)), nx=not overwrite)
+        pipe.execute()
+
+    def get(self, ticket_id):
+        value = self.client.get(self.key(ticket_id))
+        return None if value is None else int(value)
+
+    def clear(self, ticket_ids):
+        if ticket_ids:
+            self.client.delete(*[self.key(ticket_id) for ticket_id in ticket_ids])
+
+
+class LocalInventoryGate:
+    """In-process stand-in with the same semantics (tests and development)"""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, quantities):
+        items = _ordered(quantities)
+        with self._lock:
+            for ticket_id, quantity in items:
+                remaining = self._counts.get(ticket_id)
+                if remaining is None:
+                    raise CountersMissing(ticket_id)
+                if remaining < quantity:
+                    return ticket_id
+            for ticket_id, quantity in items:
+                self._counts[ticket_id] -= quantity
+        return None
+
+    def release(self, quantities):
+        with self._lock:
+            for ticket_id, quantity in quantities.items():
+                if ticket_id in self._counts:
+                    self._counts[ticket_id] += quantity
+
+    def load(self, counts, overwrite=True):
+        with self._lock:
+            for ticket_id, remaining in counts.items():
+                if overwrite or ticket_id not in self._counts:
+                    self._counts[ticket_id] = max(0, int(remaining))
+
+    def get(self, ticket_id):
+        return self._counts.get(ticket_id)
+
+    def clear(self, ticket_ids):
+        with self._lock:
+            for ticket_id in ticket_ids:
+                self._counts.pop(ticket_id, None)
+
+
+_lock = threading.Lock()
+_gates = {}
+
+
+def get_inventory_gate():
+    """Gate selected by FLASH_SALE_BACKEND ('redis' or 'local'), one per process"""
+    backend = current_app.config.get("FLASH_SALE_BACKEND", "redis")
+    gate = _gates.get(backend)
+    if gate is None:
+        with _lock:
+            gate = _gates.get(backend)
+            if gate is None:
+                gate = LocalInventoryGate() if backend == "local" else RedisInventoryGate(cache.r)
+                _gates[backend] = gate
+    return gate
@@ -0,0 +1,40 @@
+# app/utils/mail/campaign_templates.py
+
+# Subject and plain-text body per campaign kind. Values: user_name,
+# booking_id, event_name, start_time, venue_name, address, and the
+# campaign context (``changes`` for change announcements).
+CAMPAIGN_TEMPLATES = {
+    "reminder": (
+        "Reminder: {{ event_name }} starts at {{ start_time }}",
+        """
+    Hello {{ user_name }},
+
+    This is a reminder that '{{ event_name }}' starts at {{ start_time }}.
+
+    Venue: {{ venue_name }}{% if address %}, {{ address }}{% endif %}
+    Booking ID: {{ booking_id }}
+
+    Please bring your booking ID to the entrance.
+
+    Best regards,
+    YourApp Team
+    """,
+    ),
+    "change": (
+        "Update to {{ event_name }}",
+        """
+    Hello {{ user_name }},
+
+    The organizer has changed '{{ event_name }}', which you booked (booking ID {{ booking_id }}):
+    {% for change in changes %}
+    - {{ change.field }}: {{ change.old }} -> {{ change.new }}
+    {%- endfor %}
+
+    Start time: {{ start_time }}
+    Venue: {{ venue_name }}{% if address %}, {{ address }}{% endif %}
+
+    Best regards,
+    YourApp Team
+    """,
+    ),
+}
@@ -0,0 +1,183 @@
+# Mail outbox (a table drained by 'flask send-mail') and persistent SMTP sessions
+import os
+import queue
+import smtplib
+import ssl
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from sqlalchemy import func
+from app.extensions import db
+from app.models.notification import OutboundEmail
+from app.utils import metrics
+
+load_dotenv()
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASS = os.getenv("SMTP_PASS")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+# Parallel SMTP sessions per sender process, and unsent messages the outbox
+# may hold before new ones are refused
+MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", "2"))
+MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", "1000"))
+# Tries per message; the wait between tries doubles from MAIL_RETRY_DELAY
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "4"))
+MAIL_RETRY_DELAY = float(os.getenv("MAIL_RETRY_DELAY", "1"))
+# Outbox rows claimed per batch, and seconds before a row claimed by a
+# sender that died is claimed again
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", "50"))
+MAIL_LEASE_SECONDS = int(os.getenv("MAIL_LEASE_SECONDS", "120"))
+# An outbox message that failed waits this long (doubled per attempt)
+# before it is claimed again, so a short SMTP outage does not use up its
+# MAIL_MAX_ATTEMPTS
+MAIL_OUTBOX_RETRY_DELAY = float(os.getenv("MAIL_OUTBOX_RETRY_DELAY", "30"))
+# Seconds a session may sit unused before it is closed (servers drop idle
+# sessions anyway; Gmail after a few minutes)
+MAIL_IDLE_TIMEOUT = float(os.getenv("MAIL_IDLE_TIMEOUT", "60"))
+
+
+class MailQueueFull(Exception):
+    """The outbox already holds MAIL_QUEUE_SIZE unsent messages"""
+
+
+class SMTPSession:
+    """One SMTP connection, opened (STARTTLS, LOGIN) on first use and kept
+    for the following messages"""
+
+    def __init__(self, host=None, port=None, user=None, password=None, starttls=None, timeout=None):
+        self.host = host or SMTP_HOST
+        self.port = port or SMTP_PORT
+        self.user = user if user is not None else SMTP_USER
+        self.password = password if password is not None else SMTP_PASS
+        self.starttls = SMTP_STARTTLS if starttls is None else starttls
+        self.timeout = timeout or SMTP_TIMEOUT
+        self._server = None
+
+    @property
+    def is_open(self):
+        return self._server is not None
+
+    def _open(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls(context=ssl.create_default_context())
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        metrics.incr('mail.connect')
+        self._server = server
+
+    def send(self, msg):
+        if self._server is None:
+            self._open()
+        self._server.send_message(msg)
+
+    def close(self):
+        """Say QUIT if the server is still listening, then drop the socket"""
+        server, self._server = self._server, None
+        if server is not None:
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                server.close()
+
+
+def is_permanent(exc):
+    """Errors a retry cannot fix: 5xx replies and refused recipients"""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code >= 500
+
+
+def deliver(session, msg, max_attempts=MAIL_MAX_ATTEMPTS, retry_delay=MAIL_RETRY_DELAY):
+    """Send ``msg`` over ``session``, reopening it and retrying with
+    exponential backoff after errors. Returns None once sent, else the last
+    error (5xx replies are not retried)."""
+    for attempt in range(1, max_attempts + 1):
+        started = time.perf_counter()
+        try:
+            session.send(msg)
+        except (smtplib.SMTPException, OSError) as exc:
+            # The session state is unknown after an error: start over
+            session.close()
+            if is_permanent(exc) or attempt == max_attempts:
+                return exc
+            metrics.incr('mail.retry')
+            time.sleep(retry_delay * 2 ** (attempt - 1))
+        else:
+            metrics.observe('mail.send', time.perf_counter() - started)
+            metrics.incr('mail.sent')
+            return None
+
+
+class SMTPPool:
+    """``size`` persistent SMTP sessions for sending a batch in parallel and
+    getting each message's outcome back (bulk campaigns); use as a context
+    manager or call close()"""
+
+    def __init__(self, size=None, max_attempts=None, retry_delay=None, **session_options):
+        self.size = size or MAIL_WORKERS
+        self.max_attempts = max_attempts or MAIL_MAX_ATTEMPTS
+        self.retry_delay = MAIL_RETRY_DELAY if retry_delay is None else retry_delay
+        self._sessions = queue.LifoQueue()
+        for _ in range(self.size):
+            self._sessions.put(SMTPSession(**session_options))
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='smtp-pool')
+
+    def _send(self, msg):
+        session = self._sessions.get()
+        try:
+            return deliver(session, msg, self.max_attempts, self.retry_delay)
+        finally:
+            self._sessions.put(session)
+
+    def send_all(self, messages):
+        """Deliver ``messages``; returns one entry per message, None when it
+        was sent or the error that made it fail"""
+        return list(self._executor.map(self._send, messages))
+
+    def disconnect(self):
+        """Close every session while the pool is idle; they reopen on the
+        next send"""
+        sessions = [self._sessions.get() for _ in range(self.size)]
+        for session in sessions:
+            session.close()
+            self._sessions.put(session)
+
+    def close(self):
+        self._executor.shutdown()
+        while not self._sessions.empty():
+            self._sessions.get_nowait().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+
+UNSENT = ('pending', 'sending')
+
+
+def enqueue(msg):
+    """Store an EmailMessage in the outbox and commit the session; the
+    'flask send-mail' workers deliver it. Raises MailQueueFull when
+    MAIL_QUEUE_SIZE messages are still unsent."""
+    unsent = db.session.query(func.count(OutboundEmail.mail_id)).filter(OutboundEmail.status.in_(UNSENT)).scalar()
+    if unsent >= MAIL_QUEUE_SIZE:
+        db.session.rollback()
+        metrics.incr('mail.rejected')
+        raise MailQueueFull('Outbound mail queue is full')
+    mail = OutboundEmail(recipient=msg['To'], subject=msg['Subject'], message=msg.as_string())
+    db.session.add(mail)
+    db.session.commit()
+    metrics.incr('mail.enqueued')
+    return mail.mail_id
+
@@ -1,32 +1,28 @@
 # app/utils/mail/sender.py
 
-import os
-import ssl
-import smtplib
 import datetime
 from email.message import EmailMessage
 from jinja2 import Template
 
+from .campaign_templates import CAMPAIGN_TEMPLATES
 from .otp_mail_template import OTP_EMAIL_TEMPLATE
-from dotenv import load_dotenv
-load_dotenv()
+from .outbox import SMTP_USER, enqueue
 
-SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
-SMTP_USER = os.getenv("SMTP_USER")
-SMTP_PASS = os.getenv("SMTP_PASS")
+# Compiled once; rendering is all that happens per message
+_otp_template = Template(OTP_EMAIL_TEMPLATE)
+_campaign_templates = {
+    kind: (Template(subject), Template(body))
+    for kind, (subject, body) in CAMPAIGN_TEMPLATES.items()
+}
 
 
-def send_otp_email(
+def build_otp_email(
     to_email: str,
     otp_code: str,
     user_name: str = "User",
     expiry_minutes: int = 5,
-) -> None:
-    if not SMTP_USER or not SMTP_PASS:
-        raise RuntimeError("Missing SMTP credentials")
-
-    html_body = Template(OTP_EMAIL_TEMPLATE).render(
+) -> EmailMessage:
+    html_body = _otp_template.render(
         user_name=user_name,
         otp_code=otp_code,
         expiry_minutes=expiry_minutes,
@@ -44,23 +40,15 @@ def send_otp_email(
         f"Your OTP is {otp_code}. It expires in {expiry_minutes} minutes."
     )
     msg.add_alternative(html_body, subtype="html")
-
-    context = ssl.create_default_context()
-    with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-        server.starttls(context=context)
-        server.login(SMTP_USER, SMTP_PASS)
-        server.send_message(msg)
+    return msg
 
 
-def send_booking_confirmation_email(
+def build_booking_confirmation_email(
     to_email: str,
     event_name: str,
     booking_id: int,
     user_name: str = "User",
-) -> None:
-    if not SMTP_USER or not SMTP_PASS:
-        raise RuntimeError("Missing SMTP credentials")
-
+) -> EmailMessage:
     subject = f"Booking Confirmation for {event_name}"
     body = f"""
     Hello {user_name},
@@ -80,9 +68,36 @@ def send_booking_confirmation_email(
     msg["To"] = to_email
     msg["Subject"] = subject
     msg.set_content(body)
+    return msg
+
+
+def build_campaign_email(kind: str, to_email: str, **values) -> EmailMessage:
+    """Render a notification campaign message (see CAMPAIGN_TEMPLATES)"""
+    subject, body = _campaign_templates[kind]
+
+    msg = EmailMessage()
+    msg["From"] = SMTP_USER
+    msg["To"] = to_email
+    msg["Subject"] = subject.render(**values)
+    msg.set_content(body.render(**values))
+    return msg
+
 
-    context = ssl.create_default_context()
-    with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-        server.starttls(context=context)
-        server.login(SMTP_USER, SMTP_PASS)
-        server.send_message(msg)
+def send_otp_email(
+    to_email: str,
+    otp_code: str,
+    user_name: str = "User",
+    expiry_minutes: int = 5,
+) -> None:
+    """Store the OTP email in the outbox; 'flask send-mail' delivers it"""
+    enqueue(build_otp_email(to_email, otp_code, user_name, expiry_minutes))
+
+
+def send_booking_confirmation_email(
+    to_email: str,
+    event_name: str,
+    booking_id: int,
+    user_name: str = "User",
+) -> None:
+    """Store the booking confirmation in the outbox; 'flask send-mail' delivers it"""
+    enqueue(build_booking_confirmation_email(to_email, event_name, booking_id, user_name))
@@ -0,0 +1,122 @@
+# Local SMTP sink: accepts and keeps every message (tests, benchmarks, dev)
+import base64
+import email
+import socketserver
+import threading
+import time
+from email import policy
+
+
+class LocalSMTPSink:
+    """A threaded SMTP server on 127.0.0.1 that stores what it receives.
+
+    Speaks enough SMTP for smtplib: EHLO/HELO, AUTH PLAIN/LOGIN (any
+    credentials), MAIL, RCPT, DATA, RSET, NOOP and QUIT; no STARTTLS.
+    ``delay`` adds latency to every reply (a remote server's round trip),
+    ``drop_after`` closes each connection after that many messages, the way
+    providers recycle long-lived sessions, and addresses in ``rejected`` get
+    a permanent 550. With ``keep=False`` messages are only counted.
+    """
+
+    def __init__(self, delay=0, drop_after=None, rejected=(), keep=True):
+        self.delay = delay
+        self.drop_after = drop_after
+        self.rejected = set(rejected)
+        self.keep = keep
+        self.received = 0
+        self.messages = []
+        self.connections = 0
+        self.logins = 0
+        self._lock = threading.Lock()
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                if sink.delay:
+                    time.sleep(sink.delay)
+                self.wfile.write(line.encode('ascii') + b'\r\n')
+
+            def readline(self):
+                return self.rfile.readline().decode('utf-8', 'replace').rstrip('\r\n')
+
+            def handle(self):
+                with sink._lock:
+                    sink.connections += 1
+                delivered = 0
+                sender, recipients = None, []
+                self.reply('220 localhost sink ready')
+                while True:
+                    line = self.readline()
+                    if not line:
+                        return
+                    verb, _, arg = line.partition(' ')
+                    verb = verb.upper()
+                    if verb == 'EHLO':
+                        self.wfile.write(b'250-localhost\r\n250-AUTH PLAIN LOGIN\r\n')
+                        self.reply('250 8BITMIME')
+                    elif verb == 'HELO':
+                        self.reply('250 localhost')
+                    elif verb == 'AUTH':
+                        mechanism, _, initial = arg.partition(' ')
+                        if mechanism.upper() == 'LOGIN':
+                            self.reply('334 ' + base64.b64encode(b'Username:').decode())
+                            self.readline()
+                            self.reply('334 ' + base64.b64encode(b'Password:').decode())
+                            self.readline()
+                        elif not initial:
+                            self.reply('334 ')
+                            self.readline()
+                        with sink._lock:
+                            sink.logins += 1
+                        self.reply('235 Authentication successful')
+                    elif verb == 'MAIL':
+                        sender, recipients = arg.split(':', 1)[1].strip().split(' ')[0].strip('<>'), []
+                        self.reply('250 OK')
+                    elif verb == 'RCPT':
+                        recipient = arg.split(':', 1)[1].strip().strip('<>')
+                        if recipient in sink.rejected:
+                            self.reply('550 No such user')
+                        else:
+                            recipients.append(recipient)
+                            self.reply('250 OK')
+                    elif verb == 'DATA':
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        lines = []
+                        while True:
+                            data = self.rfile.readline()
+                            if data in (b'.\r\n', b'.\n', b''):
+                                break
+                            lines.append(data[1:] if data.startswith(b'..') else data)
+                        with sink._lock:
+                            sink.received += 1
+                            if sink.keep:
+                                message = email.message_from_bytes(b''.join(lines), policy=policy.default)
+                                sink.messages.append((sender, recipients, message))
+                        delivered += 1
+                        self.reply('250 OK queued')
+                        if sink.drop_after and delivered >= sink.drop_after:
+                            return
+                    elif verb == 'RSET':
+                        sender, recipients = None, []
+                        self.reply('250 OK')
+                    elif verb == 'NOOP':
+                        self.reply('250 OK')
+                    elif verb == 'QUIT':
+                        self.reply('221 Bye')
+                        return
+                    else:
+                        self.reply('502 Command not implemented')
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.host, self.port = self.server.server_address
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def recipients(self):
+        """Every recipient address received so far, in delivery order"""
+        with self._lock:
+            return [rcpt for _, rcpts, _ in self.messages for rcpt in rcpts]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,82 @@
+# In-process metrics (per gunicorn worker)
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_ratios = {}
+_histograms = {}
+_gauges = {}
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+
+def incr(name, amount=1):
+    """Increment a named counter"""
+    with _lock:
+        _counters[name] += amount
+
+
+def get_counter(name):
+    """Return the current value of a counter"""
+    return _counters.get(name, 0)
+
+
+def observe(name, value):
+    """Record a value (usually seconds) in a named histogram"""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = {
+                'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': [0] * len(BUCKETS)
+            }
+        histogram['count'] += 1
+        histogram['sum'] += value
+        histogram['max'] = max(histogram['max'], value)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                histogram['buckets'][i] += 1
+                break
+
+
+def register_ratio(name, hits, misses):
+    """Report ``name`` as sum(hits) / (sum(hits) + sum(misses)) in snapshots"""
+    _ratios[name] = (tuple(hits), tuple(misses))
+
+
+def register_gauge(name, func):
+    """Report ``func()`` (e.g. a queue depth) as ``name`` in snapshots"""
+    _gauges[name] = func
+
+
+def snapshot():
+    """Return a copy of all metrics for this worker"""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {
+            name: {
+                'count': h['count'],
+                'sum': round(h['sum'], 6),
+                'max': round(h['max'], 6),
+                'buckets': {
+                    ('+Inf' if bound == float('inf') else str(bound)): count
+                    for bound, count in zip(BUCKETS, h['buckets'])
+                }
+            }
+            for name, h in _histograms.items()
+        }
+    ratios = {}
+    for name, (hits, misses) in _ratios.items():
+        hit_count = sum(counters.get(counter, 0) for counter in hits)
+        total = hit_count + sum(counters.get(counter, 0) for counter in misses)
+        ratios[name] = round(hit_count / total, 4) if total else None
+    gauges = {name: func() for name, func in list(_gauges.items())}
+    return {'counters': counters, 'ratios': ratios, 'histograms': histograms, 'gauges': gauges}
+
+
+def reset():
+    """Clear all metrics (used by tests)"""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
@@ -0,0 +1,40 @@
+# Keyset (cursor) pagination helpers
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(sort, sort_value, row_id):
+    """Encode the last seen (sort value, id) pair into an opaque cursor token"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    else:
+        sort_value = float(sort_value)
+    payload = json.dumps({"s": sort, "v": sort_value, "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, sort):
+    """Decode a cursor token into (sort value, id).
+
+    Timestamps come back as datetimes and scores (e.g. search relevance) as floats.
+    Raises ValueError if the token is malformed or was issued for another sort order.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        sort_value = payload["v"]
+        if isinstance(sort_value, str):
+            sort_value = datetime.fromisoformat(sort_value)
+        elif isinstance(sort_value, (int, float)) and not isinstance(sort_value, bool):
+            sort_value = float(sort_value)
+        else:
+            raise ValueError("Invalid cursor value")
+        row_id = int(payload["id"])
+    except (ValueError, TypeError, KeyError, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+    if payload.get("s") != sort:
+        raise ValueError("Cursor does not match sort order")
+
+    return sort_value, row_id
@@ -0,0 +1,104 @@
+# Password hashing on a dedicated process pool, bounded per web worker
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+from app.utils import metrics
+
+# Parameters werkzeug fills in for the short method names
+_DEFAULT_PARAMS = {
+    'scrypt': 'scrypt:32768:8:1',
+    'pbkdf2': f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}',
+    'pbkdf2:sha256': f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}',
+}
+
+
+class PasswordHasherBusy(Exception):
+    """Every hashing slot stayed taken for PASSWORD_HASH_WAIT seconds"""
+
+
+def normalize_method(method):
+    """Full werkzeug method string, e.g. 'scrypt' -> 'scrypt:32768:8:1'"""
+    return _DEFAULT_PARAMS.get(method, method)
+
+
+def needs_rehash(password_hash, method):
+    """Whether a stored hash was made with other parameters than ``method``"""
+    return password_hash.split('$', 1)[0] != normalize_method(method)
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(password_hash, password, method):
+    """Check a password and, when it matches an outdated hash, return the
+    upgraded hash too (one trip to the pool)"""
+    if not check_password_hash(password_hash, password):
+        return False, None
+    if needs_rehash(password_hash, method):
+        return True, generate_password_hash(password, method=method)
+    return True, None
+
+
+class PasswordHasher:
+    """Runs hashing on a process pool sized by PASSWORD_HASH_WORKERS (0 runs
+    inline). At most PASSWORD_HASH_MAX_PENDING calls per web worker may be
+    queued or running; a caller that cannot get a slot within
+    PASSWORD_HASH_WAIT seconds gets PasswordHasherBusy instead of waiting
+    behind a login burst."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._pool = None
+        self._slots = None
+
+    def _setup(self, config):
+        # Pools do not survive a fork: build one per process
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    workers = config['PASSWORD_HASH_WORKERS']
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    ) if workers > 0 else None
+                    self._slots = threading.BoundedSemaphore(config['PASSWORD_HASH_MAX_PENDING'])
+                    self._pid = os.getpid()
+
+    def _run(self, name, func, *args):
+        config = current_app.config
+        self._setup(config)
+        if not self._slots.acquire(timeout=config['PASSWORD_HASH_WAIT']):
+            metrics.incr('passwords.busy')
+            raise PasswordHasherBusy('Password hashing is overloaded')
+        started = time.perf_counter()
+        try:
+            if self._pool is None:
+                return func(*args)
+            return self._pool.submit(func, *args).result()
+        finally:
+            self._slots.release()
+            metrics.observe(f'passwords.{name}', time.perf_counter() - started)
+
+    def hash(self, password):
+        """Hash with the configured PASSWORD_HASH_METHOD"""
+        return self._run('hash', _hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+    def verify(self, password_hash, password):
+        """Returns ``(matches, new_hash)``; ``new_hash`` is set when the stored
+        hash should be replaced because PASSWORD_HASH_METHOD changed"""
+        return self._run('verify', _verify, password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown()
+            self._pid = self._pool = self._slots = None
+
+
+hasher = PasswordHasher()
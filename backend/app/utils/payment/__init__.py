@@ -1,2 +1,2 @@
 # Payment utilities
-__all__ = ['payos_setup', 'momo_setup', 'client']
+__all__ = ['payos_setup', 'momo_setup', 'momo_create_payment', 'get_client']
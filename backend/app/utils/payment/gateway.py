@@ -0,0 +1,160 @@
+# Shared HTTP transport for payment gateways: pooled keep-alive connections,
+# strict timeouts, a circuit breaker and latency histograms per gateway
+import os
+import threading
+import time
+import httpx
+from app.utils import metrics
+
+# Seconds to establish a connection; a gateway that cannot accept a TCP
+# connection quickly is down, however long its reads are allowed to take
+CONNECT_TIMEOUT = float(os.getenv("PAYMENT_CONNECT_TIMEOUT", "3"))
+# Keep-alive connections per gateway and worker process
+POOL_SIZE = int(os.getenv("PAYMENT_POOL_SIZE", "10"))
+# Consecutive failures that open the circuit, and seconds it stays open
+BREAKER_FAILURES = int(os.getenv("PAYMENT_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("PAYMENT_BREAKER_RESET", "30"))
+
+
+class GatewayError(Exception):
+    """A payment gateway call failed, timed out or returned a server error"""
+
+
+class CircuitOpen(GatewayError):
+    """The gateway is failing; calls are rejected without touching the network"""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} gateway is unavailable, retry in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Opens after ``failures`` consecutive failures and rejects calls for
+    ``reset_timeout`` seconds; then one trial call decides whether it closes
+    again (half-open)"""
+
+    def __init__(self, name, failures=BREAKER_FAILURES, reset_timeout=BREAKER_RESET):
+        self.name = name
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return 'open'
+            return 'half_open'
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go through now"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited >= self.reset_timeout and not self._trial:
+                # Half-open: let exactly one call probe the gateway
+                self._trial = True
+                return
+        metrics.incr(f'gateway.{self.name}.rejected')
+        raise CircuitOpen(self.name, max(0.0, self.reset_timeout - waited))
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                metrics.incr(f'gateway.{self.name}.circuit_closed')
+            self._consecutive = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            # A failed trial re-opens at once; otherwise wait for the threshold
+            if self._trial or (self._opened_at is None and self._consecutive >= self.failures):
+                metrics.incr(f'gateway.{self.name}.circuit_opened')
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+class GatewayClient:
+    """One gateway's connection pool (an httpx.Client) and circuit breaker"""
+
+    def __init__(self, name, base_url, read_timeout, connect_timeout=CONNECT_TIMEOUT,
+                 pool_size=POOL_SIZE, breaker=None):
+        self.name = name
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.http = httpx.Client(
+            base_url=base_url,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self.breaker = breaker or CircuitBreaker(name)
+
+    def call(self, operation, func, is_failure=None):
+        """Run ``func()`` (which talks to the gateway) through the breaker,
+        recording its latency as ``gateway.<name>.<operation>``.
+
+        Exceptions for which ``is_failure(exc)`` is false (e.g. a rejected
+        request) are re-raised without counting against the gateway.
+        """
+        self.breaker.before_call()
+        started = time.perf_counter()
+        try:
+            result = func()
+        except Exception as exc:
+            if is_failure is None or is_failure(exc):
+                self.breaker.record_failure()
+                metrics.incr(f'gateway.{self.name}.error')
+            else:
+                self.breaker.record_success()
+            raise
+        finally:
+            metrics.observe(f'gateway.{self.name}.{operation}', time.perf_counter() - started)
+        self.breaker.record_success()
+        return result
+
+    def post_json(self, path, payload, operation='post'):
+        """POST ``payload`` and return the decoded JSON body.
+
+        Timeouts, connection errors and 5xx responses raise GatewayError and
+        count as gateway failures; 4xx bodies are returned to the caller.
+        """
+        def send():
+            try:
+                response = self.http.post(path, json=payload)
+            except httpx.HTTPError as exc:
+                raise GatewayError(f"{self.name} request failed: {exc!r}") from exc
+            if response.status_code >= 500:
+                raise GatewayError(f"{self.name} returned HTTP {response.status_code}")
+            return response.json()
+        return self.call(operation, send)
+
+    def close(self):
+        self.http.close()
+
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def get_gateway(name, factory):
+    """This process's client for ``name``, built by ``factory()`` on first use.
+
+    Clients are keyed by pid so gunicorn workers forked after import each get
+    their own pool instead of sharing sockets with the parent.
+    """
+    key = (name, os.getpid())
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
@@ -1,8 +1,14 @@
 
 import hmac
 import hashlib
+import os
 import uuid
 from decimal import Decimal, ROUND_DOWN
+from app.utils.payment.gateway import GatewayClient, get_gateway
+
+MOMO_BASE_URL = os.getenv("MOMO_BASE_URL", "https://test-payment.momo.vn")
+# MoMo may take up to 30 seconds to answer a create request
+MOMO_TIMEOUT = float(os.getenv("MOMO_TIMEOUT", "30"))
 
 
 def momo_setup(amount):
@@ -46,3 +52,17 @@ def momo_setup(amount):
     }
     
     return payment_request
+
+
+def get_gateway_client():
+    """This worker's pooled, circuit-broken MoMo client"""
+    return get_gateway("momo", lambda: GatewayClient("momo", MOMO_BASE_URL, read_timeout=MOMO_TIMEOUT))
+
+
+def momo_create_payment(amount):
+    """Create a MoMo payment; returns MoMo's response (``payUrl`` on success)
+    or None for an invalid amount. Raises GatewayError when MoMo is down."""
+    payment_request = momo_setup(amount)
+    if payment_request is None:
+        return None
+    return get_gateway_client().post_json("/v2/gateway/api/create", payment_request, operation="create_payment")
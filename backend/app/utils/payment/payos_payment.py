@@ -3,18 +3,50 @@ from decimal import Decimal, ROUND_DOWN
 from dotenv import load_dotenv
 import os
 from payos import PayOS
+from app.utils.payment.gateway import GatewayClient, get_gateway
 import time
 
 load_dotenv()
 
-client = PayOS(
-    client_id=os.getenv("PAYOS_CLIENT_ID"),
-    api_key=os.getenv("PAYOS_API_KEY"),
-    checksum_key=os.getenv("PAYOS_CHECKSUM_KEY"),
-)
+# Seconds a gateway call may take before it is abandoned. Creating a link is
+# not idempotent, so the SDK does not retry it on its own.
+PAYOS_TIMEOUT = float(os.getenv("PAYOS_TIMEOUT", "10"))
+PAYOS_BASE_URL = os.getenv("PAYOS_BASE_URL") or "https://api-merchant.payos.vn"
+# Hosted checkout page; a link's URL is this plus its paymentLinkId
+PAYOS_CHECKOUT_URL = os.getenv("PAYOS_CHECKOUT_URL") or "https://pay.payos.vn/web"
 
 
-def payos_setup(order_code, amount):
+def _build_client():
+    gateway = GatewayClient("payos", PAYOS_BASE_URL, read_timeout=PAYOS_TIMEOUT)
+    gateway.payos = PayOS(
+        client_id=os.getenv("PAYOS_CLIENT_ID"),
+        api_key=os.getenv("PAYOS_API_KEY"),
+        checksum_key=os.getenv("PAYOS_CHECKSUM_KEY"),
+        base_url=PAYOS_BASE_URL,
+        timeout=PAYOS_TIMEOUT,
+        max_retries=0,
+        http_client=gateway.http,
+    )
+    return gateway
+
+
+def get_gateway_client():
+    """This worker's PayOS gateway (pool, breaker); the SDK is ``.payos``"""
+    return get_gateway("payos", _build_client)
+
+
+def get_client():
+    """This worker's PayOS SDK client, sharing the gateway connection pool"""
+    return get_gateway_client().payos
+
+
+def is_gateway_failure(exc):
+    """PayOS rejecting a request (4xx) says nothing about its health"""
+    status_code = getattr(exc, "status_code", None)
+    return status_code is None or status_code >= 500
+
+
+def payos_setup(order_code, amount, expired_at=None):
     try:
         amount = int(
             Decimal(str(amount))
@@ -27,7 +59,8 @@ def payos_setup(order_code, amount):
         return None
     
     try:
-        expired_at = int(time.time()) + 10 * 60
+        if expired_at is None:
+            expired_at = int(time.time()) + 10 * 60
 
         payment_request = {
             "order_code": order_code,
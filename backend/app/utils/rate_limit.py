@@ -0,0 +1,182 @@
+# Sliding-window rate limits and load shedding for abuse-prone endpoints
+import hashlib
+import math
+import threading
+import time
+from functools import wraps
+from flask import current_app, request, jsonify
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from redis.exceptions import RedisError
+from app.utils import cache, metrics
+from app.utils.cache import LocalLRUCache
+
+# Header nginx stamps with the time it received the request ("t=<seconds>")
+REQUEST_START_HEADER = 'X-Request-Start'
+
+# Per-worker counters used while Redis is unreachable
+_local = LocalLRUCache(maxsize=10000)
+_local_lock = threading.Lock()
+
+
+def parse_limit(value):
+    """'10/60' -> (10, 60): at most 10 requests per 60 seconds"""
+    count, _, seconds = str(value).partition('/')
+    return int(count), int(seconds or 60)
+
+
+def client_ip():
+    """The client's address. The last RATE_LIMIT_TRUSTED_PROXIES entries of
+    X-Forwarded-For were appended by our own proxies; anything before them
+    is client-supplied and ignored."""
+    proxies = current_app.config['RATE_LIMIT_TRUSTED_PROXIES']
+    forwarded = request.headers.get('X-Forwarded-For')
+    if proxies > 0 and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        if hops:
+            return hops[-min(proxies, len(hops))]
+    return request.remote_addr or 'unknown'
+
+
+def _request_user():
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+def _request_email():
+    data = request.get_json(silent=True) if request.is_json else None
+    email = (data if isinstance(data, dict) else {}).get('email') or request.args.get('email')
+    if not isinstance(email, str) or not email.strip():
+        return None
+    # Keys must not spell out addresses
+    return hashlib.sha256(email.strip().lower().encode('utf-8')).hexdigest()[:32]
+
+
+# Dimensions a route can be limited by; None means "not applicable"
+IDENTIFIERS = {'ip': client_ip, 'user': _request_user, 'email': _request_email}
+
+
+def _count(checks):
+    """Count this request in every check's current window and read the
+    previous windows, in one Redis round trip (MULTI/EXEC). Returns
+    ``[(current, previous)]``. Falls back to per-worker counters if Redis
+    is down, which loosens each limit by the number of workers."""
+    try:
+        pipe = cache.r.pipeline(transaction=True)
+        for check in checks:
+            pipe.incr(check['key'])
+            pipe.expire(check['key'], 2 * check['window'])
+            pipe.get(check['previous_key'])
+        replies = pipe.execute()
+        return [(int(replies[i]), int(replies[i + 2] or 0)) for i in range(0, len(replies), 3)]
+    except RedisError as exc:
+        print("Rate limit store unavailable:", str(exc), flush=True)
+        metrics.incr('rate_limit.redis_error')
+    counts = []
+    with _local_lock:
+        for check in checks:
+            current = (_local.get(check['key']) or 0) + 1
+            _local.set(check['key'], current, 2 * check['window'])
+            counts.append((current, _local.get(check['previous_key']) or 0))
+    return counts
+
+
+def _retry_after(limit, window, elapsed, current, previous):
+    """Seconds until the sliding estimate drops back to ``limit``"""
+    if current < limit:
+        # Enough of the previous window has to slide out
+        wait = window * (1 - (limit - current) / previous) - elapsed
+    else:
+        # Only a new window helps, and then this one has to slide out
+        wait = (window - elapsed) + window * (1 - limit / current)
+    return max(1, math.ceil(wait))
+
+
+def rate_limit(scope, **limits):
+    """Limit a route per client dimension with sliding-window counters.
+
+    ``limits`` maps a dimension ('ip', 'user' or 'email') to the config key
+    holding its limit as 'count/seconds' (a count of 0 disables it). A
+    request is counted in a fixed window per dimension, and the previous
+    window is weighted by how much of it still overlaps the sliding one.
+    Rejected requests count too, so a client that keeps hammering stays
+    limited. Over any limit the route answers 429 with Retry-After.
+    Dimensions a request does not carry (no token, no email) are skipped.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            config = current_app.config
+            if request.method == 'OPTIONS' or not config['RATE_LIMIT_ENABLED']:
+                return f(*args, **kwargs)
+
+            started = time.perf_counter()
+            now = time.time()
+            checks = []
+            for dimension, setting in limits.items():
+                limit, window = parse_limit(config[setting])
+                if limit <= 0:
+                    continue
+                identifier = IDENTIFIERS[dimension]()
+                if identifier is None:
+                    continue
+                index, elapsed = divmod(now, window)
+                key = f"rl:{scope}:{dimension}:{identifier}"
+                checks.append({
+                    'limit': limit, 'window': window, 'elapsed': elapsed,
+                    'key': f"{key}:{int(index)}", 'previous_key': f"{key}:{int(index) - 1}",
+                })
+
+            retry_after = 0
+            if checks:
+                for check, (current, previous) in zip(checks, _count(checks)):
+                    weight = 1 - check['elapsed'] / check['window']
+                    if previous * weight + current > check['limit']:
+                        retry_after = max(retry_after, _retry_after(
+                            check['limit'], check['window'], check['elapsed'], current, previous
+                        ))
+            metrics.observe('rate_limit.check', time.perf_counter() - started)
+
+            if retry_after:
+                metrics.incr(f'rate_limit.{scope}.limited')
+                response = jsonify({
+                    'success': False,
+                    'message': 'Bạn đã thử quá nhiều lần, vui lòng thử lại sau',
+                    'retryAfter': retry_after
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+            metrics.incr(f'rate_limit.{scope}.allowed')
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def shed_load(scope):
+    """Answer 503 at once for requests that waited in the server's queue
+    longer than LOAD_SHED_MAX_WAIT seconds (per nginx's X-Request-Start):
+    during a backlog their clients have likely given up, and serving them
+    only delays everyone behind. 0 disables."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            max_wait = current_app.config['LOAD_SHED_MAX_WAIT']
+            stamp = request.headers.get(REQUEST_START_HEADER)
+            if request.method != 'OPTIONS' and max_wait > 0 and stamp:
+                try:
+                    waited = time.time() - float(stamp.removeprefix('t='))
+                except ValueError:
+                    waited = 0
+                metrics.observe('load_shed.queue_wait', max(waited, 0))
+                if waited > max_wait:
+                    metrics.incr(f'load_shed.{scope}')
+                    return jsonify({
+                        'success': False,
+                        'message': 'Hệ thống đang quá tải, vui lòng thử lại sau'
+                    }), 503, {'Retry-After': '1'}
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -0,0 +1,4 @@
+# Object storage utilities
+from app.utils.storage.backends import get_storage, get_s3_client, key_for_url, spool_upload
+
+__all__ = ['get_storage', 'get_s3_client', 'key_for_url', 'spool_upload']
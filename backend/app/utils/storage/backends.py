@@ -0,0 +1,158 @@
+# app/utils/storage/backends.py
+
+import mimetypes
+import os
+import shutil
+import threading
+import boto3
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import ClientError
+from flask import current_app
+
+_lock = threading.Lock()
+_s3_client = None
+
+
+def get_s3_client():
+    """Shared S3 client for this process.
+
+    boto3 clients are thread-safe; one client keeps a pool of keep-alive
+    connections instead of paying a new TLS handshake per upload.
+    """
+    global _s3_client
+    if _s3_client is None:
+        with _lock:
+            if _s3_client is None:
+                config = current_app.config
+                _s3_client = boto3.client(
+                    "s3",
+                    aws_access_key_id=config.get("AWS_ACCESS_KEY"),
+                    aws_secret_access_key=config.get("AWS_SECRET_KEY"),
+                    region_name=config.get("AWS_REGION"),
+                    config=BotoConfig(
+                        max_pool_connections=config.get("S3_MAX_POOL_CONNECTIONS", 10),
+                        connect_timeout=config.get("S3_CONNECT_TIMEOUT", 5),
+                        read_timeout=config.get("S3_READ_TIMEOUT", 60),
+                        retries={"max_attempts": 3, "mode": "standard"},
+                    ),
+                )
+    return _s3_client
+
+
+class S3Storage:
+    """Stores objects in the configured S3 bucket"""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def upload_file(self, path, key, content_type):
+        get_s3_client().upload_file(
+            path,
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": content_type},
+        )
+        return self.public_url(key)
+
+    def public_url(self, key):
+        return f"https://{self.bucket}.s3.amazonaws.com/{key}"
+
+    def download_file(self, key, path):
+        get_s3_client().download_file(self.bucket, key, path)
+
+    def presign_upload(self, key, content_type, max_bytes, expires_in):
+        """Presigned POST the browser uses to upload ``key`` directly.
+
+        S3 itself enforces the exact key, the content type and the size limit.
+        """
+        presigned = get_s3_client().generate_presigned_post(
+            Bucket=self.bucket,
+            Key=key,
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, max_bytes],
+            ],
+            ExpiresIn=expires_in,
+        )
+        return {"method": "POST", "url": presigned["url"], "fields": presigned["fields"]}
+
+    def head(self, key):
+        """Return ``{'size', 'content_type'}`` of a stored object, or None"""
+        try:
+            meta = get_s3_client().head_object(Bucket=self.bucket, Key=key)
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return {"size": meta["ContentLength"], "content_type": meta.get("ContentType")}
+
+    def delete(self, key):
+        get_s3_client().delete_object(Bucket=self.bucket, Key=key)
+
+
+class LocalStorage:
+    """Stores objects on the local filesystem (development and tests)"""
+
+    def __init__(self, root, base_url):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def path_for(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def upload_file(self, path, key, content_type):
+        target = self.path_for(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(path, target)
+        return self.public_url(key)
+
+    def public_url(self, key):
+        return f"{self.base_url}/{key}"
+
+    def download_file(self, key, path):
+        shutil.copyfile(self.path_for(key), path)
+
+    def presign_upload(self, key, content_type, max_bytes, expires_in):
+        """Local stand-in for a presigned upload: the client PUTs to the public URL"""
+        return {"method": "PUT", "url": self.public_url(key), "fields": {"Content-Type": content_type}}
+
+    def head(self, key):
+        path = self.path_for(key)
+        if not os.path.isfile(path):
+            return None
+        return {"size": os.path.getsize(path), "content_type": mimetypes.guess_type(path)[0]}
+
+    def delete(self, key):
+        path = self.path_for(key)
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+def key_for_url(storage, url):
+    """Object key behind one of ``storage``'s public URLs, or None"""
+    prefix = storage.public_url("")
+    if url and url.startswith(prefix):
+        return url[len(prefix):] or None
+    return None
+
+
+def get_storage():
+    """Storage backend selected by STORAGE_BACKEND ('s3' or 'local')"""
+    config = current_app.config
+    if config.get("STORAGE_BACKEND", "s3") == "local":
+        return LocalStorage(config["LOCAL_STORAGE_DIR"], config["LOCAL_STORAGE_URL"])
+    return S3Storage(config.get("AWS_BUCKET"))
+
+
+def spool_upload(file, name):
+    """Save an uploaded file to the local spool directory and return its path.
+
+    Spooled files are picked up by the background upload pipeline and
+    removed once stored.
+    """
+    spool_dir = current_app.config["IMAGE_SPOOL_DIR"]
+    os.makedirs(spool_dir, exist_ok=True)
+    path = os.path.join(spool_dir, name)
+    file.save(path)
+    return path
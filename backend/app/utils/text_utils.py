@@ -1,38 +1,93 @@
+import re
+from markupsafe import escape
+
+# Character mapping for Vietnamese tones
+_CHAR_MAP = {
+    'a': 'àáạảãâầấậẩẫăằắặẳẵ',
+    'e': 'èéẹẻẽêềếệểễ',
+    'i': 'ìíịỉĩ',
+    'o': 'òóọỏõôồốộổỗơờớợởỡ',
+    'u': 'ùúụủũưừứựửữ',
+    'y': 'ỳýỵỷỹ',
+    'd': 'đ',
+    'A': 'ÀÁẠẢÃÂẦẤẬẨẪĂẰẮẶẲẴ',
+    'E': 'ÈÉẸẺẼÊỀẾỆỂỄ',
+    'I': 'ÌÍỊỈĨ',
+    'O': 'ÒÓỌỎÕÔỒỐỘỔỖƠỜỚỢỞỠ',
+    'U': 'ÙÚỤỦŨƯỪỨỰỬỮ',
+    'Y': 'ỲÝỴỶỸ',
+    'D': 'Đ'
+}
+
+# Reverse mapping, built once per process
+_TONE_TABLE = str.maketrans({
+    variant: base
+    for base, variants in _CHAR_MAP.items()
+    for variant in variants
+})
+
+_WHITESPACE = re.compile(r'\s+')
+
 
 def remove_vietnamese_tones(text):
     if not text:
         return ""
-    
-    # Character mapping for Vietnamese tones
-    char_map = {
-        'a': 'àáạảãâầấậẩẫăằắặẳẵ',
-        'e': 'èéẹẻẽêềếệểễ',
-        'i': 'ìíịỉĩ',
-        'o': 'òóọỏõôồốộổỗơờớợởỡ',
-        'u': 'ùúụủũưừứựửữ',
-        'y': 'ỳýỵỷỹ',
-        'd': 'đ',
-        'A': 'ÀÁẠẢÃÂẦẤẬẨẪĂẰẮẶẲẴ',
-        'E': 'ÈÉẸẺẼÊỀẾỆỂỄ',
-        'I': 'ÌÍỊỈĨ',
-        'O': 'ÒÓỌỎÕÔỒỐỘỔỖƠỜỚỢỞỠ',
-        'U': 'ÙÚỤỦŨƯỪỨỰỬỮ',
-        'Y': 'ỲÝỴỶỸ',
-        'D': 'Đ'
-    }
-    
-    # Create reverse mapping
-    tone_map = {}
-    for base, variants in char_map.items():
-        for variant in variants:
-            tone_map[variant] = base
-    
-    # Replace each character
-    result = []
-    for char in text:
-        if char in tone_map:
-            result.append(tone_map[char])
-        else:
-            result.append(char)
-    
-    return ''.join(result)
+
+    # Replace each character (always one-for-one, so offsets are preserved)
+    return text.translate(_TONE_TABLE)
+
+
+def normalize_search_text(text):
+    """Lowercase, strip Vietnamese tones and collapse whitespace"""
+    return _WHITESPACE.sub(' ', remove_vietnamese_tones(text).lower()).strip()
+
+
+def build_search_document(*parts):
+    """Build the stored search document for an event from its text fields"""
+    return ' '.join(filter(None, (normalize_search_text(part) for part in parts)))
+
+
+def search_terms(query):
+    """Split a user query into normalized, de-duplicated search terms"""
+    terms = []
+    for term in normalize_search_text(query).split(' '):
+        if term and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def highlight_snippet(text, terms, width=160, tag='mark'):
+    """Return an HTML-escaped snippet of ``text`` with ``terms`` wrapped in ``tag``.
+
+    Matching is accent- and case-insensitive; the snippet is centred on the
+    first match. Returns None when nothing matches.
+    """
+    if not text or not terms:
+        return None
+
+    folded = remove_vietnamese_tones(text).lower()
+    if len(folded) != len(text):
+        # lower() changed the length (rare non-Vietnamese characters); offsets
+        # would no longer line up with the original text
+        return None
+
+    pattern = re.compile('|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)))
+    first = pattern.search(folded)
+    if not first:
+        return None
+
+    start = max(0, first.start() - width // 3)
+    end = min(len(text), start + width)
+    start = max(0, end - width)
+
+    pieces = ['…'] if start > 0 else []
+    cursor = start
+    for match in pattern.finditer(folded, start, end):
+        pieces.append(str(escape(text[cursor:match.start()])))
+        pieces.append(f'<{tag}>{escape(text[match.start():match.end()])}</{tag}>')
+        cursor = match.end()
+    pieces.append(str(escape(text[cursor:end])))
+    if end < len(text):
+        pieces.append('…')
+
+    return ''.join(pieces)
@@ -0,0 +1,199 @@
+# Virtual waiting room: per-event admission queue kept in Redis
+import math
+import time
+import uuid
+from functools import wraps
+from flask import current_app, request, jsonify
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from redis.exceptions import RedisError
+from app.utils import cache, metrics
+from app.utils.cache import LocalLRUCache
+
+# Header carrying the admission token on booking/payment calls
+ADMISSION_HEADER = 'X-Admission-Token'
+
+# Per-worker copy of each event's admission rate (0 = room closed)
+_rates = LocalLRUCache(maxsize=256)
+
+
+class InvalidQueueToken(Exception):
+    """The queue token is forged, expired or for another event"""
+
+
+def _key(event_id, name):
+    return f"waitroom:{event_id}:{name}"
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='waiting-room')
+
+
+def get_rate(event_id):
+    """Admitted sessions per second for the event, 0 when no room is open"""
+    rate = _rates.get(event_id)
+    if rate is None:
+        rate = int(cache.r.get(name=_key(event_id, 'rate')) or 0)
+        _rates.set(event_id, rate, current_app.config['WAITING_ROOM_RATE_CACHE_TTL'])
+    return rate
+
+
+def set_rate(event_id, rate):
+    """Open the room with ``rate`` admissions per second, or close it with 0.
+    Other workers pick up the change within WAITING_ROOM_RATE_CACHE_TTL."""
+    rate = max(0, int(rate))
+    if rate:
+        cache.r.set(name=_key(event_id, 'rate'), value=rate)
+        # Admissions are credited from the moment the room opens
+        cache.r.set(name=_key(event_id, 'tick'), value=int(time.time()), nx=True)
+    else:
+        cache.r.delete(*[_key(event_id, name) for name in ('rate', 'tick', 'frontier', 'seq', 'queue')])
+    _rates.delete(event_id)
+    return rate
+
+
+# KEYS: tick, frontier, seq; ARGV: now, rate, max catch-up seconds.
+# Credits ``rate`` per second elapsed since the last tick, but never moves the
+# frontier past the last sequence number handed out: seconds nobody was
+# waiting for are not banked for the next surge. INCRBY keeps the key's TTL.
+ADVANCE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local last = redis.call('GETSET', KEYS[1], now)
+local frontier = tonumber(redis.call('GET', KEYS[2]) or '0')
+if not last then
+    return frontier
+end
+local elapsed = math.min(now - tonumber(last), tonumber(ARGV[3]))
+if elapsed <= 0 then
+    return frontier
+end
+local seq = tonumber(redis.call('GET', KEYS[3]) or '0')
+local advanced = math.min(frontier + tonumber(ARGV[2]) * elapsed, seq)
+if advanced > frontier then
+    redis.call('INCRBY', KEYS[2], advanced - frontier)
+    return advanced
+end
+return frontier
+"""
+
+
+def _advance(event_id, rate):
+    """Move the admission frontier forward by ``rate`` per elapsed second,
+    capped at the queue's last sequence number.
+
+    The script's GETSET hands each elapsed second to exactly one caller
+    across all workers, so the frontier grows by ``rate`` per second no
+    matter how many clients poll. Returns the highest admitted sequence number.
+    """
+    return int(cache.r.eval(
+        ADVANCE_SCRIPT, 3,
+        _key(event_id, 'tick'), _key(event_id, 'frontier'), _key(event_id, 'seq'),
+        int(time.time()), rate, current_app.config['WAITING_ROOM_MAX_CATCHUP']
+    ))
+
+
+def _touch(event_id):
+    ttl = current_app.config['WAITING_ROOM_KEY_TTL']
+    for name in ('seq', 'queue', 'frontier', 'tick'):
+        cache.r.expire(_key(event_id, name), ttl)
+
+
+def join(event_id, user_id=None):
+    """Put a client in the event's queue; returns its signed queue token"""
+    seq = cache.r.incr(_key(event_id, 'seq'))
+    queue_id = uuid.uuid4().hex
+    cache.r.zadd(_key(event_id, 'queue'), {queue_id: seq})
+    _touch(event_id)
+    metrics.incr('waiting_room.joined')
+    return _serializer().dumps({'k': 'queue', 'e': event_id, 'q': queue_id, 's': seq, 'u': user_id})
+
+
+def status(event_id, token):
+    """Progress of a queue token: ``{'admitted', 'position', 'eta', ...}``.
+    Admitted clients also get their admission token."""
+    try:
+        data = _serializer().loads(token, max_age=current_app.config['WAITING_ROOM_KEY_TTL'])
+    except BadSignature as exc:
+        raise InvalidQueueToken(str(exc))
+    if data.get('k') != 'queue' or data.get('e') != event_id:
+        raise InvalidQueueToken('Token is not for this event')
+
+    rate = get_rate(event_id)
+    frontier = _advance(event_id, rate) if rate else None
+    if frontier is not None and data['s'] > frontier:
+        position = cache.r.zcount(_key(event_id, 'queue'), f"({frontier}", data['s'])
+        return {
+            'admitted': False,
+            'position': position,
+            'eta': math.ceil(position / rate),
+            'pollAfter': current_app.config['WAITING_ROOM_POLL_INTERVAL']
+        }
+
+    # Admitted (or the room has closed): leave the queue
+    cache.r.zrem(_key(event_id, 'queue'), data['q'])
+    metrics.incr('waiting_room.admitted')
+    admission = _serializer().dumps({'k': 'admission', 'e': event_id, 'u': data.get('u')})
+    return {
+        'admitted': True,
+        'position': 0,
+        'eta': 0,
+        'admissionToken': admission,
+        'expiresIn': current_app.config['WAITING_ROOM_ADMISSION_TTL']
+    }
+
+
+def is_admitted(event_id, token, user_id=None):
+    """Whether ``token`` is a live admission for the event (and the user)"""
+    if not token:
+        return False
+    try:
+        data = _serializer().loads(token, max_age=current_app.config['WAITING_ROOM_ADMISSION_TTL'])
+    except BadSignature:
+        return False
+    if data.get('k') != 'admission' or data.get('e') != event_id:
+        return False
+    owner = data.get('u')
+    return owner is None or user_id is None or str(owner) == str(user_id)
+
+
+def admission_required(get_event_id):
+    """Reject calls for events with an open waiting room unless they carry an
+    admission token (``X-Admission-Token``). ``get_event_id()`` resolves the
+    event from the current request; None skips the check. If Redis is down
+    the room fails open rather than blocking every sale."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method == 'OPTIONS':
+                return f(*args, **kwargs)
+            try:
+                event_id = get_event_id()
+                if event_id is not None:
+                    event_id = int(event_id)
+                    rate = get_rate(event_id)
+                else:
+                    rate = 0
+            except (TypeError, ValueError):
+                rate = 0
+            except RedisError as exc:
+                print("Waiting room unavailable:", str(exc), flush=True)
+                metrics.incr('waiting_room.redis_error')
+                rate = 0
+
+            if rate:
+                try:
+                    verify_jwt_in_request(optional=True)
+                    user_id = get_jwt_identity()
+                except Exception:
+                    user_id = None
+                if not is_admitted(event_id, request.headers.get(ADMISSION_HEADER), user_id):
+                    metrics.incr('waiting_room.rejected')
+                    return jsonify({
+                        'success': False,
+                        'message': 'Sự kiện đang có nhiều người truy cập, vui lòng vào phòng chờ',
+                        'waitingRoom': True,
+                        'eventId': event_id
+                    }), 429
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
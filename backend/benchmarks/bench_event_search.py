@@ -0,0 +1,106 @@
+# Benchmark: catalog search before/after the stored search document
+#
+# Builds a synthetic catalog in a scratch schema and times the old
+# unaccent(lower(...)) LIKE '%q%' filter against the trigram-indexed
+# search_document filter used by EventService.get_all_events.
+#
+#   DATABASE_URL=postgresql://... python benchmarks/bench_event_search.py --rows 1000000
+#
+# Needs a Postgres role allowed to create the unaccent and pg_trgm extensions.
+import argparse
+import os
+import statistics
+import time
+from sqlalchemy import create_engine, text
+
+SCHEMA = "bench_search"
+
+QUERIES = ["nhac", "hoa nhac", "san khau kich", "festival", "zzzz"]
+
+OLD_SQL = f"""
+    SELECT e.event_id
+    FROM {SCHEMA}.events e
+    WHERE e.approved = 'approved'
+      AND (
+          unaccent(lower(e.name)) LIKE unaccent(lower(:search))
+          OR unaccent(lower(e.description)) LIKE unaccent(lower(:search))
+      )
+    LIMIT 10
+"""
+
+NEW_SQL = f"""
+    SELECT e.event_id
+    FROM {SCHEMA}.events e
+    WHERE e.approved = 'approved' {{terms}}
+    ORDER BY word_similarity(:search_query, e.search_document) DESC, e.event_id DESC
+    LIMIT 10
+"""
+
+
+def build_catalog(conn, rows):
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    conn.execute(text(f"""
+        CREATE TABLE {SCHEMA}.events (
+            event_id serial PRIMARY KEY,
+            name varchar(100) NOT NULL,
+            description text,
+            approved text NOT NULL,
+            search_document text
+        )
+    """))
+    conn.execute(text(f"""
+        INSERT INTO {SCHEMA}.events (name, description, approved)
+        SELECT
+            (ARRAY['Hòa nhạc', 'Sân khấu kịch', 'Lễ hội', 'Triển lãm', 'Hội thảo'])[1 + i % 5]
+                || ' ' || (ARRAY['Hà Nội', 'Sài Gòn', 'Đà Nẵng', 'Huế'])[1 + i % 4]
+                || ' #' || i,
+            repeat('Sự kiện âm nhạc và nghệ thuật đặc sắc ', 1 + i % 4) || md5(i::text),
+            CASE WHEN i % 10 = 0 THEN 'pending' ELSE 'approved' END
+        FROM generate_series(1, :rows) AS i
+    """), {"rows": rows})
+    # Same normalization as Event.refresh_search_document for this data set
+    conn.execute(text(f"UPDATE {SCHEMA}.events SET search_document = lower(unaccent(name || ' ' || description))"))
+    conn.execute(text(f"ANALYZE {SCHEMA}.events"))
+
+
+def time_query(conn, sql, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(text(sql), params).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog search latency before/after the search document")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine(os.environ["DATABASE_URL"])
+    with engine.begin() as conn:
+        print(f"Building {args.rows} synthetic events...")
+        build_catalog(conn, args.rows)
+
+        print(f"{'query':<16}{'before p50':>12}{'before max':>12}{'after p50':>12}{'after max':>12}")
+        conn.execute(text(f"CREATE INDEX ON {SCHEMA}.events USING gin (search_document gin_trgm_ops)"))
+        conn.execute(text(f"ANALYZE {SCHEMA}.events"))
+        for query in QUERIES:
+            terms = query.split()
+            term_sql = "".join(f" AND e.search_document LIKE :term_{i}" for i in range(len(terms)))
+            new_params = {f"term_{i}": f"%{term}%" for i, term in enumerate(terms)}
+            new_params["search_query"] = query
+
+            before = time_query(conn, OLD_SQL, {"search": f"%{query}%"}, args.repeat)
+            after = time_query(conn, NEW_SQL.format(terms=term_sql), new_params, args.repeat)
+            print(f"{query:<16}{before[0]:>10.1f}ms{before[1]:>10.1f}ms{after[0]:>10.1f}ms{after[1]:>10.1f}ms")
+
+        conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
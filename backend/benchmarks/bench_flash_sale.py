@@ -0,0 +1,115 @@
+# Benchmark: flash-sale reservations under contention
+#
+# Fires thousands of concurrent single-ticket reservations at one hot ticket
+# type and reports throughput, latency and whether anything was oversold.
+#
+#   python benchmarks/bench_flash_sale.py --backend local
+#   python benchmarks/bench_flash_sale.py --backend redis --redis-url redis://localhost:6379/0
+#
+# With --database-url the same load is also run against the row-lock path
+# (SELECT ... FOR UPDATE + UPDATE on one tickets row) in a scratch schema.
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.utils.inventory_gate import LocalInventoryGate, RedisInventoryGate  # noqa: E402
+
+TICKET_ID = 1
+SCHEMA = "bench_flash_sale"
+
+
+def run(name, reserve, buyers, threads):
+    latencies = []
+    sold = []
+    lock = threading.Lock()
+
+    def buyer(_):
+        started = time.perf_counter()
+        ok = reserve()
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if ok:
+                sold.append(1)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(buyer, range(buyers)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:>10}: {buyers / wall:8.0f} req/s  "
+          f"median {statistics.median(latencies) * 1000:6.2f} ms  p99 {p99 * 1000:6.2f} ms  sold {len(sold)}")
+    return len(sold)
+
+
+def gate_reserve(gate):
+    return lambda: gate.reserve({TICKET_ID: 1}) is None
+
+
+def row_lock_reserve(engine):
+    from sqlalchemy import text
+
+    def reserve():
+        with engine.begin() as conn:
+            remaining = conn.execute(
+                text(f"SELECT quantity FROM {SCHEMA}.tickets WHERE ticket_id = :id FOR UPDATE"),
+                {"id": TICKET_ID},
+            ).scalar()
+            if remaining < 1:
+                return False
+            conn.execute(
+                text(f"UPDATE {SCHEMA}.tickets SET quantity = quantity - 1 WHERE ticket_id = :id"),
+                {"id": TICKET_ID},
+            )
+            return True
+    return reserve
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flash-sale reservation contention benchmark")
+    parser.add_argument("--backend", choices=["local", "redis"], default="local")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--stock", type=int, default=1000)
+    parser.add_argument("--buyers", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=64)
+    args = parser.parse_args()
+
+    if args.backend == "redis":
+        import redis
+        gate = RedisInventoryGate(redis.Redis.from_url(args.redis_url, decode_responses=True),
+                                  prefix="bench:inventory:ticket")
+    else:
+        gate = LocalInventoryGate()
+    gate.load({TICKET_ID: args.stock})
+    sold = run(args.backend, gate_reserve(gate), args.buyers, args.threads)
+    assert sold == min(args.stock, args.buyers) and gate.get(TICKET_ID) == max(0, args.stock - args.buyers), \
+        "oversold or undersold"
+    gate.clear([TICKET_ID])
+
+    if args.database_url:
+        from sqlalchemy import create_engine, text
+        engine = create_engine(args.database_url, pool_size=args.threads, max_overflow=0)
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+            conn.execute(text(f"CREATE TABLE {SCHEMA}.tickets (ticket_id int PRIMARY KEY, quantity int NOT NULL)"))
+            conn.execute(text(f"INSERT INTO {SCHEMA}.tickets VALUES (:id, :stock)"),
+                         {"id": TICKET_ID, "stock": args.stock})
+        try:
+            run("row lock", row_lock_reserve(engine), args.buyers, args.threads)
+        finally:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
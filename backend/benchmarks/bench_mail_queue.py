@@ -0,0 +1,89 @@
+# Benchmark: outbound mail throughput, connection per message vs the outbox
+#
+# Sends the same booking confirmations to a local SMTP sink that adds
+# --rtt seconds to every reply (a remote server's round trip), first the old
+# way (connect, LOGIN and QUIT for each message, inside the caller) and then
+# through the outbox: the caller only inserts a row, and MailService drains
+# the table over --workers persistent sessions. Reports messages/s, the time
+# a caller is blocked per message and the SMTP connections opened.
+#
+#   python benchmarks/bench_mail_queue.py
+#   python benchmarks/bench_mail_queue.py --messages 500 --rtt 0.02 --workers 1 4 8
+import argparse
+import os
+import smtplib
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+for name in ("PAYOS_CLIENT_ID", "PAYOS_API_KEY", "PAYOS_CHECKSUM_KEY"):
+    os.environ.setdefault(name, "bench")
+
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.services.mail_service import MailService  # noqa: E402
+from app.utils.mail import outbox  # noqa: E402
+from app.utils.mail.sender import build_booking_confirmation_email  # noqa: E402
+from app.utils.mail.sink import LocalSMTPSink  # noqa: E402
+
+
+def messages(count):
+    return [build_booking_confirmation_email(f"buyer{n}@example.com", "Concert", n) for n in range(count)]
+
+
+def per_message(sink, batch):
+    """What sender.py used to do: a fresh authenticated session per message"""
+    started = time.perf_counter()
+    for msg in batch:
+        with smtplib.SMTP(sink.host, sink.port) as server:
+            server.login("mailer", "secret")
+            server.send_message(msg)
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed
+
+
+def queued(sink, batch, workers):
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        outbox.MAIL_QUEUE_SIZE = max(outbox.MAIL_QUEUE_SIZE, len(batch))
+        pool = MailService.pool(workers, host=sink.host, port=sink.port, user="mailer", password="secret",
+                                starttls=False)
+        started = time.perf_counter()
+        for msg in batch:
+            outbox.enqueue(msg)
+        blocked = time.perf_counter() - started
+        while MailService.send_batch(pool):
+            pass
+        elapsed = time.perf_counter() - started
+        pool.close()
+        db.session.remove()
+        db.drop_all()
+    return elapsed, blocked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mail outbox throughput benchmark")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--rtt", type=float, default=0.01, help="seconds added to every SMTP reply")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    batch = messages(args.messages)
+    print(f"{'mode':>16}  {'msg/s':>8}  {'caller ms/msg':>13}  {'connections':>11}")
+    runs = [("per message", lambda sink: per_message(sink, batch))]
+    runs += [(f"outbox x{workers}", lambda sink, workers=workers: queued(sink, batch, workers))
+             for workers in args.workers]
+    for name, run in runs:
+        sink = LocalSMTPSink(delay=args.rtt)
+        try:
+            elapsed, blocked = run(sink)
+            assert len(sink.messages) == args.messages
+            print(f"{name:>16}  {args.messages / elapsed:8.1f}  {1000 * blocked / args.messages:13.3f}  "
+                  f"{sink.connections:11d}")
+        finally:
+            sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Benchmark: event notification campaign throughput and memory
+#
+# Creates an event with --recipients confirmed bookings, then sends a
+# reminder campaign to a local SMTP sink (adding --rtt seconds per SMTP reply)
+# over --workers persistent sessions, printing progress per batch. Reports
+# messages/s; with --trace-memory also the peak Python memory of the run,
+# which stays flat as recipients are streamed rather than loaded (tracing
+# slows the run down several times).
+#
+#   python benchmarks/bench_notifications.py
+#   python benchmarks/bench_notifications.py --recipients 100000 --workers 8 --rtt 0.005
+#   python benchmarks/bench_notifications.py --recipients 5000 --trace-memory
+#   python benchmarks/bench_notifications.py --database-url postgresql://localhost/thticket
+#
+# Without --database-url an in-memory SQLite database is used.
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+for name in ("PAYOS_CLIENT_ID", "PAYOS_API_KEY", "PAYOS_CHECKSUM_KEY"):
+    os.environ.setdefault(name, "bench")
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models.booking import Booking  # noqa: E402
+from app.models.event import Event  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.notification_service import NotificationService  # noqa: E402
+from app.utils.mail.outbox import SMTPPool  # noqa: E402
+from app.utils.mail.sink import LocalSMTPSink  # noqa: E402
+
+
+def seed(recipients):
+    user = User(email="bench-notifications@example.com", password_hash="x")
+    start = datetime.utcnow() + timedelta(hours=12)
+    event = Event(name="Bench concert", start_time=start, venue_name="Hall A", approved="approved")
+    db.session.add_all([user, event])
+    db.session.flush()
+    for offset in range(0, recipients, 10000):
+        db.session.execute(insert(Booking), [
+            {
+                "user_id": user.user_id,
+                "event_id": event.event_id,
+                "booking_full_name": f"Buyer {n}",
+                "booking_email": f"buyer{n}@example.com",
+                "booking_phone": "0900000000",
+                "status": "confirmed",
+            }
+            for n in range(offset, min(offset + 10000, recipients))
+        ])
+    db.session.commit()
+    return user.user_id, event.event_id, start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Notification campaign benchmark")
+    parser.add_argument("--recipients", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4, help="parallel SMTP sessions")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--rtt", type=float, default=0, help="seconds added to every SMTP reply")
+    parser.add_argument("--trace-memory", action="store_true")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+        app = create_app("production")
+    else:
+        app = create_app("testing")
+
+    sink = LocalSMTPSink(delay=args.rtt, keep=False)
+    with app.app_context():
+        db.create_all()
+        user_id, event_id, start = seed(args.recipients)
+        campaign_id = NotificationService.create_campaign(event_id, "reminder", dedupe_key=start.isoformat())
+
+        def report(progress):
+            if progress["sent"] % (args.batch_size * 20) == 0 or progress["percent"] == 100:
+                print(f"  {progress['sent'] + progress['failed']}/{progress['total']} ({progress['percent']}%)")
+
+        if args.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        with SMTPPool(args.workers, host=sink.host, port=sink.port, starttls=False, user="", password="") as pool:
+            claim = NotificationService.claim_campaign(campaign_id)
+            result = NotificationService.run_campaign(*claim, pool=pool, batch_size=args.batch_size, progress=report)
+        elapsed = time.perf_counter() - started
+        memory = ""
+        if args.trace_memory:
+            memory = f", peak memory {tracemalloc.get_traced_memory()[1] / 2 ** 20:.1f} MiB"
+            tracemalloc.stop()
+
+        print(f"sent {result['sent']} ({result['failed']} failed) in {elapsed:.1f}s: "
+              f"{result['sent'] / elapsed:.0f} msg/s, {sink.received} received over "
+              f"{sink.connections} SMTP connections{memory}")
+        if args.database_url:
+            db.session.query(Booking).filter_by(event_id=event_id).delete()
+            db.session.query(Event).filter_by(event_id=event_id).delete()
+            db.session.query(User).filter_by(user_id=user_id).delete()
+            db.session.commit()
+    sink.close()
+
+
+if __name__ == "__main__":
+    main()
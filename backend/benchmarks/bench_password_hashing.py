@@ -0,0 +1,54 @@
+# Benchmark: logins/sec per core for password hashing methods
+#
+# Verifies pre-made hashes (what a login costs) for each method, first on a
+# single core in-process and then on a process pool like the one the web
+# workers use, and reports throughput and per-core rate.
+#
+#   python benchmarks/bench_password_hashing.py
+#   python benchmarks/bench_password_hashing.py --workers 4 --methods scrypt:16384:8:1 pbkdf2:sha256:600000
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.utils.passwords import _hash, _verify  # noqa: E402
+
+DEFAULT_METHODS = ["scrypt:32768:8:1", "scrypt:16384:8:1", "pbkdf2:sha256:1000000", "pbkdf2:sha256:600000"]
+PASSWORD = "correct horse battery staple"
+
+
+def logins(method, count, pool=None):
+    password_hash = _hash(PASSWORD, method)
+    started = time.perf_counter()
+    if pool is None:
+        for _ in range(count):
+            assert _verify(password_hash, PASSWORD, method)[0]
+    else:
+        futures = [pool.submit(_verify, password_hash, PASSWORD, method) for _ in range(count)]
+        assert all(future.result()[0] for future in futures)
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Password hashing throughput benchmark")
+    parser.add_argument("--methods", nargs="+", default=DEFAULT_METHODS)
+    parser.add_argument("--logins", type=int, default=50, help="verifications per method and mode")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"{'method':>24}  {'1 core/s':>9}  {f'pool x{args.workers}/s':>12}  {'per core/s':>10}  {'ms/login':>8}")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Start the workers before timing
+        list(pool.map(abs, range(args.workers)))
+        for method in args.methods:
+            single = logins(method, args.logins)
+            pooled = logins(method, args.logins * args.workers, pool)
+            print(f"{method:>24}  {single:9.1f}  {pooled:12.1f}  {pooled / args.workers:10.1f}  {1000 / single:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
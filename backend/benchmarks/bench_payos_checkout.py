@@ -0,0 +1,207 @@
+# Benchmark: ticket lock wait with the PayOS call inside vs outside the transaction
+#
+# Starts a local fake PayOS server that answers payment-link requests after
+# --latency seconds, then runs concurrent checkouts for one ticket type two
+# ways and reports how long each buyer waited for the ticket row lock:
+#
+#   inline     lock ticket, insert payment, call PayOS, commit (the old flow)
+#   two-phase  lock ticket, insert payment, commit; call PayOS; record URL
+#
+#   python benchmarks/bench_payos_checkout.py --latency 0.3
+#   python benchmarks/bench_payos_checkout.py --database-url postgresql://localhost/thticket
+#
+# Without --database-url the row lock is modelled with an in-process lock.
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+for name in ("PAYOS_CLIENT_ID", "PAYOS_API_KEY", "PAYOS_CHECKSUM_KEY"):
+    os.environ.setdefault(name, "bench")
+
+from payos import PayOS  # noqa: E402
+from payos.types import CreatePaymentLinkRequest  # noqa: E402
+
+from app.utils.payment.payos_payment import payos_setup  # noqa: E402
+
+CHECKSUM_KEY = "bench-checksum-key"
+TICKET_ID = 1
+SCHEMA = "bench_payos_checkout"
+
+
+def fake_payos(latency):
+    """A PayOS stand-in answering POST /v2/payment-requests after ``latency`` seconds"""
+    signer = PayOS(client_id="bench", api_key="bench", checksum_key=CHECKSUM_KEY).crypto
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(latency)
+            data = {
+                "bin": "970422",
+                "accountNumber": "0000000000",
+                "accountName": "TH TICKET",
+                "amount": body["amount"],
+                "description": body["description"],
+                "orderCode": body["orderCode"],
+                "currency": "VND",
+                "paymentLinkId": f"link-{body['orderCode']}",
+                "status": "PENDING",
+                "expiredAt": body.get("expiredAt"),
+                "checkoutUrl": f"https://pay.payos.vn/web/link-{body['orderCode']}",
+                "qrCode": "000201",
+            }
+            payload = json.dumps({
+                "code": "00",
+                "desc": "success",
+                "data": data,
+                "signature": signer.create_signature_from_object(data, CHECKSUM_KEY),
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class LocalStore:
+    """One ticket row whose lock is a threading.Lock"""
+
+    def __init__(self):
+        self._row = threading.Lock()
+
+    @contextmanager
+    def transaction(self):
+        locked = []
+
+        def lock_ticket():
+            self._row.acquire()
+            locked.append(True)
+
+        try:
+            yield lock_ticket, lambda order_code, url=None: None
+        finally:
+            if locked:
+                self._row.release()
+
+
+class PostgresStore:
+    """A scratch schema with a tickets and a payments table"""
+
+    def __init__(self, url, pool_size):
+        from sqlalchemy import create_engine, text
+        self.text = text
+        self.engine = create_engine(url, pool_size=pool_size, max_overflow=0)
+        with self.engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+            conn.execute(text(f"CREATE TABLE {SCHEMA}.tickets (ticket_id int PRIMARY KEY, quantity int NOT NULL)"))
+            conn.execute(text(f"CREATE TABLE {SCHEMA}.payments (order_code int PRIMARY KEY, checkout_url text)"))
+            conn.execute(text(f"INSERT INTO {SCHEMA}.tickets VALUES (:id, 1000000)"), {"id": TICKET_ID})
+
+    @contextmanager
+    def transaction(self):
+        text = self.text
+        with self.engine.begin() as conn:
+            def lock_ticket():
+                conn.execute(text(f"SELECT quantity FROM {SCHEMA}.tickets WHERE ticket_id = :id FOR UPDATE"),
+                             {"id": TICKET_ID})
+
+            def save(order_code, url=None):
+                conn.execute(text(
+                    f"INSERT INTO {SCHEMA}.payments VALUES (:code, :url) "
+                    f"ON CONFLICT (order_code) DO UPDATE SET checkout_url = EXCLUDED.checkout_url"
+                ), {"code": order_code, "url": url})
+
+            yield lock_ticket, save
+
+    def close(self):
+        with self.engine.begin() as conn:
+            conn.execute(self.text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+def create_link(client, order_code):
+    request = CreatePaymentLinkRequest(**payos_setup(order_code, 100000))
+    return client.payment_requests.create(payment_data=request).checkout_url
+
+
+def inline(store, client, order_code):
+    with store.transaction() as (lock_ticket, save):
+        started = time.perf_counter()
+        lock_ticket()
+        waited = time.perf_counter() - started
+        save(order_code, create_link(client, order_code))
+    return waited
+
+
+def two_phase(store, client, order_code):
+    with store.transaction() as (lock_ticket, save):
+        started = time.perf_counter()
+        lock_ticket()
+        waited = time.perf_counter() - started
+        save(order_code)
+    url = create_link(client, order_code)
+    with store.transaction() as (_, save):
+        save(order_code, url)
+    return waited
+
+
+def run(name, flow, store, client, buyers, threads, order_codes):
+    waits = []
+    lock = threading.Lock()
+
+    def buyer(_):
+        waited = flow(store, client, next(order_codes))
+        with lock:
+            waits.append(waited)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(buyer, range(buyers)))
+    wall = time.perf_counter() - started
+
+    waits.sort()
+    p99 = waits[int(len(waits) * 0.99) - 1]
+    print(f"{name:>10}: {buyers / wall:7.1f} checkouts/s  lock wait "
+          f"median {statistics.median(waits) * 1000:8.2f} ms  p99 {p99 * 1000:8.2f} ms  max {waits[-1] * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PayOS checkout lock-wait benchmark")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake PayOS latency in seconds")
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    server = fake_payos(args.latency)
+    client = PayOS(client_id="bench", api_key="bench", checksum_key=CHECKSUM_KEY,
+                   base_url=f"http://127.0.0.1:{server.server_port}", timeout=args.latency + 5, max_retries=0)
+    store = PostgresStore(args.database_url, args.threads) if args.database_url else LocalStore()
+    order_codes = itertools.count(1)
+    try:
+        run("inline", inline, store, client, args.buyers, args.threads, order_codes)
+        run("two-phase", two_phase, store, client, args.buyers, args.threads, order_codes)
+    finally:
+        server.shutdown()
+        if args.database_url:
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
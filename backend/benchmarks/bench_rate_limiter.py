@@ -0,0 +1,90 @@
+# Benchmark: per-request overhead of the rate limiter
+#
+# Sends --requests requests through the Flask test client to a trivial route,
+# with no limiter, with a two-dimension limit (ip + email) counted in Redis,
+# and with the same limit on the per-worker fallback (Redis unreachable), and
+# reports microseconds per request and the limiter's added cost.
+#
+#   python benchmarks/bench_rate_limiter.py
+#   python benchmarks/bench_rate_limiter.py --redis-url redis://localhost:6379/0 --requests 5000
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+for name in ("PAYOS_CLIENT_ID", "PAYOS_API_KEY", "PAYOS_CHECKSUM_KEY"):
+    os.environ.setdefault(name, "bench")
+
+import redis  # noqa: E402
+from redis.backoff import NoBackoff  # noqa: E402
+from redis.retry import Retry  # noqa: E402
+from flask import jsonify  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.utils import cache  # noqa: E402
+from app.utils.rate_limit import rate_limit  # noqa: E402
+
+
+def build_app():
+    app = create_app("testing")
+    app.config.update(RATE_LIMIT_ENABLED=True, BENCH_IP="1000000/60", BENCH_EMAIL="1000000/60")
+
+    @app.route("/bench/plain", methods=["POST"])
+    def plain():
+        return jsonify({"ok": True})
+
+    @app.route("/bench/limited", methods=["POST"])
+    @rate_limit("bench", ip="BENCH_IP", email="BENCH_EMAIL")
+    def limited():
+        return jsonify({"ok": True})
+
+    return app
+
+
+def per_request(client, path, count):
+    body = {"email": "buyer@example.com"}
+    for _ in range(50):
+        client.post(path, json=body)
+    started = time.perf_counter()
+    for _ in range(count):
+        client.post(path, json=body)
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate limiter overhead benchmark")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/0"))
+    args = parser.parse_args()
+
+    app = build_app()
+    client = app.test_client()
+    baseline = per_request(client, "/bench/plain", args.requests)
+    print(f"{'mode':>16}  {'us/request':>10}  {'limiter us':>10}")
+    print(f"{'no limiter':>16}  {baseline:10.1f}  {'-':>10}")
+
+    no_retry = Retry(NoBackoff(), 0)
+    backends = [
+        ("redis", redis.Redis.from_url(args.redis_url, socket_connect_timeout=0.5, retry=no_retry)),
+        # Nothing listens on port 9: every call fails over to local counters
+        ("local fallback", redis.Redis(host="127.0.0.1", port=9, socket_connect_timeout=0.5, retry=no_retry)),
+    ]
+    for name, client_redis in backends:
+        if name == "redis":
+            try:
+                client_redis.ping()
+            except redis.RedisError as exc:
+                print(f"{name:>16}  skipped ({exc.__class__.__name__}: is Redis running at {args.redis_url}?)")
+                continue
+        cache.r = client_redis
+        # The fallback logs every Redis error; keep that out of the output
+        with contextlib.redirect_stdout(io.StringIO()):
+            cost = per_request(client, "/bench/limited", args.requests)
+        print(f"{name:>16}  {cost:10.1f}  {cost - baseline:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
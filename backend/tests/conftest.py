@@ -0,0 +1,197 @@
+# Shared test configuration
+import os
+import threading
+import time
+import pytest
+
+# The PayOS client is built at import time and refuses empty credentials
+os.environ.setdefault("PAYOS_CLIENT_ID", "test-client-id")
+os.environ.setdefault("PAYOS_API_KEY", "test-api-key")
+os.environ.setdefault("PAYOS_CHECKSUM_KEY", "test-checksum-key")
+
+
+class FakeRedis:
+    """In-memory stand-in for the subset of redis.Redis the app uses"""
+    
+    def __init__(self):
+        self._data = {}
+        self._expiry = {}
+        self._lock = threading.RLock()
+    
+    def _alive(self, key):
+        expires_at = self._expiry.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+        return key in self._data
+    
+    def get(self, name):
+        with self._lock:
+            return self._data[name] if self._alive(name) else None
+    
+    def set(self, name, value, ex=None, px=None, nx=False):
+        with self._lock:
+            if nx and self._alive(name):
+                return None
+            self._data[name] = str(value)
+            self._expiry.pop(name, None)
+            if ex is not None:
+                self._expiry[name] = time.monotonic() + ex
+            elif px is not None:
+                self._expiry[name] = time.monotonic() + px / 1000
+            return True
+    
+    def delete(self, *names):
+        with self._lock:
+            removed = 0
+            for name in names:
+                if self._alive(name):
+                    removed += 1
+                self._data.pop(name, None)
+                self._expiry.pop(name, None)
+            return removed
+    
+    def incr(self, name, amount=1):
+        with self._lock:
+            value = int(self._data[name]) if self._alive(name) else 0
+            self._data[name] = str(value + amount)
+            return value + amount
+    
+    def incrby(self, name, amount):
+        return self.incr(name, amount)
+    
+    def getset(self, name, value):
+        with self._lock:
+            old = self.get(name)
+            self._data[name] = str(value)
+            self._expiry.pop(name, None)
+            return old
+    
+    def expire(self, name, seconds):
+        with self._lock:
+            if not self._alive(name):
+                return False
+            self._expiry[name] = time.monotonic() + seconds
+            return True
+    
+    def zadd(self, name, mapping):
+        with self._lock:
+            if not self._alive(name):
+                self._data[name] = {}
+            zset = self._data[name]
+            added = sum(1 for member in mapping if member not in zset)
+            zset.update({member: float(score) for member, score in mapping.items()})
+            return added
+    
+    def zcount(self, name, min, max):
+        def bound(value):
+            value = str(value)
+            return (value.startswith('('), float(value.lstrip('(')))
+        
+        with self._lock:
+            if not self._alive(name):
+                return 0
+            (lo_open, lo), (hi_open, hi) = bound(min), bound(max)
+            return sum(
+                1 for score in self._data[name].values()
+                if (score > lo if lo_open else score >= lo) and (score < hi if hi_open else score <= hi)
+            )
+    
+    def zrem(self, name, *members):
+        with self._lock:
+            if not self._alive(name):
+                return 0
+            return sum(1 for member in members if self._data[name].pop(member, None) is not None)
+    
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+            self._expiry.clear()
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+    
+    def eval(self, script, numkeys, *keys_and_args):
+        """Run one of the app's Lua scripts through its Python mirror"""
+        from app.utils import waiting_room
+        
+        mirrors = {waiting_room.ADVANCE_SCRIPT: _advance_waiting_room}
+        with self._lock:
+            return mirrors[script](self, keys_and_args[:numkeys], keys_and_args[numkeys:])
+
+
+def _advance_waiting_room(redis, keys, args):
+    """waiting_room.ADVANCE_SCRIPT"""
+    tick, frontier_key, seq_key = keys
+    now, rate, max_catchup = (int(arg) for arg in args)
+    last = redis.getset(tick, now)
+    frontier = int(redis.get(frontier_key) or 0)
+    if last is None:
+        return frontier
+    elapsed = min(now - int(last), max_catchup)
+    if elapsed <= 0:
+        return frontier
+    advanced = min(frontier + rate * elapsed, int(redis.get(seq_key) or 0))
+    if advanced > frontier:
+        return redis.incrby(frontier_key, advanced - frontier)
+    return frontier
+
+
+class FakePipeline:
+    """Queues commands and runs them under the store's lock on execute()"""
+    
+    def __init__(self, redis):
+        self._redis = redis
+        self._commands = []
+    
+    def __getattr__(self, name):
+        method = getattr(self._redis, name)
+        
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+        return queue
+    
+    def execute(self):
+        with self._redis._lock:
+            results = [method(*args, **kwargs) for method, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Swap the shared Redis client for an in-memory stand-in"""
+    from app.utils import cache
+    
+    fake = FakeRedis()
+    monkeypatch.setattr(cache, 'r', fake)
+    return fake
+
+
+@pytest.fixture
+def app_config():
+    """Config overrides for the ``app`` fixture; a test module redefines this
+    fixture to change them"""
+    return {}
+
+
+@pytest.fixture
+def app(app_config):
+    """Create application for testing, with a fresh schema"""
+    from app import create_app
+    from app.extensions import db
+    
+    app = create_app('testing')
+    app.config.update(app_config)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Create test client"""
+    return app.test_client()
@@ -0,0 +1,111 @@
+# Tests for role claims and the cached principal on admin routes
+import pytest
+from flask_jwt_extended import create_access_token
+from redis.exceptions import RedisError
+from sqlalchemy import event as sa_event
+from app.extensions import db
+from app.models.user import User
+from app.utils import auth
+
+
+@pytest.fixture
+def users(app, fake_redis):
+    """An admin and a regular user"""
+    auth._versions.clear()
+    admin = User(email='admin@example.com', password_hash='x', role='admin')
+    member = User(email='member@example.com', password_hash='x', role='user')
+    db.session.add_all([admin, member])
+    db.session.commit()
+    return admin, member
+
+
+def _headers(user):
+    token = create_access_token(identity=str(user.user_id), additional_claims=auth.token_claims(user))
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _queries(func):
+    statements = []
+    
+    def record(conn, cursor, statement, *rest):
+        statements.append(statement)
+    
+    sa_event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        result = func()
+    finally:
+        sa_event.remove(db.engine, 'before_cursor_execute', record)
+    return result, statements
+
+
+def test_admin_routes_authorize_from_the_token(client, users):
+    """No user lookup happens to authorize an admin call"""
+    admin, member = users
+    admin_headers, member_headers = _headers(admin), _headers(member)
+    
+    response, statements = _queries(lambda: client.get('/api/admin/metrics', headers=admin_headers))
+    assert response.status_code == 200
+    assert statements == []
+    
+    assert client.get('/api/admin/metrics', headers=member_headers).status_code == 403
+    assert client.get('/api/admin/metrics').status_code == 401
+
+
+def test_role_change_revokes_older_tokens(client, users):
+    """Demoting an admin invalidates the tokens that carried the old role"""
+    admin, member = users
+    other_admin = User(email='boss@example.com', password_hash='x', role='admin')
+    db.session.add(other_admin)
+    db.session.commit()
+    old_headers = _headers(admin)
+    assert client.get('/api/admin/metrics', headers=old_headers).status_code == 200
+    
+    response = client.put(f'/api/admin/users/{admin.user_id}', json={'role': 'user'}, headers=_headers(other_admin))
+    assert response.status_code == 200
+    
+    assert client.get('/api/admin/metrics', headers=old_headers).status_code == 401
+    demoted = db.session.get(User, admin.user_id)
+    assert demoted.role_version == 1
+    assert client.get('/api/admin/metrics', headers=_headers(demoted)).status_code == 403
+
+
+def test_role_change_is_refused_when_it_cannot_be_published(client, users, fake_redis, monkeypatch):
+    """Without Redis the demotion does not commit, rather than leaving the
+    old admin tokens valid on other workers"""
+    admin, member = users
+    other_admin = User(email='boss@example.com', password_hash='x', role='admin')
+    db.session.add(other_admin)
+    db.session.commit()
+    boss_headers = _headers(other_admin)
+    
+    def unavailable(*args, **kwargs):
+        raise RedisError('connection refused')
+    monkeypatch.setattr(fake_redis, 'set', unavailable)
+    
+    response = client.put(f'/api/admin/users/{admin.user_id}', json={'role': 'user'}, headers=boss_headers)
+    assert response.status_code == 503
+    assert client.delete(f'/api/admin/users/{member.user_id}', headers=boss_headers).status_code == 503
+    
+    db.session.expire_all()
+    assert (db.session.get(User, admin.user_id).role, db.session.get(User, admin.user_id).role_version) == ('admin', 0)
+    assert db.session.get(User, member.user_id) is not None
+
+
+def test_failed_commit_restores_the_published_version(users, fake_redis):
+    """A role change that does not commit leaves new tokens valid"""
+    admin, member = users
+    
+    with pytest.raises(RuntimeError):
+        with auth.revoking_tokens(member.user_id, 1, 0):
+            assert auth.current_role_version(str(member.user_id)) == 1
+            raise RuntimeError('commit failed')
+    
+    assert auth.current_role_version(str(member.user_id)) == 0
+
+
+def test_legacy_tokens_fall_back_to_the_database(client, users):
+    """Tokens issued before role claims still work until they expire"""
+    admin, member = users
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(admin.user_id))}'}
+    
+    assert client.get('/api/admin/metrics', headers=headers).status_code == 200
@@ -1,26 +1,7 @@
 # Test cases for authentication
-import pytest
-from app import create_app
 from app.extensions import db
 
 
-@pytest.fixture
-def app():
-    """Create application for testing"""
-    app = create_app('testing')
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.session.remove()
-        db.drop_all()
-
-
-@pytest.fixture
-def client(app):
-    """Create test client"""
-    return app.test_client()
-
-
 def test_register():
     """Test user registration - to be implemented"""
     pass
@@ -34,3 +15,58 @@ def test_login():
 def test_logout():
     """Test user logout - to be implemented"""
     pass
+
+
+def _register(client, email='buyer@example.com', password='secret123'):
+    return client.post('/api/auth/register', json={'email': email, 'password': password})
+
+
+def _login(client, email='buyer@example.com', password='secret123'):
+    return client.post('/api/auth/login', json={'email': email, 'password': password})
+
+
+def test_login_upgrades_outdated_hashes(app, client):
+    """A hash made with old parameters is replaced on the next good login"""
+    from app.models.user import User
+    assert _register(client).status_code == 201
+    assert User.query.one().password_hash.startswith('pbkdf2:sha256:1000$')
+    
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+    assert _login(client, password='wrong').status_code == 401
+    assert User.query.one().password_hash.startswith('pbkdf2:sha256:1000$')
+    assert _login(client).status_code == 200
+    db.session.expire_all()
+    assert User.query.one().password_hash.startswith('pbkdf2:sha256:2000$')
+    assert _login(client).status_code == 200
+
+
+def test_hashing_overload_returns_503(app, client):
+    """Callers that cannot get a hashing slot are turned away, not queued"""
+    from app.utils.passwords import hasher
+    app.config.update(PASSWORD_HASH_MAX_PENDING=1, PASSWORD_HASH_WAIT=0.05)
+    hasher.shutdown()
+    try:
+        assert _register(client).status_code == 201
+        hasher._slots.acquire()
+        response = _login(client)
+        assert (response.status_code, response.headers['Retry-After']) == (503, '1')
+        hasher._slots.release()
+        assert _login(client).status_code == 200
+    finally:
+        hasher.shutdown()
+
+
+def test_hashing_runs_on_the_process_pool(app):
+    """With workers configured, hashes are computed in pool processes"""
+    from app.utils.passwords import hasher, needs_rehash
+    app.config['PASSWORD_HASH_WORKERS'] = 1
+    hasher.shutdown()
+    try:
+        password_hash = hasher.hash('secret123')
+        assert hasher._pool is not None
+        assert hasher.verify(password_hash, 'secret123') == (True, None)
+        assert hasher.verify(password_hash, 'nope') == (False, None)
+        assert not needs_rehash(password_hash, 'pbkdf2:sha256:1000')
+        assert needs_rehash(password_hash, 'scrypt')
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,359 @@
+# Test cases for bookings
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event as sa_event
+from sqlalchemy.exc import OperationalError
+from app.extensions import db
+from app.models.booking import Booking, TicketHold
+from app.models.event import Event, Ticket
+from app.models.payment import Payment
+from app.models.user import User
+from app.services.booking_service import BookingService
+from app.services.inventory_service import InventoryService, InsufficientInventory
+from app.services.payment_service import PaymentService
+from app.utils import db_retry, metrics
+
+
+@pytest.fixture
+def event_with_tickets(app):
+    """An event with three ticket tiers and a buyer"""
+    user = User(email='buyer@example.com', password_hash='x')
+    event = Event(name='Show', start_time=datetime(2026, 11, 20), venue_name='Hall')
+    db.session.add_all([user, event])
+    db.session.flush()
+    tickets = [
+        Ticket(name=name, price=price, quantity=5, event_id=event.event_id)
+        for name, price in (('GA', 100), ('VIP', 300), ('VVIP', 900))
+    ]
+    db.session.add_all(tickets)
+    InventoryService.refresh_event_summary(event.event_id)
+    db.session.commit()
+    return user, event, tickets
+
+
+def _book(user, event, lines):
+    return _create(user.user_id, event.event_id, lines)
+
+
+def _create(user_id, event_id, lines):
+    return BookingService.create_booking(user_id, event_id, lines, 'Buyer', 'buyer@example.com', '0900000000')
+
+
+def _statements(func, *args):
+    """Run ``func`` and return the SQL statements it issued"""
+    statements = []
+    
+    def record(conn, cursor, statement, *rest):
+        statements.append(statement)
+    
+    sa_event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        result = func(*args)
+    finally:
+        sa_event.remove(db.engine, 'before_cursor_execute', record)
+    return result, statements
+
+
+def test_create_booking_loads_tickets_in_one_query(event_with_tickets):
+    """Ticket lookups do not grow with the number of booking lines"""
+    user, event, tickets = event_with_tickets
+    user_id, event_id = user.user_id, event.event_id
+    ticket_ids = [ticket.ticket_id for ticket in tickets]
+    
+    (_, status_code), single = _statements(_create, user_id, event_id, [{'ticket_id': ticket_ids[0], 'quantity': 1}])
+    assert status_code == 201
+    lines = [{'ticket_id': ticket_id, 'quantity': 2} for ticket_id in ticket_ids]
+    (result, status_code), multi = _statements(_create, user_id, event_id, lines)
+    
+    assert status_code == 201
+    assert len(multi) == len(single)
+    assert sum(1 for sql in multi if 'WHERE tickets.ticket_id IN' in sql) == 1
+    booking = db.session.get(Booking, result['booking_id'])
+    assert sorted((line.ticket_id, line.quantity) for line in booking.booking_lines) == \
+        sorted((ticket_id, 2) for ticket_id in ticket_ids)
+
+
+def test_create_booking_validates_tickets(event_with_tickets):
+    """Unknown, foreign and oversold tickets are rejected without writing"""
+    user, event, tickets = event_with_tickets
+    other = Event(name='Other', start_time=datetime(2026, 12, 1), venue_name='Hall')
+    db.session.add(other)
+    db.session.flush()
+    foreign = Ticket(name='GA', price=50, quantity=5, event_id=other.event_id)
+    db.session.add(foreign)
+    db.session.commit()
+    
+    assert _book(user, event, [{'ticket_id': 9999, 'quantity': 1}])[1] == 404
+    assert _book(user, event, [{'ticket_id': foreign.ticket_id, 'quantity': 1}])[1] == 400
+    assert _book(user, event, [{'ticket_id': tickets[0].ticket_id, 'quantity': 0}])[1] == 400
+    # Repeated lines for the same ticket count together
+    assert _book(user, event, [
+        {'ticket_id': tickets[0].ticket_id, 'quantity': 3},
+        {'ticket_id': tickets[0].ticket_id, 'quantity': 3},
+    ])[1] == 409
+    assert Booking.query.count() == 0
+
+
+def test_booking_holds_inventory_until_released(app, event_with_tickets):
+    """Holds reduce availability; expired holds are released by the sweeper"""
+    from app.models.event import EventSummary
+    
+    user, event, tickets = event_with_tickets
+    ticket_id = tickets[0].ticket_id
+    
+    result, status_code = _book(user, event, [{'ticket_id': ticket_id, 'quantity': 4}])
+    assert status_code == 201
+    assert db.session.get(Ticket, ticket_id).available_quantity == 1
+    assert db.session.get(EventSummary, event.event_id).remaining_quantity == 11
+    # Only one GA ticket is left unheld
+    assert _book(user, event, [{'ticket_id': ticket_id, 'quantity': 2}])[1] == 409
+    
+    # Not yet expired (or within the grace period): nothing is released
+    assert BookingService.release_expired_holds() == 0
+    hold = TicketHold.query.filter_by(booking_id=result['booking_id']).one()
+    hold.expires_at = datetime.utcnow() - timedelta(seconds=app.config['HOLD_RELEASE_GRACE'] + 1)
+    db.session.commit()
+    
+    assert BookingService.release_expired_holds(batch_size=1) == 1
+    assert db.session.get(TicketHold, hold.hold_id).status == 'released'
+    assert db.session.get(Ticket, ticket_id).available_quantity == 5
+    assert db.session.get(EventSummary, event.event_id).remaining_quantity == 15
+
+
+def test_convert_holds_on_payment(event_with_tickets):
+    """Confirming a booking turns its holds into sold quantity"""
+    user, event, tickets = event_with_tickets
+    ticket_id = tickets[1].ticket_id
+    result, _ = _book(user, event, [{'ticket_id': ticket_id, 'quantity': 3}])
+    
+    converted = InventoryService.convert_holds(result['booking_id'])
+    ticket = db.session.get(Ticket, ticket_id)
+    ticket.quantity -= 3
+    db.session.commit()
+    
+    assert converted == {ticket_id: 3}
+    assert TicketHold.query.filter_by(booking_id=result['booking_id']).one().status == 'converted'
+    assert (ticket.quantity, ticket.held_quantity) == (2, 0)
+    # Nothing left to convert
+    assert InventoryService.convert_holds(result['booking_id']) == {}
+
+
+def _pending_payment(booking_id, order_id):
+    db.session.add(Payment(booking_id=booking_id, payment_status='pending', amount=0, transaction_id=order_id))
+    db.session.commit()
+
+
+def test_success_payment_sells_all_lines_in_one_update(fake_redis, event_with_tickets):
+    """Confirmation cost does not grow with the number of lines"""
+    user, event, tickets = event_with_tickets
+    user_id, event_id = user.user_id, event.event_id
+    ticket_ids = [ticket.ticket_id for ticket in tickets]
+    
+    single, _ = _create(user_id, event_id, [{'ticket_id': ticket_ids[0], 'quantity': 1}])
+    multi, _ = _create(user_id, event_id, [{'ticket_id': ticket_id, 'quantity': 2} for ticket_id in ticket_ids])
+    _pending_payment(single['booking_id'], 1001)
+    _pending_payment(multi['booking_id'], 1002)
+    
+    _, one_line = _statements(PaymentService.success_payment, 1001)
+    _, three_lines = _statements(PaymentService.success_payment, 1002)
+    
+    assert len(three_lines) == len(one_line)
+    assert sum(1 for sql in three_lines if sql.startswith('UPDATE tickets SET quantity=')) == 1
+    assert [db.session.get(Ticket, ticket_id).quantity for ticket_id in ticket_ids] == [2, 3, 3]
+    assert db.session.get(Booking, multi['booking_id']).status == 'confirmed'
+    # Webhook redelivery is a no-op
+    assert PaymentService.success_payment(1002)['message'] == 'Already processed'
+
+
+def test_success_payment_is_all_or_nothing(fake_redis, event_with_tickets):
+    """A line that would go negative fails the whole confirmation"""
+    user, event, tickets = event_with_tickets
+    ga_id, vip_id = tickets[0].ticket_id, tickets[1].ticket_id
+    result, _ = _book(user, event, [{'ticket_id': ga_id, 'quantity': 2}, {'ticket_id': vip_id, 'quantity': 2}])
+    _pending_payment(result['booking_id'], 2001)
+    # Stock dropped behind the booking's back (e.g. an admin edit)
+    db.session.get(Ticket, vip_id).quantity = 1
+    db.session.commit()
+    
+    with pytest.raises(InsufficientInventory) as exc_info:
+        PaymentService.success_payment(2001)
+    db.session.rollback()
+    
+    assert exc_info.value.ticket_ids == {vip_id}
+    assert db.session.get(Ticket, ga_id).quantity == 5
+    assert Payment.query.filter_by(transaction_id=2001).one().payment_status == 'pending'
+    assert db.session.get(Booking, result['booking_id']).status == 'pending'
+
+
+def test_payment_after_hold_expiry_cannot_take_held_stock(app, fake_redis, event_with_tickets):
+    """A late payment only gets stock no one else holds"""
+    user, event, tickets = event_with_tickets
+    user_id, event_id, ga_id = user.user_id, event.event_id, tickets[0].ticket_id
+    late, _ = _create(user_id, event_id, [{'ticket_id': ga_id, 'quantity': 2}])
+    _pending_payment(late['booking_id'], 3001)
+    hold = TicketHold.query.filter_by(booking_id=late['booking_id']).one()
+    hold.expires_at = datetime.utcnow() - timedelta(seconds=app.config['HOLD_RELEASE_GRACE'] + 1)
+    db.session.commit()
+    assert BookingService.release_expired_holds() == 1
+    # Another buyer now holds 4 of the 5 GA tickets
+    other, _ = _create(user_id, event_id, [{'ticket_id': ga_id, 'quantity': 4}])
+    _pending_payment(other['booking_id'], 3002)
+    
+    with pytest.raises(InsufficientInventory):
+        PaymentService.success_payment(3001)
+    db.session.rollback()
+    
+    assert (db.session.get(Ticket, ga_id).quantity, db.session.get(Ticket, ga_id).held_quantity) == (5, 4)
+    # The buyer who still holds the tickets can pay for them
+    assert PaymentService.success_payment(3002)['status'] == 'completed'
+    assert (db.session.get(Ticket, ga_id).quantity, db.session.get(Ticket, ga_id).held_quantity) == (1, 0)
+
+
+def test_payment_after_hold_expiry_sells_unheld_stock(app, fake_redis, event_with_tickets):
+    """With enough free stock a late payment still goes through"""
+    user, event, tickets = event_with_tickets
+    ga_id = tickets[0].ticket_id
+    late, _ = _book(user, event, [{'ticket_id': ga_id, 'quantity': 2}])
+    _pending_payment(late['booking_id'], 4001)
+    hold = TicketHold.query.filter_by(booking_id=late['booking_id']).one()
+    hold.expires_at = datetime.utcnow() - timedelta(seconds=app.config['HOLD_RELEASE_GRACE'] + 1)
+    db.session.commit()
+    assert BookingService.release_expired_holds() == 1
+    
+    assert PaymentService.success_payment(4001)['status'] == 'completed'
+    assert db.session.get(Ticket, ga_id).quantity == 3
+
+
+class _SQLState(Exception):
+    def __init__(self, pgcode):
+        super().__init__(pgcode)
+        self.pgcode = pgcode
+
+
+def test_retry_on_conflict_retries_deadlocks_only(app, monkeypatch):
+    """Serialization failures and deadlocks are retried with backoff"""
+    monkeypatch.setattr(db_retry.time, 'sleep', lambda seconds: None)
+    metrics.reset()
+    calls = []
+    
+    @db_retry.retry_on_conflict('test', attempts=3)
+    def flaky(pgcode, failures):
+        calls.append(pgcode)
+        if len(calls) <= failures:
+            raise OperationalError('UPDATE tickets', {}, _SQLState(pgcode))
+        return 'ok'
+    
+    assert flaky('40P01', 2) == 'ok'
+    assert len(calls) == 3
+    assert metrics.get_counter('db.retry.test') == 2
+    
+    calls.clear()
+    with pytest.raises(OperationalError):
+        flaky('40001', 5)
+    assert len(calls) == 3
+    assert metrics.get_counter('db.retry_exhausted.test') == 1
+    
+    calls.clear()
+    with pytest.raises(OperationalError):
+        flaky('23505', 1)
+    assert len(calls) == 1
+
+
+def test_flash_sale_booking_reserves_through_gate(app, event_with_tickets):
+    """Flash-sale bookings take counters instead of ticket locks and are
+    reconciled into held_quantity in the background"""
+    from datetime import timedelta
+    from app.services.flash_sale_service import FlashSaleService, reconcile_executor
+    from app.utils.inventory_gate import get_inventory_gate
+    
+    user, event, tickets = event_with_tickets
+    event_id, ticket_id = event.event_id, tickets[0].ticket_id
+    assert FlashSaleService.set_flash_sale(event_id, True)[1] == 200
+    gate = get_inventory_gate()
+    assert gate.get(ticket_id) == 5
+    
+    result, status_code = _create(user.user_id, event_id, [{'ticket_id': ticket_id, 'quantity': 3}])
+    assert status_code == 201
+    assert gate.get(ticket_id) == 2
+    # The in-memory test database is one connection: let the reconciliation
+    # finish before this thread uses it again
+    reconcile_executor.drain(timeout=5)
+    assert _create(user.user_id, event_id, [{'ticket_id': ticket_id, 'quantity': 3}])[1] == 409
+    
+    db.session.expire_all()
+    assert db.session.get(Ticket, ticket_id).held_quantity == 3
+    
+    # Expired flash-sale holds go back to the counter
+    hold = TicketHold.query.filter_by(booking_id=result['booking_id']).one()
+    hold.expires_at = datetime.utcnow() - timedelta(seconds=app.config['HOLD_RELEASE_GRACE'] + 1)
+    db.session.commit()
+    assert BookingService.release_expired_holds() == 1
+    assert gate.get(ticket_id) == 5
+    
+    FlashSaleService.set_flash_sale(event_id, False)
+    assert gate.get(ticket_id) is None
+
+
+def _seed_bookings(user, events, per_event, status='pending'):
+    """Bookings with two lines each for every event in ``events``"""
+    from app.models.booking import BookingLine
+    
+    for event in events:
+        tickets = Ticket.query.filter_by(event_id=event.event_id).limit(2).all()
+        for _ in range(per_event):
+            booking = Booking(user_id=user.user_id, event_id=event.event_id, status=status,
+                              booking_full_name='Buyer', booking_email='b@example.com', booking_phone='0900000000')
+            booking.booking_lines = [
+                BookingLine(ticket_id=ticket.ticket_id, quantity=1, unit_price=ticket.price) for ticket in tickets
+            ]
+            db.session.add(booking)
+    db.session.commit()
+
+
+def test_my_bookings_query_count_is_constant(event_with_tickets):
+    """Listing a page costs the same statements for 2 or 20 bookings"""
+    user, event, tickets = event_with_tickets
+    user_id = user.user_id
+    
+    _seed_bookings(user, [event], 2)
+    db.session.expire_all()
+    (small, _), few = _statements(BookingService.get_user_bookings, user_id)
+    
+    _seed_bookings(user, [event], 18)
+    db.session.expire_all()
+    (large, _), many = _statements(BookingService.get_user_bookings, user_id)
+    
+    assert len(small['bookings']) == 2 and len(large['bookings']) == 20
+    assert len(few) == len(many) == 2
+    assert large['bookings'][0]['total_amount'] == 400
+
+
+def test_my_bookings_filters_and_cursor(event_with_tickets):
+    """Upcoming/past/cancelled filters page through with a cursor"""
+    user, event, tickets = event_with_tickets
+    past = Event(name='Old', start_time=datetime(2000, 1, 1), venue_name='Hall')
+    db.session.add(past)
+    db.session.flush()
+    db.session.add(Ticket(name='GA', price=10, quantity=5, event_id=past.event_id))
+    db.session.commit()
+    
+    _seed_bookings(user, [event], 3)
+    _seed_bookings(user, [past], 1)
+    _seed_bookings(user, [event], 1, status='cancelled')
+    
+    first, _ = BookingService.get_user_bookings(user.user_id, 'upcoming', limit=2)
+    assert first['has_more'] is True
+    second, _ = BookingService.get_user_bookings(user.user_id, 'upcoming', cursor=first['next_cursor'], limit=2)
+    assert second['has_more'] is False
+    ids = [b['booking_id'] for b in first['bookings'] + second['bookings']]
+    assert len(ids) == len(set(ids)) == 3
+    
+    assert len(BookingService.get_user_bookings(user.user_id, 'past')[0]['bookings']) == 1
+    cancelled = BookingService.get_user_bookings(user.user_id, 'cancelled')[0]['bookings']
+    assert [b['status'] for b in cancelled] == ['cancelled']
+    assert len(BookingService.get_user_bookings(user.user_id)[0]['bookings']) == 5
+    
+    with pytest.raises(ValueError):
+        BookingService.get_user_bookings(user.user_id, 'upcoming', cursor=first['next_cursor'] + 'x')
+    with pytest.raises(ValueError):
+        BookingService.get_user_bookings(user.user_id, 'soon')
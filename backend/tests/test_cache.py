@@ -0,0 +1,127 @@
+# Test cases for the caching layers
+import pytest
+from datetime import datetime
+from app.extensions import db
+from app.utils import metrics
+
+
+@pytest.fixture
+def app_config():
+    return {'EVENT_CACHE_ENABLED': True, 'CATALOG_CACHE_ENABLED': True}
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    """Reset per-worker cache state and counters between tests"""
+    from app.services.event_service import event_detail_cache
+    event_detail_cache.local.clear()
+    metrics.reset()
+    yield
+
+
+def make_event(approved='approved'):
+    from app.models.event import Event, Ticket
+    
+    event = Event(name='Concert', start_time=datetime(2026, 11, 20, 19, 30),
+                  venue_name='Stadium', approved=approved)
+    db.session.add(event)
+    db.session.flush()
+    db.session.add(Ticket(name='GA', price=100, quantity=50, event_id=event.event_id))
+    db.session.commit()
+    return event
+
+
+def test_local_lru_evicts_and_expires():
+    """The in-process tier is bounded and honours TTLs"""
+    from app.utils.cache import LocalLRUCache
+    
+    cache = LocalLRUCache(maxsize=2)
+    cache.set('a', 1, ttl=60)
+    cache.set('b', 2, ttl=60)
+    cache.get('a')
+    cache.set('c', 3, ttl=60)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    
+    cache.set('d', 4, ttl=0)
+    assert cache.get('d') is None
+
+
+def test_event_detail_read_through(app, fake_redis):
+    """Misses load from the database, then Redis and the local tier serve hits"""
+    from app.services.event_service import EventService, event_detail_cache
+    
+    event = make_event()
+    
+    first, status_code = EventService.get_event_by_id(event.event_id)
+    assert status_code == 200
+    assert first['event']['ticket_types'][0]['quantity'] == 50
+    assert fake_redis.get(f'cache:event:{event.event_id}') is not None
+    
+    second, _ = EventService.get_event_by_id(event.event_id)
+    event_detail_cache.local.clear()
+    third, _ = EventService.get_event_by_id(event.event_id)
+    
+    assert first == second == third
+    assert metrics.get_counter('cache.event.miss') == 1
+    assert metrics.get_counter('cache.event.local_hit') == 1
+    assert metrics.get_counter('cache.event.redis_hit') == 1
+
+
+def test_event_detail_invalidated_on_update(app, fake_redis):
+    """update_event drops both cache tiers so the next read sees the change"""
+    from app.services.event_service import EventService
+    
+    event = make_event()
+    EventService.get_event_by_id(event.event_id)
+    
+    EventService.update_event(event.event_id, {'title': 'Renamed'})
+    result, _ = EventService.get_event_by_id(event.event_id)
+    
+    assert result['event']['title'] == 'Renamed'
+    assert metrics.get_counter('cache.event.miss') == 2
+
+
+def test_unapproved_event_not_cached(app, fake_redis):
+    """Missing or unapproved events are not cached"""
+    from app.services.event_service import EventService
+    
+    event = make_event(approved='pending')
+    
+    _, status_code = EventService.get_event_by_id(event.event_id)
+    assert status_code == 404
+    assert fake_redis.get(f'cache:event:{event.event_id}') is None
+
+
+def test_versioned_cache_hits_until_bump(app, fake_redis):
+    """Catalog responses are served from cache until the version moves"""
+    from app.utils.cache import VersionedCache
+    
+    cache = VersionedCache('test_catalog', 'CATALOG_CACHE')
+    calls = []
+    
+    def loader():
+        calls.append(1)
+        return {'events': [{'id': len(calls)}]}
+    
+    params = {'category': 'music', 'page': 1}
+    assert cache.get_or_load(params, loader) == {'events': [{'id': 1}]}
+    assert cache.get_or_load(dict(params), loader) == {'events': [{'id': 1}]}
+    assert cache.get_or_load({'category': 'art', 'page': 1}, loader) == {'events': [{'id': 2}]}
+    
+    cache.bump()
+    assert cache.get_or_load(params, loader) == {'events': [{'id': 3}]}
+    
+    ratios = metrics.snapshot()['ratios']
+    assert ratios['cache.test_catalog'] == 0.25
+
+
+def test_versioned_cache_ttl_bounds(app):
+    """Entry TTLs stay inside the configured bounds"""
+    from app.utils.cache import VersionedCache
+    
+    app.config['CATALOG_CACHE_TTL_MIN'] = 10
+    app.config['CATALOG_CACHE_TTL_MAX'] = 20
+    cache = VersionedCache('test_catalog', 'CATALOG_CACHE')
+    
+    assert all(10 <= cache._ttl() <= 20 for _ in range(50))
@@ -1,26 +1,31 @@
 # Test cases for events
+import os
 import pytest
+from datetime import datetime
+from sqlalchemy import text
 from app import create_app
+from app.config import config
 from app.extensions import db
 
 
 @pytest.fixture
-def app():
-    """Create application for testing"""
+def pg_app(monkeypatch):
+    """The app on the Postgres database at TEST_DATABASE_URL; catalog search
+    relies on pg_trgm and real-valued scores that SQLite cannot reproduce"""
+    url = os.getenv('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('TEST_DATABASE_URL is not set')
+    monkeypatch.setattr(config['testing'], 'SQLALCHEMY_DATABASE_URI', url)
     app = create_app('testing')
     with app.app_context():
+        db.session.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        db.session.commit()
         db.create_all()
         yield app
         db.session.remove()
         db.drop_all()
 
 
-@pytest.fixture
-def client(app):
-    """Create test client"""
-    return app.test_client()
-
-
 def test_get_events():
     """Test getting all events - to be implemented"""
     pass
@@ -44,3 +49,268 @@ def test_update_event():
 def test_delete_event():
     """Test deleting event - to be implemented"""
     pass
+
+
+def test_create_event_builds_search_document(app):
+    """Creating an event stores its normalized search document"""
+    from app.models.event import Event
+    from app.services.event_service import EventService
+    
+    result, status_code = EventService.create_event(None, {
+        'title': 'Hòa nhạc Mùa Thu',
+        'description': 'Đêm nhạc',
+        'category': 'music',
+        'date': '2026-11-20',
+        'time': '19:30',
+        'location': 'Nhà hát Lớn',
+        'ticketTypes': []
+    })
+    
+    assert status_code == 201
+    event = db.session.get(Event, result['event']['id'])
+    assert event.search_document == 'hoa nhac mua thu dem nhac nha hat lon music'
+
+
+def test_create_event_builds_summary(app):
+    """Creating an event with tickets stores its price/inventory summary"""
+    from app.models.event import EventSummary
+    from app.services.event_service import EventService
+    
+    result, _ = EventService.create_event(None, {
+        'title': 'Concert',
+        'date': '2026-11-20',
+        'time': '19:30',
+        'location': 'Stadium',
+        'ticketTypes': [
+            {'typeName': 'VIP', 'price': 500000, 'quantity': 10},
+            {'typeName': 'GA', 'price': 200000, 'quantity': 90}
+        ]
+    })
+    
+    summary = db.session.get(EventSummary, result['event']['id'])
+    assert float(summary.min_price) == 200000
+    assert float(summary.max_price) == 500000
+    assert summary.remaining_quantity == 100
+    assert summary.sold_out is False
+
+
+def test_summary_marks_sold_out(app):
+    """The summary flips to sold out once every ticket is gone"""
+    from app.models.event import Event, Ticket
+    from app.services.inventory_service import InventoryService
+    from datetime import datetime
+    
+    event = Event(name='Show', start_time=datetime(2026, 11, 20), venue_name='Hall')
+    db.session.add(event)
+    db.session.flush()
+    ticket = Ticket(name='GA', price=100, quantity=2, event_id=event.event_id)
+    db.session.add(ticket)
+    InventoryService.refresh_event_summary(event.event_id)
+    db.session.commit()
+    
+    ticket.quantity = 0
+    summary = InventoryService.refresh_event_summary(event.event_id)
+    db.session.commit()
+    
+    assert summary.remaining_quantity == 0
+    assert summary.sold_out is True
+
+
+def test_event_detail_conditional_get(app, client):
+    """Event detail answers 304 to a matching If-None-Match or If-Modified-Since"""
+    from app.models.event import Event
+    from datetime import datetime
+    
+    event = Event(name='Show', start_time=datetime(2026, 11, 20), venue_name='Hall', approved='approved')
+    db.session.add(event)
+    db.session.commit()
+    
+    first = client.get(f'/api/events/{event.event_id}')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert 'must-revalidate' in first.headers['Cache-Control']
+    
+    revalidated = client.get(f'/api/events/{event.event_id}', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    
+    since = client.get(f'/api/events/{event.event_id}',
+                       headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert since.status_code == 304
+    
+    event.name = 'Renamed'
+    db.session.commit()
+    changed = client.get(f'/api/events/{event.event_id}', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_create_event_uploads_image_in_background(app, tmp_path):
+    """The image is spooled, the event committed as pending, then stored"""
+    import io
+    import os
+    from werkzeug.datastructures import FileStorage
+    from app.models.event import Event
+    from app.services.event_service import EventService, image_upload_executor, image_variant_executor
+    
+    app.config['IMAGE_SPOOL_DIR'] = str(tmp_path / 'spool')
+    app.config['LOCAL_STORAGE_DIR'] = str(tmp_path / 'storage')
+    app.config['LOCAL_STORAGE_URL'] = 'http://cdn.test'
+    from PIL import Image
+    png = io.BytesIO()
+    Image.new('RGB', (40, 30)).save(png, 'PNG')
+    image = FileStorage(io.BytesIO(png.getvalue()), filename='poster.PNG', content_type='image/png')
+    
+    result, status_code = EventService.create_event(None, {
+        'title': 'Show', 'date': '2026-11-20', 'time': '19:30',
+        'location': 'Hall', 'ticketTypes': []
+    }, image)
+    
+    assert status_code == 201
+    assert result['event']['imageStatus'] == 'pending'
+    image_upload_executor.drain(timeout=5)
+    
+    event_id = result['event']['id']
+    db.session.expire_all()
+    event = db.session.get(Event, event_id)
+    assert event.image_status == 'ready'
+    assert event.image_url == f'http://cdn.test/images/event_{event_id}.png'
+    with open(tmp_path / 'storage' / 'images' / f'event_{event_id}.png', 'rb') as fh:
+        assert fh.read() == png.getvalue()
+    assert os.listdir(tmp_path / 'spool') == []
+    image_variant_executor.drain(timeout=10)
+    db.session.expire_all()
+    assert db.session.get(Event, event_id).image_variants is not None
+
+
+def test_direct_image_upload_presign_and_finalize(app, client, tmp_path):
+    """The organizer gets a scoped upload URL; finalize verifies the object"""
+    from flask_jwt_extended import create_access_token
+    from app.models.event import Event
+    from app.models.user import User
+    from app.services.event_service import image_variant_executor
+    from datetime import datetime
+    
+    app.config['LOCAL_STORAGE_DIR'] = str(tmp_path / 'storage')
+    app.config['LOCAL_STORAGE_URL'] = 'http://cdn.test'
+    organizer = User(email='org@example.com', password_hash='x', role='organizer')
+    db.session.add(organizer)
+    db.session.flush()
+    event = Event(name='Show', start_time=datetime(2026, 11, 20), venue_name='Hall',
+                  organizer_id=organizer.user_id)
+    db.session.add(event)
+    db.session.commit()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(organizer.user_id))}'}
+    stranger = {'Authorization': f'Bearer {create_access_token(identity="999")}'}
+    url = f'/api/events/{event.event_id}/image'
+    
+    assert client.post(f'{url}/upload-url', json={'contentType': 'image/png'}, headers=stranger).status_code == 403
+    assert client.post(f'{url}/upload-url', json={'contentType': 'text/html'}, headers=headers).status_code == 400
+    
+    response = client.post(f'{url}/upload-url', json={'contentType': 'image/png', 'size': 8}, headers=headers)
+    assert response.status_code == 200
+    upload = response.get_json()['upload']
+    assert upload['key'] == f'images/event_{event.event_id}.png'
+    
+    # Nothing uploaded yet, or a key outside this event's scope
+    assert client.post(f'{url}/finalize', json={'key': upload['key']}, headers=headers).status_code == 404
+    assert client.post(f'{url}/finalize', json={'key': 'images/event_1x.png'}, headers=headers).status_code == 400
+    
+    # Simulate the client's direct upload to storage
+    target = tmp_path / 'storage' / 'images' / f'event_{event.event_id}.png'
+    target.parent.mkdir(parents=True)
+    from PIL import Image
+    Image.new('RGB', (40, 30)).save(target, 'PNG')
+    
+    response = client.post(f'{url}/finalize', json={'key': upload['key']}, headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['event']['image'] == f'http://cdn.test/{upload["key"]}'
+    db.session.expire_all()
+    assert db.session.get(Event, event.event_id).image_status == 'ready'
+    image_variant_executor.drain(timeout=10)
+
+
+def test_image_variants_generated_and_served(app, tmp_path):
+    """Stored images get resized WebP/JPEG variants used by the detail payload"""
+    import io
+    from PIL import Image
+    from app.models.event import Event
+    from app.services.event_service import EventService, image_variant_executor
+    from app.utils.storage import get_storage
+    from datetime import datetime
+    
+    app.config['LOCAL_STORAGE_DIR'] = str(tmp_path / 'storage')
+    app.config['LOCAL_STORAGE_URL'] = 'http://cdn.test'
+    source = tmp_path / 'poster.png'
+    Image.new('RGBA', (900, 600), (200, 30, 30, 128)).save(source)
+    image_url = get_storage().upload_file(str(source), 'images/event_1.png', 'image/png')
+    
+    event = Event(name='Show', start_time=datetime(2026, 11, 20), venue_name='Hall',
+                  approved='approved', image_url=image_url, image_status='ready')
+    db.session.add(event)
+    db.session.commit()
+    
+    image_variant_executor.submit(EventService.generate_image_variants, event.event_id).result(timeout=10)
+    
+    db.session.expire_all()
+    variants = db.session.get(Event, event.event_id).image_variants
+    assert sorted(variants) == ['jpg', 'webp']
+    # Never upscaled: the 900px original stands in for the 1280px target
+    assert sorted(variants['webp'], key=int) == ['320', '640', '900']
+    with Image.open(tmp_path / 'storage' / variants['jpg']['900']) as large:
+        assert large.size == (900, 600)
+    with Image.open(tmp_path / 'storage' / variants['webp']['320']) as small:
+        assert small.format == 'WEBP' and small.size == (320, 213)
+    
+    payload = EventService.get_event_detail(event.event_id)['event']
+    assert payload['image'] == f"http://cdn.test/{variants['jpg']['900']}"
+    assert f"http://cdn.test/{variants['webp']['640']} 640w" in payload['imageSrcset']['webp']
+
+
+def test_narrow_image_gets_one_variant_at_its_own_width(tmp_path):
+    """A source narrower than 640px is stored once, labelled with its real
+    width, instead of as identical copies under the 640 and 1280 labels"""
+    from PIL import Image
+    from app.utils.images import render_variants
+    
+    source = tmp_path / 'poster.jpg'
+    Image.new('RGB', (500, 250), (20, 120, 200)).save(source)
+    
+    rendered = render_variants(str(source), str(tmp_path), 'poster')
+    
+    assert sorted({width for width, *_ in rendered}) == [320, 500]
+    assert len(rendered) == 4
+    for width, fmt, path, content_type in rendered:
+        with Image.open(path) as variant:
+            assert variant.size == {320: (320, 160), 500: (500, 250)}[width]
+    assert not list(tmp_path.glob('poster_640.*')) and not list(tmp_path.glob('poster_1280.*'))
+
+
+def test_relevance_cursor_keeps_tied_scores(pg_app):
+    """Events tied on a search score are neither skipped nor repeated across pages"""
+    from app.models.event import Event
+    from app.services.event_service import EventService
+    
+    events = [
+        Event(name='Rockfest', start_time=datetime(2026, 11, 20), venue_name='Hall', approved='approved')
+        for _ in range(5)
+    ]
+    for event in events:
+        event.refresh_search_document()
+    db.session.add_all(events)
+    db.session.commit()
+    # 5 of the query's 6 trigrams match: a score float4 cannot hold exactly
+    scores = db.session.execute(text(
+        "SELECT DISTINCT word_similarity('rockf', search_document) FROM events"
+    )).scalars().all()
+    assert len(scores) == 1 and 0 < scores[0] < 1
+    
+    seen, cursor = [], None
+    while True:
+        page = EventService._query_events(**EventService._catalog_query(search='rockf', limit=2, cursor=cursor))
+        seen += [row['id'] for row in page['events']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    
+    assert seen == sorted((event.event_id for event in events), reverse=True)
@@ -0,0 +1,135 @@
+# Tests for the pooled, circuit-broken payment gateway client
+import json
+import threading
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.utils import metrics
+from app.utils.payment.gateway import CircuitBreaker, CircuitOpen, GatewayClient, GatewayError
+
+
+class GatewaySimulator:
+    """Local gateway answering POSTs normally, slowly or with HTTP 500"""
+
+    def __init__(self):
+        self.mode = 'ok'
+        self.delay = 0
+        self.requests = 0
+        self.connections = 0
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                simulator.connections += 1
+
+            def do_POST(self):
+                simulator.requests += 1
+                self.rfile.read(int(self.headers['Content-Length']))
+                if simulator.mode == 'slow':
+                    time.sleep(simulator.delay)
+                status = 500 if simulator.mode == 'error' else 200
+                body = json.dumps({'resultCode': 0 if status == 200 else 99}).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def simulator():
+    simulator = GatewaySimulator()
+    yield simulator
+    simulator.close()
+
+
+@pytest.fixture
+def gateway(simulator):
+    metrics.reset()
+    client = GatewayClient('sim', simulator.url, read_timeout=0.2, connect_timeout=0.2,
+                           breaker=CircuitBreaker('sim', failures=3, reset_timeout=0.2))
+    yield client
+    client.close()
+
+
+def test_connections_are_kept_alive(simulator, gateway):
+    """Sequential calls reuse one pooled connection"""
+    for _ in range(5):
+        assert gateway.post_json('/create', {'amount': 1}) == {'resultCode': 0}
+    
+    assert (simulator.requests, simulator.connections) == (5, 1)
+    histogram = metrics.snapshot()['histograms']['gateway.sim.post']
+    assert histogram['count'] == 5
+
+
+def test_slow_gateway_hits_the_read_timeout(simulator, gateway):
+    """A call never waits much longer than the read timeout"""
+    simulator.mode, simulator.delay = 'slow', 1
+    
+    started = time.perf_counter()
+    with pytest.raises(GatewayError):
+        gateway.post_json('/create', {'amount': 1})
+    assert time.perf_counter() - started < 0.8
+    assert metrics.get_counter('gateway.sim.error') == 1
+
+
+def test_breaker_fails_fast_and_recovers(simulator, gateway):
+    """Consecutive failures open the circuit; one trial call closes it"""
+    simulator.mode = 'error'
+    for _ in range(3):
+        with pytest.raises(GatewayError):
+            gateway.post_json('/create', {'amount': 1})
+    assert gateway.breaker.state == 'open'
+    
+    with pytest.raises(CircuitOpen):
+        gateway.post_json('/create', {'amount': 1})
+    assert simulator.requests == 3
+    
+    time.sleep(0.25)
+    assert gateway.breaker.state == 'half_open'
+    simulator.mode = 'ok'
+    assert gateway.post_json('/create', {'amount': 1}) == {'resultCode': 0}
+    assert gateway.breaker.state == 'closed'
+
+
+def test_failed_trial_reopens_the_circuit(simulator, gateway):
+    """Only one probe goes out while half-open; if it fails the circuit reopens"""
+    simulator.mode = 'error'
+    for _ in range(3):
+        with pytest.raises(GatewayError):
+            gateway.post_json('/create', {'amount': 1})
+    time.sleep(0.25)
+    
+    with pytest.raises(GatewayError):
+        gateway.post_json('/create', {'amount': 1})
+    assert gateway.breaker.state == 'open'
+    assert simulator.requests == 4
+
+
+def test_rejections_do_not_count_against_the_gateway(gateway):
+    """Errors the caller marks as non-failures (e.g. HTTP 4xx) keep it closed"""
+    def rejected():
+        raise ValueError('order code already exists')
+    
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            gateway.call('create_link', rejected, is_failure=lambda exc: False)
+    assert gateway.breaker.state == 'closed'
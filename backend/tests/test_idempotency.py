@@ -0,0 +1,87 @@
+# Test cases for Idempotency-Key handling
+import json
+import pytest
+from flask import jsonify, request
+from app.utils.idempotency import idempotent, IDEMPOTENCY_HEADER, REPLAYED_HEADER
+
+pytestmark = pytest.mark.usefixtures('fake_redis')
+
+
+@pytest.fixture
+def app(app):
+    """Application with a counting idempotent test route"""
+    app.calls = []
+    
+    @idempotent('test')
+    def create():
+        app.calls.append(request.get_json())
+        if request.get_json().get('fail'):
+            return jsonify({'success': False}), request.get_json()['fail']
+        return jsonify({'success': True, 'id': len(app.calls)}), 201
+    
+    app.add_url_rule('/test/create', 'create', create, methods=['POST'])
+    return app
+
+
+def _post(client, body, key='key-1'):
+    headers = {IDEMPOTENCY_HEADER: key} if key else {}
+    return client.post('/test/create', json=body, headers=headers)
+
+
+def test_replays_stored_response(app, client):
+    first = _post(client, {'seat': 1})
+    again = _post(client, {'seat': 1})
+    
+    assert (first.status_code, again.status_code) == (201, 201)
+    assert again.get_json() == first.get_json()
+    assert again.headers[REPLAYED_HEADER] == 'true'
+    assert len(app.calls) == 1
+    
+    # Without the header every request runs
+    _post(client, {'seat': 1}, key=None)
+    assert len(app.calls) == 2
+
+
+def test_rejects_key_reuse_with_other_body(app, client):
+    _post(client, {'seat': 1})
+    assert _post(client, {'seat': 2}).status_code == 422
+    assert len(app.calls) == 1
+
+
+def test_blocks_duplicate_while_in_flight(app, client, fake_redis):
+    import hashlib
+    from app.utils import idempotency
+    
+    with app.test_request_context('/test/create', method='POST', json={'seat': 1}):
+        fingerprint = idempotency._fingerprint()
+    key = f"idem:test:anonymous:{hashlib.sha256(b'key-1').hexdigest()}"
+    fake_redis.set(key, json.dumps({'state': 'in_flight', 'fp': fingerprint}))
+    
+    response = _post(client, {'seat': 1})
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+    assert app.calls == []
+
+
+def test_server_errors_are_not_stored(app, client):
+    assert _post(client, {'fail': 500}).status_code == 500
+    assert _post(client, {'fail': 500}).status_code == 500
+    assert len(app.calls) == 2
+
+
+@pytest.mark.parametrize('status', [409, 401])
+def test_transient_client_errors_are_not_stored(app, client, status):
+    """A retry after e.g. 409 PaymentInProgress runs again instead of
+    replaying the conflict for a day"""
+    assert _post(client, {'fail': status}).status_code == status
+    again = _post(client, {'fail': status})
+    assert (again.status_code, REPLAYED_HEADER in again.headers) == (status, False)
+    assert len(app.calls) == 2
+
+
+def test_final_client_errors_are_replayed(app, client):
+    assert _post(client, {'fail': 400}).status_code == 400
+    again = _post(client, {'fail': 400})
+    assert (again.status_code, again.headers[REPLAYED_HEADER]) == (400, 'true')
+    assert len(app.calls) == 1
+
@@ -0,0 +1,49 @@
+# Test cases for the flash-sale inventory gate
+import threading
+import pytest
+from app.utils.inventory_gate import LocalInventoryGate, CountersMissing
+
+
+def test_reserve_is_all_or_nothing():
+    gate = LocalInventoryGate()
+    gate.load({1: 5, 2: 1})
+    
+    assert gate.reserve({1: 2, 2: 2}) == 2
+    assert (gate.get(1), gate.get(2)) == (5, 1)
+    assert gate.reserve({1: 2, 2: 1}) is None
+    assert (gate.get(1), gate.get(2)) == (3, 0)
+    
+    gate.release({1: 2, 2: 1})
+    assert (gate.get(1), gate.get(2)) == (5, 1)
+
+
+def test_missing_counter_must_be_rebuilt():
+    gate = LocalInventoryGate()
+    gate.load({1: 5})
+    with pytest.raises(CountersMissing) as exc:
+        gate.reserve({1: 1, 7: 1})
+    assert exc.value.ticket_id == 7
+    
+    # Releasing never creates a counter; a non-overwriting load keeps live ones
+    gate.release({7: 3})
+    assert gate.get(7) is None
+    gate.load({1: 99, 7: 2}, overwrite=False)
+    assert (gate.get(1), gate.get(7)) == (5, 2)
+
+
+def test_concurrent_reservations_never_oversell():
+    gate = LocalInventoryGate()
+    gate.load({1: 100})
+    results = []
+    
+    def buyer():
+        results.append(gate.reserve({1: 1}))
+    
+    threads = [threading.Thread(target=buyer) for _ in range(300)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert results.count(None) == 100
+    assert gate.get(1) == 0
@@ -0,0 +1,141 @@
+# Tests for the transactional mail outbox
+from datetime import datetime, timedelta
+import pytest
+from app.extensions import db
+from app.models.notification import OutboundEmail
+from app.models.user import User
+from app.services.mail_service import MailService
+from app.utils import metrics
+from app.utils.mail import outbox, sender
+from app.utils.mail.sink import LocalSMTPSink
+
+pytestmark = pytest.mark.usefixtures('fake_redis')
+
+
+@pytest.fixture(autouse=True)
+def buyer(app):
+    db.session.add(User(email='buyer@example.com', password_hash='x', full_name='Buyer'))
+    db.session.commit()
+    metrics.reset()
+
+
+@pytest.fixture
+def sink():
+    sink = LocalSMTPSink()
+    yield sink
+    sink.close()
+
+
+@pytest.fixture
+def pool(sink):
+    pool = MailService.pool(1, host=sink.host, port=sink.port, user='mailer', password='secret',
+                            starttls=False, timeout=2)
+    yield pool
+    pool.close()
+
+
+def _queue(*numbers):
+    for n in numbers:
+        outbox.enqueue(sender.build_booking_confirmation_email(f'buyer{n}@example.com', 'Concert', n))
+
+
+def _statuses():
+    return [mail.status for mail in OutboundEmail.query.order_by(OutboundEmail.mail_id)]
+
+
+def test_burst_shares_one_authenticated_session(app, sink, pool):
+    """A batch pays the connect and LOGIN once per session, not per message"""
+    _queue(*range(10))
+    assert MailService.outbox_status()[0]['queueDepth'] == 10
+
+    assert MailService.send_batch(pool) == 10
+
+    assert sink.recipients() == [f'buyer{n}@example.com' for n in range(10)]
+    assert (sink.connections, sink.logins) == (1, 1)
+    assert _statuses() == ['sent'] * 10
+    assert metrics.snapshot()['histograms']['mail.send']['count'] == 10
+    status, _ = MailService.outbox_status()
+    assert (status['queueDepth'], status['failedLastDay']) == (0, 0)
+
+
+def test_reconnects_when_the_server_drops_the_session(app, sink, pool):
+    sink.drop_after = 3
+    _queue(*range(7))
+
+    MailService.send_batch(pool)
+
+    assert len(sink.messages) == 7
+    assert sink.connections == 3
+    assert _statuses() == ['sent'] * 7
+
+
+def test_failed_delivery_is_retried_later_then_given_up(app, sink, pool, monkeypatch):
+    monkeypatch.setattr(outbox, 'MAIL_MAX_ATTEMPTS', 2)
+    _queue(1)
+    sink.close()
+
+    assert MailService.send_batch(pool) == 1
+    mail = OutboundEmail.query.one()
+    assert (mail.status, mail.attempts) == ('pending', 1)
+    assert mail.available_at > datetime.utcnow()
+    # Not due yet: the outage gets its backoff instead of a busy loop
+    assert MailService.send_batch(pool) == 0
+
+    mail.available_at = datetime.utcnow()
+    db.session.commit()
+    MailService.send_batch(pool)
+
+    mail = OutboundEmail.query.one()
+    assert (mail.status, mail.attempts) == ('failed', 2)
+    assert 'Connection' in mail.last_error
+    assert metrics.get_counter('mail.failed') == 1
+    status, _ = MailService.outbox_status()
+    assert status['failedLastDay'] == 1
+    assert status['recentFailures'][0]['recipient'] == 'buyer1@example.com'
+
+
+def test_rejected_recipient_fails_at_once(app, sink, pool):
+    sink.rejected = {'buyer2@example.com'}
+    _queue(1, 2)
+
+    MailService.send_batch(pool)
+
+    assert _statuses() == ['sent', 'failed']
+    assert OutboundEmail.query.filter_by(status='failed').one().attempts == 1
+
+
+def test_mail_of_a_dead_sender_is_claimed_after_the_lease(app):
+    _queue(1)
+    (mail_id,) = MailService.claim_batch(10)
+    assert MailService.claim_batch(10) == []
+
+    mail = db.session.get(OutboundEmail, mail_id)
+    mail.claimed_at = datetime.utcnow() - timedelta(seconds=outbox.MAIL_LEASE_SECONDS + 1)
+    db.session.commit()
+
+    assert MailService.claim_batch(10) == [mail_id]
+    assert db.session.get(OutboundEmail, mail_id).attempts == 2
+
+
+def test_forgot_password_stores_the_otp_for_the_sender(app, sink, pool):
+    """The request only writes the outbox; the mail survives a web worker
+    restart and goes out with the next batch"""
+    response = app.test_client().get('/api/auth/forgot-password?email=buyer@example.com')
+    assert response.status_code == 200
+    assert sink.messages == []
+    assert OutboundEmail.query.one().recipient == 'buyer@example.com'
+
+    MailService.send_batch(pool)
+
+    (_, recipients, message), = sink.messages
+    assert recipients == ['buyer@example.com']
+    assert message['Subject'] == 'Your One-Time Password (OTP)'
+
+
+def test_forgot_password_with_full_outbox_is_503(app, monkeypatch):
+    monkeypatch.setattr(outbox, 'MAIL_QUEUE_SIZE', 0)
+
+    response = app.test_client().get('/api/auth/forgot-password?email=buyer@example.com')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert OutboundEmail.query.count() == 0
@@ -0,0 +1,131 @@
+# Tests for event notification campaigns
+from datetime import datetime, timedelta
+import pytest
+from app.extensions import db
+from app.models.booking import Booking
+from app.models.event import Event
+from app.models.notification import CampaignRecipient, NotificationCampaign
+from app.models.user import User
+from app.services.event_service import EventService
+from app.services.notification_service import NotificationService
+from app.utils.mail.outbox import SMTPPool
+from app.utils.mail.sink import LocalSMTPSink
+
+pytestmark = pytest.mark.usefixtures('fake_redis')
+
+START = datetime(2030, 5, 1, 19, 0)
+
+
+@pytest.fixture
+def event_id(app):
+    user = User(email='buyer@example.com', password_hash='x')
+    event = Event(name='Concert', start_time=START, venue_name='Hall A', address='1 Main St', approved='approved')
+    db.session.add_all([user, event])
+    db.session.flush()
+    for n in range(25):
+        db.session.add(Booking(user_id=user.user_id, event_id=event.event_id, booking_full_name=f'Buyer {n}',
+                               booking_email=f'buyer{n}@example.com', booking_phone='0900000000',
+                               status='confirmed'))
+    for status in ('pending', 'cancelled'):
+        db.session.add(Booking(user_id=user.user_id, event_id=event.event_id, booking_full_name='Other',
+                               booking_email=f'{status}@example.com', booking_phone='0900000000', status=status))
+    db.session.commit()
+    return event.event_id
+
+
+@pytest.fixture
+def sink():
+    sink = LocalSMTPSink()
+    yield sink
+    sink.close()
+
+
+@pytest.fixture
+def pool(sink):
+    pool = SMTPPool(3, host=sink.host, port=sink.port, starttls=False, retry_delay=0, timeout=2)
+    yield pool
+    pool.close()
+
+
+def _run(campaign_id, pool, **options):
+    claim = NotificationService.claim_campaign(campaign_id)
+    assert claim is not None
+    return NotificationService.run_campaign(*claim, pool=pool, **options)
+
+
+def test_campaign_streams_confirmed_bookings_in_batches(event_id, sink, pool):
+    campaign_id = NotificationService.create_campaign(event_id, 'reminder', dedupe_key=START.isoformat())
+    reports = []
+
+    result = _run(campaign_id, pool, batch_size=10, progress=reports.append)
+
+    assert sorted(sink.recipients()) == sorted(f'buyer{n}@example.com' for n in range(25))
+    assert sink.connections <= 3
+    assert [report['sent'] for report in reports] == [10, 20, 25]
+    assert (result['status'], result['total'], result['sent'], result['failed'], result['percent']) == ('done', 25, 25, 0, 100.0)
+    assert CampaignRecipient.query.filter_by(campaign_id=campaign_id, status='sent').count() == 25
+    _, _, message = sink.messages[0]
+    assert message['Subject'] == 'Reminder: Concert starts at 19:00 01/05/2030'
+    assert 'Hall A, 1 Main St' in message.get_content()
+
+
+def test_failed_recipients_are_recorded(event_id, sink, pool):
+    sink.rejected = {'buyer3@example.com'}
+    campaign_id = NotificationService.create_campaign(event_id, 'reminder', dedupe_key=START.isoformat())
+
+    result = _run(campaign_id, pool)
+
+    assert (result['sent'], result['failed']) == (24, 1)
+    failed = CampaignRecipient.query.filter_by(campaign_id=campaign_id, status='failed').one()
+    assert failed.email == 'buyer3@example.com'
+    assert '550' in failed.error
+
+
+def test_interrupted_campaign_resumes_after_its_checkpoint(app, event_id, sink, pool):
+    campaign_id = NotificationService.create_campaign(event_id, 'reminder', dedupe_key=START.isoformat())
+
+    def crash(progress):
+        raise RuntimeError('worker killed')
+    with pytest.raises(RuntimeError):
+        _run(campaign_id, pool, batch_size=10, progress=crash)
+    assert len(sink.messages) == 10
+
+    # Still leased to the dead runner
+    assert NotificationService.claim_campaign(campaign_id) is None
+    campaign = db.session.get(NotificationCampaign, campaign_id)
+    campaign.claimed_at -= timedelta(seconds=app.config['NOTIFICATION_LEASE'] + 1)
+    db.session.commit()
+
+    result = _run(campaign_id, pool, batch_size=10)
+
+    assert result['sent'] == 25
+    assert sorted(sink.recipients()) == sorted(f'buyer{n}@example.com' for n in range(25))
+
+
+def test_reminders_are_scheduled_once_per_start_time(event_id, sink, pool):
+    now = START - timedelta(hours=3)
+    assert NotificationService.schedule_reminders(now) == 1
+    assert NotificationService.schedule_reminders(now) == 0
+
+    # Rescheduled before the reminder went out: the old one is skipped
+    event = db.session.get(Event, event_id)
+    event.start_time = START + timedelta(hours=1)
+    db.session.commit()
+    assert NotificationService.schedule_reminders(now) == 1
+
+    results = NotificationService.send_pending_campaigns(pool=pool)
+
+    assert [result['sent'] for result in results] == [0, 25]
+    assert len(sink.messages) == 25
+
+
+def test_update_event_announces_time_and_venue_changes(event_id, sink, pool):
+    EventService.update_event(event_id, {'date': '2030-05-02', 'time': '20:00', 'location': 'Hall B'})
+    EventService.update_event(event_id, {'description': 'Same time and place'})
+
+    campaign = NotificationCampaign.query.filter_by(event_id=event_id).one()
+    assert campaign.kind == 'change'
+    assert NotificationService.send_pending_campaigns(pool=pool)[0]['sent'] == 25
+    body = sink.messages[0][2].get_content()
+    assert 'Time: 19:00 01/05/2030 -> 20:00 02/05/2030' in body
+    assert 'Venue: Hall A -> Hall B' in body
@@ -0,0 +1,27 @@
+# Test cases for cursor pagination helpers
+import pytest
+from datetime import datetime
+from app.utils.pagination import encode_cursor, decode_cursor
+
+
+def test_cursor_round_trip():
+    """A cursor decodes back to the sort value and id it was built from"""
+    created_at = datetime(2025, 12, 1, 10, 30, 15, 123456)
+    token = encode_cursor('newest', created_at, 42)
+    
+    assert decode_cursor(token, 'newest') == (created_at, 42)
+
+
+def test_cursor_rejects_other_sort():
+    """A cursor issued for one sort order cannot be replayed on another"""
+    token = encode_cursor('newest', datetime(2025, 12, 1), 7)
+    
+    with pytest.raises(ValueError):
+        decode_cursor(token, 'upcoming')
+
+
+@pytest.mark.parametrize('token', ['', 'not-a-cursor', 'eyJzIjoibmV3ZXN0In0'])
+def test_cursor_rejects_garbage(token):
+    """Malformed tokens raise ValueError instead of reaching the database"""
+    with pytest.raises(ValueError):
+        decode_cursor(token, 'newest')
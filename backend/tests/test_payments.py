@@ -0,0 +1,299 @@
+# Tests for the two-phase PayOS checkout and the webhook inbox
+import json
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from app.extensions import db
+from app.models.booking import Booking, TicketHold
+from app.models.event import Event, Ticket
+from app.models.payment import Payment, PaymentWebhookEvent
+from app.models.user import User
+from app.services.booking_service import BookingService
+from app.services.inventory_service import InventoryService
+from app.services.payment_service import PaymentService, PaymentGatewayError, PaymentInProgress, ORDER_CODE_STRIDE
+from app.utils.payment.payos_payment import get_client, PAYOS_CHECKOUT_URL
+
+
+@pytest.fixture
+def booking(app):
+    """A pending booking holding two GA tickets"""
+    user = User(email='buyer@example.com', password_hash='x')
+    event = Event(name='Show', start_time=datetime(2026, 11, 20), venue_name='Hall')
+    db.session.add_all([user, event])
+    db.session.flush()
+    ticket = Ticket(name='GA', price=100, quantity=5, event_id=event.event_id)
+    db.session.add(ticket)
+    InventoryService.refresh_event_summary(event.event_id)
+    db.session.commit()
+    ticket_id = ticket.ticket_id
+    result, status_code = BookingService.create_booking(
+        user.user_id, event.event_id, [{'ticket_id': ticket_id, 'quantity': 2}],
+        'Buyer', 'buyer@example.com', '0900000000'
+    )
+    assert status_code == 201
+    return result['booking_id'], ticket_id
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    """Fake PayOS links; records whether a transaction was open during creation.
+    With ``created_before_error`` the link exists even though the call failed."""
+    calls = []
+    links = {}
+    
+    def create_link(order_code, amount, hold_expiry):
+        calls.append({'order_code': order_code, 'in_transaction': db.session().in_transaction()})
+        if order_code in links:
+            raise ValueError('Đơn thanh toán đã tồn tại')
+        if gateway.created_before_error or not gateway.error:
+            links[order_code] = SimpleNamespace(id=f"link{order_code}", status='PENDING', amount=amount)
+        if gateway.error:
+            raise gateway.error
+        return f"https://pay.example/{order_code}"
+    
+    gateway.error = None
+    gateway.created_before_error = False
+    gateway.calls = calls
+    gateway.links = links
+    monkeypatch.setattr(PaymentService, '_request_payment_link', staticmethod(create_link))
+    monkeypatch.setattr(PaymentService, '_gateway_link', staticmethod(links.get))
+    return gateway
+
+
+def _checkout(booking_id, ticket_id):
+    return PaymentService.create_payos_payment(booking_id, 200, [{'ticket_id': ticket_id, 'quantity': 2}])
+
+
+def test_gateway_is_called_outside_the_transaction(booking, gateway):
+    """The pending payment is committed before PayOS is called"""
+    booking_id, ticket_id = booking
+    
+    result = _checkout(booking_id, ticket_id)
+    
+    assert result == {'payment_url': f"https://pay.example/{booking_id + 10000}", 'order_code': booking_id + 10000}
+    assert gateway.calls == [{'order_code': booking_id + 10000, 'in_transaction': False}]
+    payment = Payment.query.filter_by(transaction_id=booking_id + 10000).one()
+    assert (payment.payment_status, payment.checkout_url) == ('pending', result['payment_url'])
+    
+    # A retry resumes the recorded link without calling PayOS again
+    assert _checkout(booking_id, ticket_id) == result
+    assert len(gateway.calls) == 1
+
+
+def test_gateway_failure_releases_the_reservation(booking, gateway):
+    """A failed call gives the payment up; the booking can retry"""
+    booking_id, ticket_id = booking
+    gateway.error = TimeoutError('read timed out')
+    
+    with pytest.raises(PaymentGatewayError):
+        _checkout(booking_id, ticket_id)
+    
+    payment = Payment.query.filter_by(transaction_id=booking_id + 10000).one()
+    assert payment.payment_status == 'failed'
+    # The inventory hold is kept for the retry
+    assert TicketHold.query.filter_by(booking_id=booking_id).one().status == 'active'
+    
+    # PayOS never made the link, so the retry moves to a fresh order code
+    gateway.error = None
+    order_code = booking_id + 10000 + ORDER_CODE_STRIDE
+    assert _checkout(booking_id, ticket_id) == {'payment_url': f"https://pay.example/{order_code}",
+                                                 'order_code': order_code}
+    assert Payment.query.filter_by(booking_id=booking_id).one().payment_status == 'pending'
+
+
+def test_retry_reuses_a_link_created_before_the_timeout(fake_redis, booking, gateway):
+    """PayOS made the link but the call timed out: the retry takes that link
+    instead of re-sending an order code PayOS rejects as a duplicate"""
+    booking_id, ticket_id = booking
+    gateway.error = TimeoutError('read timed out')
+    gateway.created_before_error = True
+    with pytest.raises(PaymentGatewayError):
+        _checkout(booking_id, ticket_id)
+    
+    gateway.error = None
+    result = _checkout(booking_id, ticket_id)
+    
+    assert result == {'payment_url': f"{PAYOS_CHECKOUT_URL}/link{booking_id + 10000}", 'order_code': booking_id + 10000}
+    assert len(gateway.calls) == 1
+    
+    # A link the buyer cancelled is not reused; webhooks find the new code
+    payment = Payment.query.filter_by(booking_id=booking_id).one()
+    payment.payment_status = 'failed'
+    payment.checkout_url = None
+    db.session.commit()
+    gateway.links[booking_id + 10000].status = 'CANCELLED'
+    order_code = _checkout(booking_id, ticket_id)['order_code']
+    assert order_code == booking_id + 10000 + ORDER_CODE_STRIDE
+    PaymentService.handle_webhook(_webhook(order_code))
+    PaymentService.process_webhook_events()
+    assert db.session.get(Booking, booking_id).status == 'confirmed'
+
+
+def test_repeated_takeovers_keep_order_codes_in_range(booking, gateway):
+    """Each cancelled checkout moves the booking ORDER_CODE_STRIDE further;
+    the columns holding order codes must outgrow int4 for that"""
+    booking_id, ticket_id = booking
+    for attempt in range(5):
+        order_code = _checkout(booking_id, ticket_id)['order_code']
+        assert order_code == booking_id + 10000 + attempt * ORDER_CODE_STRIDE
+        payment = Payment.query.filter_by(booking_id=booking_id).one()
+        payment.payment_status = 'failed'
+        payment.checkout_url = None
+        db.session.commit()
+        gateway.links[order_code].status = 'CANCELLED'
+    
+    assert order_code > 2 ** 31 - 1
+    assert order_code <= 2 ** 53 - 1
+    for column in (Payment.__table__.c.transaction_id, PaymentWebhookEvent.__table__.c.order_code):
+        assert isinstance(column.type, db.BigInteger)
+    
+    PaymentService.handle_webhook(_webhook(order_code))
+    assert PaymentWebhookEvent.query.one().order_code == order_code
+    assert Payment.query.filter_by(transaction_id=order_code).one().booking_id == booking_id
+
+
+def test_concurrent_checkout_is_rejected_while_in_flight(booking, gateway):
+    """A second attempt while the first is still at the gateway gets a conflict"""
+    booking_id, ticket_id = booking
+    PaymentService.reserve_payment(booking_id, 200, [{'ticket_id': ticket_id, 'quantity': 2}])
+    
+    with pytest.raises(PaymentInProgress):
+        _checkout(booking_id, ticket_id)
+    assert gateway.calls == []
+
+
+def _webhook(order_code, code='00', signature=None):
+    """A PayOS webhook body signed with the test checksum key"""
+    data = {
+        'orderCode': order_code, 'amount': 200, 'description': 'Thanh toan', 'accountNumber': '0000',
+        'reference': 'FT1', 'transactionDateTime': '2026-10-18 10:00:00', 'currency': 'VND',
+        'paymentLinkId': 'link', 'code': code, 'desc': 'success',
+        'counterAccountBankId': None, 'counterAccountBankName': None, 'counterAccountName': None,
+        'counterAccountNumber': None, 'virtualAccountName': None, 'virtualAccountNumber': None
+    }
+    return json.dumps({
+        'code': '00', 'desc': 'success', 'success': True, 'data': data,
+        'signature': signature or get_client().crypto.create_signature_from_object(data, get_client().checksum_key)
+    })
+
+
+def test_webhook_is_stored_once_and_acknowledged(app, booking, gateway):
+    """Verified webhooks go to the inbox; retries and forgeries do not"""
+    booking_id, ticket_id = booking
+    order_code = _checkout(booking_id, ticket_id)['order_code']
+    http = app.test_client()
+    
+    response = http.post('/api/webhook', data=_webhook(order_code), content_type='application/json')
+    assert (response.status_code, response.get_json()['duplicate']) == (200, False)
+    response = http.post('/api/webhook', data=_webhook(order_code), content_type='application/json')
+    assert (response.status_code, response.get_json()['duplicate']) == (200, True)
+    response = http.post('/api/webhook', data=_webhook(order_code + 1, signature='0' * 64),
+                         content_type='application/json')
+    assert response.status_code == 400
+    
+    event = PaymentWebhookEvent.query.one()
+    assert (event.order_code, event.status) == (order_code, 'pending')
+    # Nothing is applied until a worker runs
+    assert Payment.query.filter_by(transaction_id=order_code).one().payment_status == 'pending'
+
+
+def test_workers_apply_inbox_events(fake_redis, booking, gateway):
+    """Workers confirm paid orders and park unknown ones"""
+    booking_id, ticket_id = booking
+    order_code = _checkout(booking_id, ticket_id)['order_code']
+    PaymentService.handle_webhook(_webhook(order_code))
+    PaymentService.handle_webhook(_webhook(123))
+    
+    assert PaymentService.process_webhook_events() == 2
+    assert PaymentService.process_webhook_events() == 0
+    
+    statuses = {event.order_code: event.status for event in PaymentWebhookEvent.query}
+    assert statuses == {order_code: 'done', 123: 'ignored'}
+    assert db.session.get(Booking, booking_id).status == 'confirmed'
+    assert db.session.get(Ticket, ticket_id).quantity == 3
+
+
+def test_return_page_only_queues_what_payos_confirms(app, fake_redis, booking, gateway, monkeypatch):
+    """A forged success notice cannot confirm an unpaid booking"""
+    booking_id, ticket_id = booking
+    order_code = _checkout(booking_id, ticket_id)['order_code']
+    gateway_status = ['PENDING']
+    monkeypatch.setattr(PaymentService, '_gateway_status', staticmethod(lambda code: gateway_status[0]))
+    http = app.test_client()
+    body = {'data': {'orderCode': order_code}}
+    
+    response = http.post('/api/success-payment', json=body)
+    assert response.get_json() == {'orderId': order_code, 'status': 'pending', 'gatewayStatus': 'PENDING'}
+    assert PaymentWebhookEvent.query.count() == 0
+    assert db.session.get(Booking, booking_id).status == 'pending'
+    
+    gateway_status[0] = 'PAID'
+    assert http.post('/api/success-payment', json=body).get_json()['status'] == 'processing'
+    # Still not applied by the request itself, and queued only once
+    assert http.post('/api/success-payment', json=body).status_code == 200
+    assert db.session.get(Booking, booking_id).status == 'pending'
+    assert PaymentWebhookEvent.query.count() == 1
+    
+    PaymentService.process_webhook_events()
+    assert db.session.get(Booking, booking_id).status == 'confirmed'
+    assert http.post('/api/success-payment', json=body).get_json()['status'] == 'completed'
+    assert http.post('/api/success-payment', json={'data': {'orderCode': 1}}).status_code == 404
+
+
+def test_failed_events_are_retried_with_backoff(app, booking, gateway, monkeypatch):
+    """A transient failure puts the event back with a delay"""
+    booking_id, ticket_id = booking
+    order_code = _checkout(booking_id, ticket_id)['order_code']
+    PaymentService.handle_webhook(_webhook(order_code))
+    
+    def unavailable(order_id):
+        raise RuntimeError('database unavailable')
+    
+    monkeypatch.setattr(PaymentService, 'success_payment', staticmethod(unavailable))
+    assert PaymentService.process_webhook_events() == 1
+    event = PaymentWebhookEvent.query.one()
+    assert (event.status, event.attempts, event.last_error) == ('pending', 1, 'database unavailable')
+    assert event.available_at > datetime.utcnow()
+    # Not due yet
+    assert PaymentService.process_webhook_events() == 0
+    
+    event.available_at = datetime.utcnow()
+    event.attempts = app.config['WEBHOOK_MAX_ATTEMPTS'] - 1
+    db.session.commit()
+    assert PaymentService.process_webhook_events() == 1
+    assert PaymentWebhookEvent.query.one().status == 'failed'
+
+
+def test_reconcile_applies_gateway_statuses(fake_redis, booking, monkeypatch):
+    """Stuck payments follow PayOS; open links are leased until the next check"""
+    from datetime import timedelta
+    booking_id, ticket_id = booking
+    event_id = db.session.get(Booking, booking_id).event_id
+    user_id = db.session.get(Booking, booking_id).user_id
+    booking_ids = [booking_id] + [
+        BookingService.create_booking(user_id, event_id, [{'ticket_id': ticket_id, 'quantity': 1}],
+                                      'Buyer', 'buyer@example.com', '0900000000')[0]['booking_id']
+        for _ in range(3)
+    ]
+    stale = datetime.utcnow() - timedelta(hours=1)
+    for index, pending_id in enumerate(booking_ids):
+        db.session.add(Payment(booking_id=pending_id, amount=100, payment_method='payos', payment_status='pending',
+                               transaction_id=pending_id + 10000, created_at=stale if index else datetime.utcnow()))
+    db.session.commit()
+    gateway_statuses = dict(zip([pending_id + 10000 for pending_id in booking_ids],
+                                ['PAID', 'PAID', 'EXPIRED', 'PENDING']))
+    monkeypatch.setattr(PaymentService, '_gateway_status', staticmethod(lambda order_code: gateway_statuses[order_code]))
+    
+    stats = PaymentService.reconcile_pending_payments(older_than=600, batch_size=2, workers=2)
+    
+    assert {key: stats[key] for key in ('checked', 'paid', 'failed', 'pending', 'drifted')} == \
+        {'checked': 3, 'paid': 1, 'failed': 1, 'pending': 1, 'drifted': 2}
+    assert stats['max_drift_seconds'] >= 3600
+    statuses = [Payment.query.filter_by(transaction_id=pending_id + 10000).one().payment_status
+                for pending_id in booking_ids]
+    # The first payment is too recent to reconcile
+    assert statuses == ['pending', 'completed', 'failed', 'pending']
+    assert db.session.get(Booking, booking_ids[1]).status == 'confirmed'
+    
+    # The open link is leased: another run (or node) skips it
+    assert PaymentService.reconcile_pending_payments(older_than=600)['checked'] == 0
@@ -0,0 +1,98 @@
+# Tests for sliding-window rate limits and load shedding
+import time
+import pytest
+from redis.exceptions import RedisError
+from app.utils import metrics, rate_limit
+
+pytestmark = pytest.mark.usefixtures('fake_redis')
+
+
+@pytest.fixture
+def app_config():
+    return {
+        'RATE_LIMIT_ENABLED': True,
+        'RATE_LIMIT_LOGIN_IP': '100/60',
+        'RATE_LIMIT_LOGIN_EMAIL': '3/60',
+        'RATE_LIMIT_VERIFY_OTP_IP': '100/300',
+        'RATE_LIMIT_VERIFY_OTP_EMAIL': '5/300',
+        'RATE_LIMIT_BOOKING_IP': '2/60',
+    }
+
+
+def _login(client, email='buyer@example.com', ip='203.0.113.7'):
+    return client.post('/api/auth/login', json={'email': email, 'password': 'wrong'},
+                       headers={'X-Forwarded-For': ip})
+
+
+def test_login_is_limited_per_email(client, monkeypatch):
+    monkeypatch.setattr(rate_limit.time, 'time', lambda: 1000005.0)
+    assert [_login(client).status_code for _ in range(3)] == [401, 401, 401]
+
+    limited = _login(client)
+    assert limited.status_code == 429
+    # 15s left in this window, then until 4 * weight <= 3 in the next one
+    assert limited.headers['Retry-After'] == str(15 + 15)
+    assert limited.get_json()['retryAfter'] == int(limited.headers['Retry-After'])
+    # Other accounts are unaffected
+    assert _login(client, email='other@example.com').status_code == 401
+
+
+def test_verify_otp_guesses_are_limited_across_ips(client):
+    statuses = [
+        client.post('/api/auth/verify-otp', json={'email': 'buyer@example.com', 'otp': f'{n:06d}'},
+                    headers={'X-Forwarded-For': f'198.51.100.{n}'}).status_code
+        for n in range(6)
+    ]
+    assert statuses[:5] == [401] * 5
+    assert statuses[5] == 429
+
+
+def test_ip_is_the_hop_added_by_the_trusted_proxy(app, client):
+    for _ in range(2):
+        client.post('/api/bookings', json={}, headers={'X-Forwarded-For': '10.0.0.1, 203.0.113.7'})
+
+    # A forged leading entry does not make a new client...
+    forged = client.post('/api/bookings', json={}, headers={'X-Forwarded-For': '10.9.9.9, 203.0.113.7'})
+    assert forged.status_code == 429
+    # ...while a different client address does
+    other = client.post('/api/bookings', json={}, headers={'X-Forwarded-For': '203.0.113.8'})
+    assert other.status_code == 401
+
+
+def test_previous_window_is_weighted_by_its_overlap(app, client, monkeypatch):
+    app.config['RATE_LIMIT_LOGIN_EMAIL'] = '2/10'
+    clock = [1000005.0]
+    monkeypatch.setattr(rate_limit.time, 'time', lambda: clock[0])
+
+    assert [_login(client).status_code for _ in range(3)] == [401, 401, 429]
+    # 2s into the next window 80% of the last one still counts: 3 * 0.8 + 1 > 2
+    clock[0] = 1000012.0
+    assert _login(client).status_code == 429
+    # Once the busy window has slid out entirely the client may try again
+    clock[0] = 1000030.0
+    assert _login(client).status_code == 401
+
+
+def test_falls_back_to_local_counters_without_redis(client, fake_redis, monkeypatch):
+    metrics.reset()
+
+    def unavailable(transaction=True):
+        raise RedisError('connection refused')
+    monkeypatch.setattr(fake_redis, 'pipeline', unavailable)
+
+    statuses = [_login(client, email='fallback@example.com').status_code for _ in range(4)]
+
+    assert statuses == [401, 401, 401, 429]
+    assert metrics.get_counter('rate_limit.redis_error') == 4
+
+
+def test_requests_that_queued_too_long_are_shed(app, client):
+    app.config['LOAD_SHED_MAX_WAIT'] = 5
+    stale = client.post('/api/auth/login', json={'email': 'a@example.com', 'password': 'x'},
+                        headers={'X-Request-Start': f't={time.time() - 30:.3f}'})
+    fresh = client.post('/api/auth/login', json={'email': 'a@example.com', 'password': 'x'},
+                        headers={'X-Request-Start': f't={time.time():.3f}'})
+
+    assert stale.status_code == 503
+    assert stale.headers['Retry-After'] == '1'
+    assert fresh.status_code == 401
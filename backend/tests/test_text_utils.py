@@ -0,0 +1,32 @@
+# Test cases for text utilities
+from app.utils.text_utils import (
+    remove_vietnamese_tones, build_search_document, search_terms, highlight_snippet
+)
+
+
+def test_remove_vietnamese_tones():
+    """Tone stripping maps every toned character to its base letter"""
+    assert remove_vietnamese_tones('Hòa nhạc Đà Nẵng') == 'Hoa nhac Da Nang'
+    assert remove_vietnamese_tones(None) == ''
+
+
+def test_build_search_document():
+    """The search document is lowercased, tone-free and skips empty fields"""
+    document = build_search_document('Hòa  Nhạc', None, 'Nhà hát Lớn', '')
+    assert document == 'hoa nhac nha hat lon'
+
+
+def test_search_terms():
+    """Queries are normalized and de-duplicated"""
+    assert search_terms('  Nhạc   nhac HÒA ') == ['nhac', 'hoa']
+
+
+def test_highlight_snippet_preserves_original_text():
+    """Matches are accent-insensitive but the snippet keeps the original accents"""
+    snippet = highlight_snippet('Đêm hòa nhạc <b>mùa thu</b>', ['hoa', 'nhac'])
+    assert snippet == 'Đêm <mark>hòa</mark> <mark>nhạc</mark> &lt;b&gt;mùa thu&lt;/b&gt;'
+
+
+def test_highlight_snippet_without_match():
+    """No snippet is produced when no term matches"""
+    assert highlight_snippet('Triển lãm', ['nhac']) is None
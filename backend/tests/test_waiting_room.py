@@ -0,0 +1,101 @@
+# Test cases for the virtual waiting room
+import pytest
+from datetime import datetime
+from flask_jwt_extended import create_access_token
+from app.extensions import db
+from app.models.event import Event
+from app.utils import waiting_room
+
+pytestmark = pytest.mark.usefixtures('fake_redis')
+
+
+@pytest.fixture
+def app_config():
+    return {'WAITING_ROOM_RATE_CACHE_TTL': 0.001}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable wall clock for the waiting room"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(waiting_room.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def event(app):
+    event = Event(name='Show', start_time=datetime(2026, 11, 20), venue_name='Hall', approved='approved')
+    db.session.add(event)
+    db.session.commit()
+    return event
+
+
+def _auth(user_id):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+
+
+def test_admits_rate_per_second_in_order(app, client, clock, event):
+    """The frontier moves by ``rate`` per second regardless of poll volume"""
+    waiting_room.set_rate(event.event_id, 2)
+    tokens = [
+        client.post(f'/api/events/{event.event_id}/waiting-room', headers=_auth(user_id)).get_json()['token']
+        for user_id in (1, 2, 3)
+    ]
+    
+    def poll(token):
+        return client.get(f'/api/events/{event.event_id}/waiting-room', query_string={'token': token}).get_json()
+    
+    assert [poll(token)['admitted'] for token in tokens] == [False, False, False]
+    clock[0] += 1
+    results = [poll(token) for token in tokens]
+    # Polling many times within the same second credits it only once
+    results = [poll(token) for token in tokens]
+    assert [result['admitted'] for result in results] == [True, True, False]
+    assert (results[2]['position'], results[2]['eta']) == (1, 1)
+    
+    clock[0] += 1
+    assert poll(tokens[2])['admitted'] is True
+
+
+def test_quiet_periods_are_not_banked_for_the_next_surge(app, client, clock, event):
+    """The frontier never runs ahead of the queue, so a burst after a lull
+    is still admitted at ``rate``"""
+    waiting_room.set_rate(event.event_id, 2)
+    early = waiting_room.join(event.event_id, '1')
+    # A lull: one client keeps polling every second for a minute
+    for _ in range(60):
+        clock[0] += 1
+        assert waiting_room.status(event.event_id, early)['admitted'] is True
+    
+    burst = [waiting_room.join(event.event_id, str(user_id)) for user_id in range(2, 8)]
+    assert [waiting_room.status(event.event_id, token)['admitted'] for token in burst] == [False] * 6
+    clock[0] += 1
+    assert [waiting_room.status(event.event_id, token)['admitted'] for token in burst] == [True, True] + [False] * 4
+
+
+def test_booking_requires_admission_while_room_open(app, client, clock, event):
+    """Booking calls without an admission token are turned away with 429"""
+    body = {'event_id': event.event_id, 'ticket_types': []}
+    assert client.post('/api/bookings', json=body, headers=_auth(1)).status_code != 429
+    
+    waiting_room.set_rate(event.event_id, 5)
+    assert client.post('/api/bookings', json=body, headers=_auth(1)).status_code == 429
+    
+    token = waiting_room.join(event.event_id, '1')
+    clock[0] += 1
+    admission = waiting_room.status(event.event_id, token)['admissionToken']
+    
+    admitted = dict(_auth(1), **{waiting_room.ADMISSION_HEADER: admission})
+    assert client.post('/api/bookings', json=body, headers=admitted).status_code != 429
+    # Admission tokens are bound to the user they were issued for
+    stolen = dict(_auth(2), **{waiting_room.ADMISSION_HEADER: admission})
+    assert client.post('/api/bookings', json=body, headers=stolen).status_code == 429
+
+
+def test_rejects_tampered_queue_token(client, event):
+    waiting_room.set_rate(event.event_id, 1)
+    token = waiting_room.join(event.event_id, '1')
+    response = client.get(f'/api/events/{event.event_id}/waiting-room', query_string={'token': token + 'x'})
+    assert response.status_code == 400
+    other = client.get(f'/api/events/{event.event_id + 1}/waiting-room', query_string={'token': token})
+    assert other.status_code == 400
@@ -48,8 +48,13 @@ interface BookingsResponse {
     message: string;
     bookings?: BookingDetails[];
     total?: number;
+    next_cursor?: string | null;
+    has_more?: boolean;
 }
 
+// Largest page the my-bookings endpoint serves
+const MY_BOOKINGS_PAGE_SIZE = 100;
+
 const bookingApi = {
     // Create a new booking (requires authentication)
     createBooking: async (bookingData: CreateBookingData): Promise<BookingResponse> => {
@@ -80,22 +85,32 @@ const bookingApi = {
         return {success:false,message:"Lỗi tạo đặt chỗ"};
     },
 
-    // Get all user's bookings (requires authentication)
+    // Get all user's bookings (requires authentication); the endpoint is
+    // paginated, so follow next_cursor until every page is loaded
     getMyBookings: async (): Promise<BookingsResponse> => {
         const token = localStorage.getItem('access_token') ;
         try {
-            const response = await api.get('/bookings/my-bookings', {
-                headers: {
-                    Authorization: `Bearer ${token}`,
-                },
-            });
-            const data = response.data as BookingsResponse;
-
-            if (!data || !data.success) {
-                throw new Error(data?.message || 'Failed to fetch bookings');
-            }
-
-            return data;
+            const bookings: BookingDetails[] = [];
+            let cursor: string | null = null;
+            let data: BookingsResponse;
+            do {
+                const response = await api.get('/bookings/my-bookings', {
+                    headers: {
+                        Authorization: `Bearer ${token}`,
+                    },
+                    params: cursor ? { limit: MY_BOOKINGS_PAGE_SIZE, cursor } : { limit: MY_BOOKINGS_PAGE_SIZE },
+                });
+                data = response.data as BookingsResponse;
+
+                if (!data || !data.success) {
+                    throw new Error(data?.message || 'Failed to fetch bookings');
+                }
+
+                bookings.push(...(data.bookings ?? []));
+                cursor = data.has_more ? data.next_cursor ?? null : null;
+            } while (cursor);
+
+            return { ...data, bookings, next_cursor: null, has_more: false };
         } catch (error) {
             console.error('Error fetching bookings:', error);
             throw error;